@@ -0,0 +1,49 @@
+# Copyright (c) 2026, Administrator and contributors
+# For license information, please see license.txt
+
+"""
+Version counters for cached data.
+
+Cached values are stored under keys that carry a version number; bumping the
+version makes every older entry unreachable (it expires on its TTL), so no key
+scan is needed to invalidate.
+
+Versions are bumped with an atomic INCR once the transaction that changed the
+data is committed: a reader running before the commit still sees the old
+version, so it can never cache pre-commit data under the new one. Every key is
+bumped at most once per transaction.
+"""
+
+import frappe
+from frappe.utils import cint
+
+
+def get_cache_version(key):
+	return cint(frappe.cache.get(frappe.cache.make_key(key)))
+
+
+def get_cache_versions(keys):
+	"""{key: version} of several counters in one round trip"""
+	if not keys:
+		return {}
+	values = frappe.cache.mget([frappe.cache.make_key(key) for key in keys])
+	return {key: cint(value) for key, value in zip(keys, values)}
+
+
+def bump_cache_version(*keys):
+	"""Bump the counters once the current transaction is committed"""
+	pending = getattr(frappe.local, "pending_cache_versions", None)
+	if pending is None:
+		pending = frappe.local.pending_cache_versions = set()
+
+	if not pending:
+		frappe.db.after_commit.add(incr_pending_cache_versions)
+		frappe.db.after_rollback.add(pending.clear)
+	pending.update(keys)
+
+
+def incr_pending_cache_versions():
+	pending = frappe.local.pending_cache_versions
+	for key in pending:
+		frappe.cache.incr(frappe.cache.make_key(key))
+	pending.clear()
@@ -0,0 +1,184 @@
+# Copyright (c) 2026, Administrator and contributors
+# For license information, please see license.txt
+
+"""
+Customer balance snapshots.
+
+One row per (company, customer, snapshot date) holding the customer's GL
+balance over everything posted before the snapshot date, and the last invoice
+and payment dates up to then. Snapshots are taken on the first day of every
+month: each one is the previous snapshot rolled forward with that month's
+movements, so reading a balance for any date costs one snapshot plus at most
+one month of entries.
+
+The nightly job rolls the snapshots forward to the current month. Submitting
+or cancelling a document that posts to a customer before the latest snapshot
+drops the snapshots it makes stale; readers fall back to the previous one
+until the next nightly run rebuilds them.
+
+The first run builds the whole history; it can also be started with:
+
+	bench --site <site> execute expenses_management.expenses_management.doctype.customer_balance_snapshot.customer_balance_snapshot.rebuild_customer_balance_snapshots
+"""
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import add_months, get_first_day, getdate, today
+
+
+class CustomerBalanceSnapshot(Document):
+	pass
+
+
+def on_doctype_update():
+	"""Index for reading one company's snapshot of a date"""
+	frappe.db.add_index("Customer Balance Snapshot", ["company", "snapshot_date", "customer"])
+
+
+def get_latest_snapshot_date(company, date):
+	"""Latest snapshot of the company taken on or before the date, None if there is none"""
+	return frappe.db.sql(
+		"""
+		SELECT MAX(snapshot_date)
+		FROM `tabCustomer Balance Snapshot`
+		WHERE company = %(company)s AND snapshot_date <= %(date)s
+		""",
+		{"company": company, "date": getdate(date)},
+	)[0][0]
+
+
+# ============================================
+# DOCUMENT EVENT HANDLERS
+# ============================================
+
+def invalidate_customer_balance_snapshots(doc, method=None):
+	"""
+	On Sales Invoice / Payment Entry / Journal Entry submit and cancel: drop
+	the snapshots taken after a back-dated customer posting
+	"""
+	if doc.doctype == "Payment Entry" and doc.party_type != "Customer":
+		return
+	if doc.doctype == "Journal Entry" and not any(
+		row.party_type == "Customer" for row in doc.get("accounts") or []
+	):
+		return
+
+	frappe.db.sql(
+		"""
+		DELETE FROM `tabCustomer Balance Snapshot`
+		WHERE company = %(company)s AND snapshot_date > %(posting_date)s
+		""",
+		{"company": doc.company, "posting_date": getdate(doc.posting_date)},
+	)
+
+
+# ============================================
+# ROLL FORWARD
+# ============================================
+
+def roll_forward_customer_balance_snapshots():
+	"""Daily: take the missing monthly snapshots of every company up to the current month"""
+	current_month = get_first_day(today())
+
+	for company in frappe.get_all("Company", pluck="name"):
+		latest = get_latest_snapshot_date(company, current_month)
+		if latest:
+			snapshot_date = add_months(latest, 1)
+		else:
+			first_posting = frappe.db.sql(
+				"""
+				SELECT MIN(posting_date)
+				FROM `tabGL Entry`
+				WHERE company = %(company)s AND party_type = 'Customer' AND is_cancelled = 0
+				""",
+				{"company": company},
+			)[0][0]
+			if not first_posting:
+				continue
+			snapshot_date = add_months(get_first_day(first_posting), 1)
+
+		while snapshot_date <= current_month:
+			write_customer_balance_snapshot(company, snapshot_date, latest)
+			frappe.db.commit()
+			latest, snapshot_date = snapshot_date, add_months(snapshot_date, 1)
+
+
+def rebuild_customer_balance_snapshots(company=None):
+	"""Drop the snapshots (of one company or all) and take them again from the first posting"""
+	if company:
+		frappe.db.delete("Customer Balance Snapshot", {"company": company})
+	else:
+		frappe.db.delete("Customer Balance Snapshot")
+	frappe.db.commit()
+
+	roll_forward_customer_balance_snapshots()
+
+
+def write_customer_balance_snapshot(company, snapshot_date, previous_snapshot_date=None):
+	"""Take one snapshot: the previous snapshot plus the movements posted since"""
+	values = {
+		"company": company,
+		"snapshot_date": getdate(snapshot_date),
+		"previous_snapshot_date": previous_snapshot_date,
+		"from_date": getdate(previous_snapshot_date or "1900-01-01"),
+		"user": frappe.session.user,
+	}
+
+	frappe.db.sql(
+		"""
+		DELETE FROM `tabCustomer Balance Snapshot`
+		WHERE company = %(company)s AND snapshot_date = %(snapshot_date)s
+		""",
+		values,
+	)
+
+	frappe.db.sql(
+		"""
+		INSERT INTO `tabCustomer Balance Snapshot` (
+			name, creation, modified, owner, modified_by, docstatus, idx,
+			company, snapshot_date, customer, balance, last_invoice_date, last_payment_date
+		)
+		SELECT
+			REPLACE(UUID(), '-', ''), NOW(), NOW(), %(user)s, %(user)s, 0, 0,
+			%(company)s, %(snapshot_date)s, customer,
+			SUM(balance), MAX(last_invoice_date), MAX(last_payment_date)
+		FROM (
+			SELECT customer, balance, last_invoice_date, last_payment_date
+			FROM `tabCustomer Balance Snapshot`
+			WHERE company = %(company)s AND snapshot_date = %(previous_snapshot_date)s
+
+			UNION ALL
+
+			SELECT party, SUM(debit - credit), NULL, NULL
+			FROM `tabGL Entry`
+			WHERE company = %(company)s
+				AND party_type = 'Customer'
+				AND is_cancelled = 0
+				AND posting_date >= %(from_date)s AND posting_date < %(snapshot_date)s
+			GROUP BY party
+
+			UNION ALL
+
+			SELECT customer, 0, MAX(posting_date),
+				MAX(IF(base_grand_total - outstanding_amount > 0, posting_date, NULL))
+			FROM `tabSales Invoice`
+			WHERE docstatus = 1
+				AND company = %(company)s
+				AND posting_date >= %(from_date)s AND posting_date < %(snapshot_date)s
+			GROUP BY customer
+
+			UNION ALL
+
+			SELECT party, 0, NULL, MAX(posting_date)
+			FROM `tabPayment Entry`
+			WHERE docstatus = 1
+				AND company = %(company)s
+				AND party_type = 'Customer'
+				AND payment_type = 'Receive'
+				AND posting_date >= %(from_date)s AND posting_date < %(snapshot_date)s
+			GROUP BY party
+		) movements
+		GROUP BY customer
+		""",
+		values,
+	)
@@ -0,0 +1,156 @@
+# Copyright (c) 2026, Administrator and contributors
+# For license information, please see license.txt
+
+"""
+Daily sales fact table.
+
+Submitted Sales Invoice lines aggregated per (company, posting date, customer,
+branch, item, is_return, returned invoice). Submitting or cancelling an
+invoice re-aggregates the customer-day slice of the invoice, and of the
+invoice it returns against.
+
+Lines of an invoice with a submitted return against it keep the invoice in
+`returned_invoice` instead of aggregating with the others: whether it is
+Credit Note Issued also follows its outstanding amount, so readers join its
+live status (see sales_analytics.get_sold_lines).
+
+Cost is not stored: the pages join Item Cost on (item, branch) so profit keeps
+following the current cost per stock UOM like the line-level queries did.
+
+Existing invoices are loaded with:
+
+	bench --site <site> execute expenses_management.expenses_management.doctype.daily_sales_summary.daily_sales_summary.rebuild_daily_sales_summary
+"""
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import add_months, get_first_day, get_last_day, getdate
+
+SUMMARY_READY_KEY = "daily_sales_summary_built"
+
+# Weight in kg of a `sii` line joined to its `item`, the rule of the sold lines
+# (sales_analytics.get_all_customer_items_batch): stock items only, weight per
+# unit in kg (1 when unset) unless the weight UOM is طن (ton)
+SOLD_LINE_WEIGHT_KG = """CASE WHEN COALESCE(item.is_stock_item, 0) = 1 THEN
+				sii.stock_qty * CASE WHEN item.weight_uom = 'طن'
+					THEN COALESCE(item.weight_per_unit, 0) * 1000
+					ELSE COALESCE(NULLIF(item.weight_per_unit, 0), 1)
+				END
+			ELSE 0 END"""
+
+# The invoice of a line while a submitted return is made against it, '' otherwise
+RETURNED_INVOICE = """IF(si.is_return = 0 AND EXISTS(
+				SELECT 1 FROM `tabSales Invoice` ret
+				WHERE ret.return_against = si.name AND ret.is_return = 1 AND ret.docstatus = 1
+			), si.name, '')"""
+
+
+class DailySalesSummary(Document):
+	pass
+
+
+def on_doctype_update():
+	"""Indexes for the per-company period aggregates and per-customer slices"""
+	frappe.db.add_index("Daily Sales Summary", ["company", "posting_date"])
+	frappe.db.add_index("Daily Sales Summary", ["customer", "posting_date"])
+
+
+def is_daily_sales_summary_ready():
+	"""Pages only read the summary once existing invoices were loaded"""
+	return bool(frappe.utils.cint(frappe.db.get_default(SUMMARY_READY_KEY)))
+
+
+# ============================================
+# DOCUMENT EVENT HANDLERS
+# ============================================
+
+def update_daily_sales_summary(doc, method=None):
+	"""On Sales Invoice submit / cancel: re-aggregate the affected customer-days"""
+	refresh_daily_sales_summary(doc.company, doc.customer, doc.posting_date)
+
+	if doc.get("is_return") and doc.get("return_against"):
+		original = frappe.db.get_value(
+			"Sales Invoice", doc.return_against, ["company", "customer", "posting_date"], as_dict=True
+		)
+		if original:
+			refresh_daily_sales_summary(original.company, original.customer, original.posting_date)
+
+
+# ============================================
+# AGGREGATION
+# ============================================
+
+def refresh_daily_sales_summary(company, customer, posting_date):
+	"""Rebuild the summary rows of one customer-day"""
+	write_daily_sales_summary(
+		"company = %(company)s AND customer = %(customer)s AND posting_date = %(posting_date)s",
+		"si.company = %(company)s AND si.customer = %(customer)s AND si.posting_date = %(posting_date)s",
+		{"company": company, "customer": customer, "posting_date": getdate(posting_date)},
+	)
+
+
+def write_daily_sales_summary(summary_conditions, invoice_conditions, values):
+	"""Replace the summary rows matching the conditions with fresh aggregates"""
+	values = {**values, "user": frappe.session.user}
+
+	frappe.db.sql(f"DELETE FROM `tabDaily Sales Summary` WHERE {summary_conditions}", values)
+
+	frappe.db.sql(
+		f"""
+		INSERT INTO `tabDaily Sales Summary` (
+			name, creation, modified, owner, modified_by, docstatus, idx,
+			company, posting_date, customer, branch, item_code, is_return, returned_invoice,
+			line_count, qty, stock_qty, weight_tons, net_amount, tax_amount
+		)
+		SELECT
+			REPLACE(UUID(), '-', ''), NOW(), NOW(), %(user)s, %(user)s, 0, 0,
+			si.company,
+			si.posting_date,
+			si.customer,
+			IFNULL(si.branch, '') AS branch,
+			sii.item_code,
+			si.is_return,
+			{RETURNED_INVOICE} AS returned_invoice,
+			COUNT(*),
+			SUM(sii.qty),
+			SUM(sii.stock_qty),
+			SUM({SOLD_LINE_WEIGHT_KG}) / 1000,
+			SUM(sii.base_net_amount),
+			SUM(COALESCE(sii.base_net_amount * (si.base_total_taxes_and_charges / NULLIF(si.base_net_total, 0)), 0))
+		FROM `tabSales Invoice Item` sii
+		INNER JOIN `tabSales Invoice` si ON si.name = sii.parent
+		LEFT JOIN `tabItem` item ON item.name = sii.item_code
+		WHERE si.docstatus = 1
+		AND {invoice_conditions}
+		GROUP BY si.company, si.posting_date, si.customer, IFNULL(si.branch, ''),
+			sii.item_code, si.is_return, returned_invoice
+		""",
+		values,
+	)
+
+
+# ============================================
+# REBUILD
+# ============================================
+
+def rebuild_daily_sales_summary(from_date=None, to_date=None):
+	"""Rebuild the summary month by month and mark it ready for the pages"""
+	if not from_date:
+		from_date = frappe.db.sql("SELECT MIN(posting_date) FROM `tabSales Invoice` WHERE docstatus = 1")[0][0]
+	if not to_date:
+		to_date = frappe.db.sql("SELECT MAX(posting_date) FROM `tabSales Invoice` WHERE docstatus = 1")[0][0]
+
+	if from_date and to_date:
+		month_start = get_first_day(from_date)
+		while month_start <= getdate(to_date):
+			values = {"from_date": month_start, "to_date": get_last_day(month_start)}
+			write_daily_sales_summary(
+				"posting_date BETWEEN %(from_date)s AND %(to_date)s",
+				"si.posting_date BETWEEN %(from_date)s AND %(to_date)s",
+				values,
+			)
+			frappe.db.commit()
+			month_start = add_months(month_start, 1)
+
+	frappe.db.set_default(SUMMARY_READY_KEY, 1)
+	frappe.db.commit()
@@ -0,0 +1,275 @@
+# Copyright (c) 2026, Administrator and contributors
+# For license information, please see license.txt
+
+"""
+Materialized current cost per stock UOM of every item.
+
+Stock items have one row (branch = ''), resolved as:
+latest Purchase Receipt -> latest Purchase Invoice -> Bin weighted average -> 0.
+Non-stock items have one row per branch with the latest Purchase Invoice of
+that branch. Purchase amounts are converted to the stock UOM with the item's
+UOM Conversion Detail (falling back to the document conversion factor), which
+handles purchase documents posted with a broken conversion factor.
+
+Rows are refreshed for the items of a Purchase Receipt / Purchase Invoice on
+submit and cancel, and created for new items on insert. Items whose cost comes
+from the Bin are re-resolved daily since their valuation moves with every
+stock transaction; the same job picks up stock items that have no row yet
+(e.g. items made a stock item later, or only ever received through a Stock
+Entry / Stock Reconciliation). A full rebuild:
+
+	bench --site <site> execute expenses_management.expenses_management.doctype.item_cost.item_cost.rebuild_item_costs
+"""
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import flt, now
+
+REBUILD_BATCH_SIZE = 500
+
+COST_FIELDS = (
+	"name",
+	"item_code",
+	"branch",
+	"is_stock_item",
+	"cost_per_stock_uom",
+	"cost_source",
+	"source_voucher",
+	"creation",
+	"modified",
+	"owner",
+	"modified_by",
+)
+
+
+class ItemCost(Document):
+	pass
+
+
+def on_doctype_update():
+	"""One row per item (stock items) or per item and branch (non-stock items)"""
+	frappe.db.add_unique("Item Cost", ["item_code", "branch"], constraint_name="unique_item_branch")
+
+
+def get_item_cost_join(line_alias="sii", item_alias="item", branch_field="si.branch", alias="ic"):
+	"""
+	LEFT JOIN clause for the cost row of an invoice line.
+
+	Stock items match the item-wide row, non-stock items the row of the
+	invoice branch. Requires `tabItem` joined as `item_alias`.
+	"""
+	return f"""
+		LEFT JOIN `tabItem Cost` {alias}
+			ON {alias}.item_code = {line_alias}.item_code
+			AND {alias}.branch = CASE WHEN COALESCE({item_alias}.is_stock_item, 0) = 1
+				THEN '' ELSE {branch_field} END
+	"""
+
+
+def get_item_cost_field(alias="ic"):
+	"""Cost per stock UOM of the joined cost row, 0 when unknown"""
+	return f"COALESCE({alias}.cost_per_stock_uom, 0)"
+
+
+# ============================================
+# DOCUMENT EVENT HANDLERS
+# ============================================
+
+def refresh_purchase_item_costs(doc, method=None):
+	"""On submit / cancel of a Purchase Receipt or Purchase Invoice"""
+	item_codes = {d.item_code for d in doc.get("items") if d.item_code}
+	if item_codes:
+		refresh_item_costs(item_codes)
+
+
+def create_item_cost(doc, method=None):
+	"""Item after_insert: resolve the cost row of the new item"""
+	refresh_item_costs([doc.name])
+
+
+# ============================================
+# COST RESOLUTION
+# ============================================
+
+def refresh_item_costs(item_codes):
+	"""Recompute and replace the cost rows of the given items"""
+	item_codes = tuple(sorted(set(item_codes)))
+	if not item_codes:
+		return
+
+	items = frappe.db.sql(
+		"""
+		SELECT name, COALESCE(is_stock_item, 0) AS is_stock_item
+		FROM `tabItem`
+		WHERE name IN %(items)s
+		""",
+		{"items": item_codes},
+		as_dict=True,
+	)
+
+	stock_items = tuple(d.name for d in items if d.is_stock_item)
+	non_stock_items = tuple(d.name for d in items if not d.is_stock_item)
+
+	rows = []
+	if stock_items:
+		rows.extend(get_stock_item_costs(stock_items))
+	if non_stock_items:
+		rows.extend(get_non_stock_item_costs(non_stock_items))
+
+	frappe.db.sql("DELETE FROM `tabItem Cost` WHERE item_code IN %(items)s", {"items": item_codes})
+
+	timestamp = now()
+	user = frappe.session.user
+	values = [
+		(
+			frappe.generate_hash(length=10),
+			r.item_code,
+			r.branch or "",
+			r.is_stock_item,
+			flt(r.cost, 6),
+			r.cost_source,
+			r.source_voucher,
+			timestamp,
+			timestamp,
+			user,
+			user,
+		)
+		for r in rows
+	]
+
+	if values:
+		frappe.db.bulk_insert("Item Cost", COST_FIELDS, values)
+
+
+def get_stock_item_costs(item_codes):
+	"""Latest Purchase Receipt -> latest Purchase Invoice -> Bin weighted average -> 0"""
+	receipt_costs = get_latest_purchase_costs("Purchase Receipt", item_codes, positive_qty_only=True)
+	invoice_costs = get_latest_purchase_costs("Purchase Invoice", item_codes, positive_qty_only=True)
+	bin_costs = get_bin_costs(item_codes)
+
+	rows = []
+	for item_code in item_codes:
+		row = frappe._dict(item_code=item_code, branch="", is_stock_item=1, cost=0, cost_source="None", source_voucher=None)
+
+		receipt = receipt_costs.get((item_code, None))
+		invoice = invoice_costs.get((item_code, None))
+
+		if receipt and flt(receipt.cost):
+			row.update(cost=receipt.cost, cost_source="Purchase Receipt", source_voucher=receipt.voucher_no)
+		elif invoice and flt(invoice.cost):
+			row.update(cost=invoice.cost, cost_source="Purchase Invoice", source_voucher=invoice.voucher_no)
+		elif flt(bin_costs.get(item_code)):
+			row.update(cost=bin_costs[item_code], cost_source="Bin")
+
+		rows.append(row)
+
+	return rows
+
+
+def get_non_stock_item_costs(item_codes):
+	"""Latest Purchase Invoice per item and branch"""
+	invoice_costs = get_latest_purchase_costs("Purchase Invoice", item_codes, per_branch=True)
+
+	return [
+		frappe._dict(
+			item_code=item_code,
+			branch=branch,
+			is_stock_item=0,
+			cost=flt(d.cost),
+			cost_source="Purchase Invoice",
+			source_voucher=d.voucher_no,
+		)
+		for (item_code, branch), d in invoice_costs.items()
+		if branch
+	]
+
+
+def get_latest_purchase_costs(doctype, item_codes, positive_qty_only=False, per_branch=False):
+	"""
+	Cost per stock UOM of the latest submitted purchase line per item
+	(and per branch), as {(item_code, branch or None): row}.
+	"""
+	partition = "pi.item_code, p.branch" if per_branch else "pi.item_code"
+	qty_condition = "AND pi.qty > 0" if positive_qty_only else ""
+
+	rows = frappe.db.sql(
+		f"""
+		SELECT item_code, branch, voucher_no, cost
+		FROM (
+			SELECT
+				pi.item_code,
+				p.branch,
+				p.name AS voucher_no,
+				pi.base_amount / NULLIF(
+					pi.qty * COALESCE(ucd.conversion_factor, pi.conversion_factor, 1), 0
+				) AS cost,
+				ROW_NUMBER() OVER (
+					PARTITION BY {partition}
+					ORDER BY p.posting_date DESC, p.creation DESC, pi.idx
+				) AS rn
+			FROM `tab{doctype} Item` pi
+			INNER JOIN `tab{doctype}` p ON p.name = pi.parent
+			LEFT JOIN (
+				SELECT parent, uom, MAX(conversion_factor) AS conversion_factor
+				FROM `tabUOM Conversion Detail`
+				WHERE parenttype = 'Item' AND parent IN %(items)s
+				GROUP BY parent, uom
+			) ucd ON ucd.parent = pi.item_code AND ucd.uom = pi.uom
+			WHERE p.docstatus = 1
+			AND pi.item_code IN %(items)s
+			{qty_condition}
+		) latest
+		WHERE rn = 1
+		""",
+		{"items": tuple(item_codes)},
+		as_dict=True,
+	)
+
+	return {(r.item_code, r.branch if per_branch else None): r for r in rows}
+
+
+def get_bin_costs(item_codes):
+	"""Weighted average valuation rate over warehouses with positive stock"""
+	return dict(
+		frappe.db.sql(
+			"""
+			SELECT item_code, SUM(actual_qty * valuation_rate) / NULLIF(SUM(actual_qty), 0)
+			FROM `tabBin`
+			WHERE item_code IN %(items)s AND actual_qty > 0
+			GROUP BY item_code
+			""",
+			{"items": tuple(item_codes)},
+		)
+	)
+
+
+# ============================================
+# REBUILD
+# ============================================
+
+def rebuild_item_costs(item_codes=None):
+	"""Rebuild the cost rows of all (or the given) items in batches"""
+	if item_codes is None:
+		item_codes = frappe.get_all("Item", pluck="name", order_by="name")
+
+	for start in range(0, len(item_codes), REBUILD_BATCH_SIZE):
+		refresh_item_costs(item_codes[start : start + REBUILD_BATCH_SIZE])
+		frappe.db.commit()
+
+
+def refresh_bin_based_costs():
+	"""
+	Daily: re-resolve stock items without purchase history (cost from the Bin)
+	and resolve stock items that have no cost row at all.
+	"""
+	item_codes = frappe.get_all("Item Cost", filters={"is_stock_item": 1, "cost_source": ["in", ["Bin", "None"]]}, pluck="item_code")
+	item_codes += frappe.db.sql_list(
+		"""
+		SELECT item.name
+		FROM `tabItem` item
+		LEFT JOIN `tabItem Cost` ic ON ic.item_code = item.name AND ic.branch = ''
+		WHERE item.is_stock_item = 1
+		AND ic.name IS NULL
+		"""
+	)
+	rebuild_item_costs(item_codes)
@@ -0,0 +1,200 @@
+# Copyright (c) 2026, Administrator and contributors
+# For license information, please see license.txt
+
+"""
+Monthly expense cube.
+
+Submitted Expense Entry lines aggregated per (company, month, cost center,
+expense type). Submitting or cancelling an entry re-aggregates the
+company-month of the entry.
+
+Counts: `entry_count` is the number of entries with a line of the expense
+type, so it adds up across months and cost centers but not across expense
+types. `primary_entry_count` only counts an entry in the cell of its first
+line, so it also adds up across expense types.
+
+The cube is built by a patch; it can be rebuilt with:
+
+	bench --site <site> execute expenses_management.expenses_management.doctype.monthly_expense_summary.monthly_expense_summary.rebuild_monthly_expense_summary
+"""
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import add_months, get_first_day, get_last_day, getdate
+
+
+class MonthlyExpenseSummary(Document):
+	pass
+
+
+def on_doctype_update():
+	"""Index for the per-company month range reads"""
+	frappe.db.add_index("Monthly Expense Summary", ["company", "month"])
+
+
+# ============================================
+# DOCUMENT EVENT HANDLERS
+# ============================================
+
+def update_monthly_expense_summary(doc, method=None):
+	"""On Expense Entry submit / cancel: re-aggregate the company-month of the entry"""
+	month = get_first_day(doc.posting_date)
+	write_monthly_expense_summary(
+		"company = %(company)s AND month = %(month)s",
+		"ee.company = %(company)s AND ee.posting_date BETWEEN %(month)s AND %(month_end)s",
+		{"company": doc.company, "month": month, "month_end": get_last_day(month)},
+	)
+
+
+# ============================================
+# AGGREGATION
+# ============================================
+
+def write_monthly_expense_summary(summary_conditions, entry_conditions, values):
+	"""Replace the cube cells matching the conditions with fresh aggregates"""
+	values = {**values, "user": frappe.session.user}
+
+	frappe.db.sql(f"DELETE FROM `tabMonthly Expense Summary` WHERE {summary_conditions}", values)
+
+	frappe.db.sql(
+		f"""
+		INSERT INTO `tabMonthly Expense Summary` (
+			name, creation, modified, owner, modified_by, docstatus, idx,
+			company, month, cost_center, expense_type,
+			amount, tax_amount, entry_count, primary_entry_count
+		)
+		SELECT
+			REPLACE(UUID(), '-', ''), NOW(), NOW(), %(user)s, %(user)s, 0, 0,
+			ee.company,
+			DATE_FORMAT(ee.posting_date, '%%Y-%%m-01') AS month,
+			ee.cost_center,
+			eei.expense_type,
+			SUM(eei.amount),
+			SUM(eei.tax_amount),
+			COUNT(DISTINCT ee.name),
+			COUNT(DISTINCT IF(eei.idx = 1, ee.name, NULL))
+		FROM `tabExpense Entry Item` eei
+		INNER JOIN `tabExpense Entry` ee ON ee.name = eei.parent
+		WHERE ee.docstatus = 1
+		AND {entry_conditions}
+		GROUP BY ee.company, DATE_FORMAT(ee.posting_date, '%%Y-%%m-01'), ee.cost_center, eei.expense_type
+		""",
+		values,
+	)
+
+
+# ============================================
+# READING
+# ============================================
+
+def get_expense_cells(date_ranges, company=None, cost_center=None):
+	"""
+	Expense cells covering the date ranges, each with the span of dates it
+	aggregates (`from_date`, `to_date`).
+
+	Months that no range boundary cuts are read from the cube as one cell per
+	(company, cost center, expense type). Months where a range starts or ends
+	mid-month are read from the entries as one cell per day, so every range
+	is an exact sum of the cells inside it.
+	"""
+	date_ranges = [(getdate(start), getdate(end)) for start, end in date_ranges]
+	first_month = min(get_first_day(start) for start, _end in date_ranges)
+	last_month = max(get_first_day(end) for _start, end in date_ranges)
+
+	edge_months = set()
+	for start, end in date_ranges:
+		if start != get_first_day(start):
+			edge_months.add(get_first_day(start))
+		if end != get_last_day(end):
+			edge_months.add(get_first_day(end))
+
+	values = {
+		"first_month": first_month,
+		"last_month": last_month,
+		"edge_months": tuple(edge_months),
+		"company": company,
+		"cost_center": cost_center,
+	}
+	cube_conditions = entry_conditions = ""
+	if edge_months:
+		cube_conditions += " AND month NOT IN %(edge_months)s"
+	if company:
+		cube_conditions += " AND company = %(company)s"
+		entry_conditions += " AND ee.company = %(company)s"
+	if cost_center:
+		cube_conditions += " AND cost_center = %(cost_center)s"
+		entry_conditions += " AND ee.cost_center = %(cost_center)s"
+
+	cells = frappe.db.sql(
+		f"""
+		SELECT
+			company, cost_center, expense_type, month AS from_date,
+			amount, tax_amount, entry_count, primary_entry_count
+		FROM `tabMonthly Expense Summary`
+		WHERE month BETWEEN %(first_month)s AND %(last_month)s
+		{cube_conditions}
+		""",
+		values,
+		as_dict=True,
+	)
+	for cell in cells:
+		cell.to_date = get_last_day(cell.from_date)
+
+	if not edge_months:
+		return cells
+
+	edge_conditions = []
+	for idx, month in enumerate(sorted(edge_months)):
+		values[f"edge_{idx}"], values[f"edge_{idx}_end"] = month, get_last_day(month)
+		edge_conditions.append(f"ee.posting_date BETWEEN %(edge_{idx})s AND %(edge_{idx}_end)s")
+
+	day_cells = frappe.db.sql(
+		f"""
+		SELECT
+			ee.company, ee.cost_center, eei.expense_type, ee.posting_date AS from_date,
+			SUM(eei.amount) AS amount,
+			SUM(eei.tax_amount) AS tax_amount,
+			COUNT(DISTINCT ee.name) AS entry_count,
+			COUNT(DISTINCT IF(eei.idx = 1, ee.name, NULL)) AS primary_entry_count
+		FROM `tabExpense Entry Item` eei
+		INNER JOIN `tabExpense Entry` ee ON ee.name = eei.parent
+		WHERE ee.docstatus = 1
+		AND ({" OR ".join(edge_conditions)})
+		{entry_conditions}
+		GROUP BY ee.company, ee.cost_center, eei.expense_type, ee.posting_date
+		""",
+		values,
+		as_dict=True,
+	)
+	for cell in day_cells:
+		cell.to_date = cell.from_date
+
+	return cells + day_cells
+
+
+def get_cells_in_range(cells, from_date, to_date):
+	from_date, to_date = getdate(from_date), getdate(to_date)
+	return [cell for cell in cells if from_date <= cell.from_date and cell.to_date <= to_date]
+
+
+# ============================================
+# REBUILD
+# ============================================
+
+def rebuild_monthly_expense_summary():
+	"""Rebuild the cube month by month"""
+	from_date, to_date = frappe.db.sql(
+		"SELECT MIN(posting_date), MAX(posting_date) FROM `tabExpense Entry` WHERE docstatus = 1"
+	)[0]
+	if not from_date:
+		return
+
+	month = get_first_day(from_date)
+	while month <= getdate(to_date):
+		write_monthly_expense_summary(
+			"month = %(month)s",
+			"ee.posting_date BETWEEN %(month)s AND %(month_end)s",
+			{"month": month, "month_end": get_last_day(month)},
+		)
+		frappe.db.commit()
+		month = add_months(month, 1)
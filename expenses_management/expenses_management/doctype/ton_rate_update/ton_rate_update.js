@@ -43,6 +43,16 @@ frappe.ui.form.on('Ton Rate Update', {
 		if (frm.doc.docstatus === 1) {
 			show_summary(frm);
 		}
+
+		// Large updates write their Item Prices in a background job
+		if (frm.doc.status === 'Queued') {
+			frm.set_intro(__('Item Prices are being written in the background'), 'blue');
+		} else if (frm.doc.status === 'Failed') {
+			frm.set_intro(__('Writing Item Prices failed, see the Error Log'), 'red');
+			frm.add_custom_button(__('Retry'), function() {
+				frm.call('retry_price_job').then(() => frm.reload_doc());
+			}).addClass('btn-primary');
+		}
 	},
 
 	item_group: function(frm) {
@@ -40,133 +40,282 @@ class TonRateUpdate(Document):
 		elif self.docstatus == 2:
 			self.status = "Cancelled"
 
+	def before_cancel(self):
+		if self.status == "Queued":
+			frappe.throw(_("Item Prices of this update are still being written in the background"))
+
 	def on_submit(self):
 		"""Create or update Item Prices on submit"""
-		self.update_item_prices()
-		self.set_status()
+		if len(self.items) > PRICE_JOB_THRESHOLD:
+			self.enqueue_price_job("update_item_prices")
+		else:
+			self.update_item_prices()
+			self.set_status()
 
 	def on_cancel(self):
 		"""Revert Item Prices to old rates on cancel"""
-		self.revert_item_prices()
-		self.set_status()
+		if len(self.items) > PRICE_JOB_THRESHOLD:
+			self.enqueue_price_job("revert_item_prices")
+		else:
+			self.revert_item_prices()
+			self.set_status()
+
+	@frappe.whitelist()
+	def retry_price_job(self):
+		"""Enqueue the failed price job again, redoing the rows it already wrote is harmless"""
+		if self.status != "Failed":
+			frappe.throw(_("Only a failed update can be retried"))
+
+		if self.docstatus == 1:
+			self.check_permission("submit")
+			self.enqueue_price_job("update_item_prices")
+		else:
+			self.check_permission("cancel")
+			self.enqueue_price_job("revert_item_prices")
+
+	def enqueue_price_job(self, method):
+		"""Write the prices of a large update in a background job"""
+		self.db_set("status", "Queued")
+		frappe.enqueue(
+			"expenses_management.expenses_management.doctype.ton_rate_update.ton_rate_update.run_price_job",
+			queue="long",
+			timeout=PRICE_JOB_TIMEOUT,
+			job_id=f"ton_rate_update:{self.name}",
+			deduplicate=True,
+			enqueue_after_commit=True,
+			docname=self.name,
+			method=method,
+		)
+		frappe.msgprint(
+			_("{0} Item Prices are being written in the background").format(len(self.items)),
+			indicator="blue",
+			title=_("Queued")
+		)
 
-	def update_item_prices(self):
+	def update_item_prices(self, in_job=False):
 		"""Create or update Item Price records with new rates including min/max rates"""
-		updated_count = 0
-		created_count = 0
-		skipped_count = 0
+		rows = [
+			item for item in self.items
+			if flt(item.weight_per_unit) > 0 and flt(item.new_rate) > 0
+		]
+		skipped_count = len(self.items) - len(rows)
+		price_list = frappe.db.get_value(
+			"Price List", self.price_list, ["selling", "buying", "currency"], as_dict=True
+		) or frappe._dict()
+
+		updated_count = created_count = 0
+		for chunk in self.get_price_chunks(rows, _("Updating Item Prices"), in_job):
+			updated, created = write_item_prices(self, chunk, price_list)
+			updated_count += updated
+			created_count += created
+
+		message = _("Item Prices Updated: {0} updated, {1} created, {2} skipped").format(
+			updated_count, created_count, skipped_count
+		)
+		if in_job:
+			self.publish_price_progress(len(rows), len(rows), _("Updating Item Prices"), message)
+		else:
+			frappe.msgprint(message, indicator="green", title=_("Success"))
+
+	def revert_item_prices(self, in_job=False):
+		"""Revert Item Prices to old rates on cancel"""
+		rows = [item for item in self.items if item.updated and item.item_price_name]
+
+		reverted_count = deleted_count = 0
+		for chunk in self.get_price_chunks(rows, _("Reverting Item Prices"), in_job):
+			reverted, deleted = revert_item_price_rows(chunk)
+			reverted_count += reverted
+			deleted_count += deleted
+
+		message = _("Item Prices Reverted: {0} reverted to old rate, {1} deleted").format(
+			reverted_count, deleted_count
+		)
+		if in_job:
+			self.publish_price_progress(len(rows), len(rows), _("Reverting Item Prices"), message)
+		else:
+			frappe.msgprint(message, indicator="green", title=_("Cancelled"))
+
+	def get_price_chunks(self, rows, title, in_job=False):
+		"""
+		Yield the rows in chunks. In a background job every chunk is committed
+		(with its child-row flags, so a cancel after a failure reverts exactly
+		what was written) and reported as progress.
+		"""
+		for start in range(0, len(rows), PRICE_CHUNK_SIZE):
+			yield rows[start:start + PRICE_CHUNK_SIZE]
+			if in_job:
+				frappe.db.commit()
+				self.publish_price_progress(min(start + PRICE_CHUNK_SIZE, len(rows)), len(rows), title)
+
+	def publish_price_progress(self, done, total, title, description=None):
+		frappe.publish_progress(
+			done * 100 / total if total else 100,
+			title=title,
+			doctype=self.doctype,
+			docname=self.name,
+			description=description or _("{0} of {1} items").format(done, total),
+		)
+
+
+# Updates with more item rows than this write their prices in a background job
+PRICE_JOB_THRESHOLD = 500
+PRICE_CHUNK_SIZE = 500
+PRICE_JOB_TIMEOUT = 60 * 60
+
+
+def run_price_job(docname, method):
+	"""Background worker: write (or revert) the Item Prices of a large update"""
+	doc = frappe.get_doc("Ton Rate Update", docname)
+	if (method == "update_item_prices" and doc.docstatus != 1) or (
+		method == "revert_item_prices" and doc.docstatus != 2
+	):
+		return
+
+	try:
+		getattr(doc, method)(in_job=True)
+		doc.set_status()
+		doc.db_set("status", doc.status)
+	except Exception:
+		frappe.db.rollback()
+		frappe.log_error(title=f"Ton Rate Update {docname}: {method} failed")
+		doc.db_set("status", "Failed")
+		frappe.db.commit()
+		raise
 
-		for item in self.items:
-			if not item.weight_per_unit or flt(item.weight_per_unit) <= 0:
-				skipped_count += 1
-				continue
-
-			if flt(item.new_rate) <= 0:
-				skipped_count += 1
-				continue
-
-			# Check if Item Price exists
-			existing_price = frappe.db.get_value(
-				"Item Price",
-				{
-					"item_code": item.item_code,
-					"price_list": self.price_list,
-					"uom": item.stock_uom
-				},
-				["name", "price_list_rate"],
-				as_dict=True
-			)
 
-			# Prepare update values including min/max rates
-			update_values = {
-				"price_list_rate": flt(item.new_rate),
-				"valid_from": self.posting_date,
-				"custom_minimum_rate": flt(item.minimum_rate),
-				"custom_maximum_rate": flt(item.maximum_rate)
+def write_item_prices(doc, rows, price_list):
+	"""
+	Create or update the Item Prices of the rows: existing prices are
+	resolved in one query, then updated and inserted in bulk, and the rows'
+	item_price_name / updated flags are written in one bulk update.
+	"""
+	existing = get_existing_item_prices(doc.price_list, {row.item_code for row in rows})
+	items = {
+		item.name: item
+		for item in frappe.get_all(
+			"Item",
+			filters={"name": ["in", list({row.item_code for row in rows})]},
+			fields=["name", "item_name", "description", "brand"],
+		)
+	}
+
+	price_updates = {}
+	new_prices = {}
+	row_updates = {}
+
+	for row in rows:
+		values = {
+			"price_list_rate": flt(row.new_rate),
+			"valid_from": doc.posting_date,
+			"custom_minimum_rate": flt(row.minimum_rate),
+			"custom_maximum_rate": flt(row.maximum_rate)
+		}
+		key = (row.item_code, row.stock_uom)
+
+		if key in existing:
+			name = existing[key]
+			price_updates.setdefault(name, {}).update(values)
+		elif key in new_prices:
+			# Same item and UOM twice in the update: the later row wins
+			name = new_prices[key]["name"]
+			new_prices[key].update(values)
+		else:
+			name = frappe.generate_hash(length=10)
+			item = items.get(row.item_code) or frappe._dict()
+			new_prices[key] = {
+				"name": name,
+				"item_code": row.item_code,
+				"item_name": item.item_name,
+				"item_description": item.description,
+				"brand": item.brand,
+				"uom": row.stock_uom,
+				"price_list": doc.price_list,
+				"selling": price_list.selling or 0,
+				"buying": price_list.buying or 0,
+				"currency": doc.currency or price_list.currency,
+				**values,
 			}
 
-			if existing_price:
-				# Update existing Item Price
-				frappe.db.set_value(
-					"Item Price",
-					existing_price.name,
-					update_values
-				)
-				# Store the item price name for reference
-				item.db_set("item_price_name", existing_price.name)
-				item.db_set("updated", 1)
-				updated_count += 1
-			else:
-				# Create new Item Price
-				item_price = frappe.new_doc("Item Price")
-				item_price.item_code = item.item_code
-				item_price.price_list = self.price_list
-				item_price.uom = item.stock_uom
-				item_price.price_list_rate = flt(item.new_rate)
-				item_price.valid_from = self.posting_date
-				item_price.custom_minimum_rate = flt(item.minimum_rate)
-				item_price.custom_maximum_rate = flt(item.maximum_rate)
-				item_price.selling = frappe.db.get_value("Price List", self.price_list, "selling") or 0
-				item_price.buying = frappe.db.get_value("Price List", self.price_list, "buying") or 0
-				item_price.currency = self.currency or frappe.db.get_value("Price List", self.price_list, "currency")
-				item_price.flags.ignore_permissions = True
-				item_price.insert()
-
-				# Store the item price name for reference
-				item.db_set("item_price_name", item_price.name)
-				item.db_set("updated", 1)
-				created_count += 1
+		row.item_price_name = name
+		row.updated = 1
+		row_updates[row.name] = {"item_price_name": name, "updated": 1}
 
-		frappe.msgprint(
-			_("Item Prices Updated: {0} updated, {1} created, {2} skipped").format(
-				updated_count, created_count, skipped_count
-			),
-			indicator="green",
-			title=_("Success")
+	if price_updates:
+		frappe.db.bulk_update("Item Price", price_updates, chunk_size=PRICE_CHUNK_SIZE)
+
+	if new_prices:
+		now, user = frappe.utils.now(), frappe.session.user
+		fields = ["creation", "modified", "owner", "modified_by", "docstatus", *next(iter(new_prices.values()))]
+		frappe.db.bulk_insert(
+			"Item Price",
+			fields,
+			[(now, now, user, user, 0, *price.values()) for price in new_prices.values()],
 		)
 
-	def revert_item_prices(self):
-		"""Revert Item Prices to old rates on cancel"""
-		reverted_count = 0
-		deleted_count = 0
+	frappe.db.bulk_update(
+		"Ton Rate Update Item", row_updates, chunk_size=PRICE_CHUNK_SIZE, update_modified=False
+	)
 
-		for item in self.items:
-			if not item.updated:
-				continue
-
-			if not item.item_price_name:
-				continue
-
-			# Check if the Item Price still exists
-			if not frappe.db.exists("Item Price", item.item_price_name):
-				continue
-
-			if item.old_rate and flt(item.old_rate) > 0:
-				# Revert to old rate
-				frappe.db.set_value(
-					"Item Price",
-					item.item_price_name,
-					"price_list_rate",
-					flt(item.old_rate)
-				)
-				reverted_count += 1
-			else:
-				# Delete the Item Price if it was newly created (old_rate was 0)
-				frappe.delete_doc("Item Price", item.item_price_name, force=True)
-				deleted_count += 1
-
-			# Clear the update flag
-			item.db_set("updated", 0)
-			item.db_set("item_price_name", "")
+	return len(price_updates), len(new_prices)
 
-		frappe.msgprint(
-			_("Item Prices Reverted: {0} reverted to old rate, {1} deleted").format(
-				reverted_count, deleted_count
-			),
-			indicator="green",
-			title=_("Cancelled")
+
+def revert_item_price_rows(rows):
+	"""
+	Put back the old rates of the rows' Item Prices (or delete the prices the
+	update created) and clear the rows' flags, in bulk.
+	"""
+	existing = set(frappe.get_all(
+		"Item Price",
+		filters={"name": ["in", [row.item_price_name for row in rows]]},
+		pluck="name",
+	))
+
+	price_updates = {}
+	deleted = set()
+	row_updates = {}
+
+	for row in rows:
+		# Prices deleted since keep their flags, as before
+		if row.item_price_name not in existing:
+			continue
+
+		if flt(row.old_rate) > 0:
+			price_updates[row.item_price_name] = {"price_list_rate": flt(row.old_rate)}
+		else:
+			# Newly created by the update (old_rate was 0)
+			deleted.add(row.item_price_name)
+
+		row.updated = 0
+		row.item_price_name = ""
+		row_updates[row.name] = {"item_price_name": "", "updated": 0}
+
+	if price_updates:
+		frappe.db.bulk_update("Item Price", price_updates, chunk_size=PRICE_CHUNK_SIZE)
+	if deleted:
+		frappe.db.delete("Item Price", {"name": ["in", list(deleted)]})
+	if row_updates:
+		frappe.db.bulk_update(
+			"Ton Rate Update Item", row_updates, chunk_size=PRICE_CHUNK_SIZE, update_modified=False
 		)
 
+	return len(price_updates), len(deleted)
+
+
+def get_existing_item_prices(price_list, item_codes):
+	"""Item Prices of the price list for the items, as {(item_code, uom): name}"""
+	existing = {}
+	for price in frappe.db.sql("""
+		SELECT name, item_code, uom
+		FROM `tabItem Price`
+		WHERE price_list = %(price_list)s
+			AND item_code IN %(item_codes)s
+		ORDER BY modified DESC
+	""", {"price_list": price_list, "item_codes": tuple(item_codes)}, as_dict=True):
+		# Like get_value: the most recently modified one when there are several
+		existing.setdefault((price.item_code, price.uom), price.name)
+
+	return existing
+
 
 @frappe.whitelist()
 def get_items_by_group(item_group, price_list, company=None):
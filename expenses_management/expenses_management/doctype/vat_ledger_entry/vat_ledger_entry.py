@@ -0,0 +1,15 @@
+# Copyright (c) 2026, Administrator and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class VATLedgerEntry(Document):
+	pass
+
+
+def on_doctype_update():
+	"""Composite index for the per-company, per-period VAT report aggregates"""
+	frappe.db.add_index("VAT Ledger Entry", ["company", "posting_date"])
+	frappe.db.add_index("VAT Ledger Entry", ["voucher_type", "voucher_no"])
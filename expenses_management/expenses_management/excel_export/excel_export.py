@@ -0,0 +1,152 @@
+# Copyright (c) 2026, Administrator and contributors
+# For license information, please see license.txt
+
+"""
+Streaming Excel export for the report pages.
+
+Rows go straight into an openpyxl write-only worksheet, which serializes a
+row as soon as it is appended, so no cell objects are kept and memory does
+not grow with the row count; only the finished (compressed) file is read
+back from its temp file for the response. Cell formatting uses named styles
+registered once per workbook; cells only reference them by name instead of
+carrying their own Font / Fill / Border objects.
+"""
+
+import os
+import tempfile
+
+import frappe
+from frappe.utils import cstr
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def make_style(name, font=None, fill=None, alignment=None, border=None, number_format=None):
+	"""Build a NamedStyle from openpyxl style objects"""
+	from openpyxl.styles import NamedStyle
+
+	style = NamedStyle(name=name)
+	if font:
+		style.font = font
+	if fill:
+		style.fill = fill
+	if alignment:
+		style.alignment = alignment
+	if border:
+		style.border = border
+	if number_format:
+		style.number_format = number_format
+	return style
+
+
+class XlsxStreamWriter:
+	"""
+	One write-only worksheet.
+
+	Layout (column widths, freeze panes, direction) must be set before the
+	first row is appended. Rows are lists of values or (value, style) pairs.
+	"""
+
+	def __init__(self, title, styles=(), column_widths=None, freeze_panes=None, right_to_left=False):
+		from openpyxl import Workbook
+
+		self.workbook = Workbook(write_only=True)
+		self.sheet = self.workbook.create_sheet(title)
+		self.row = 0
+
+		for style in styles:
+			self.workbook.add_named_style(style)
+
+		self.sheet.sheet_view.rightToLeft = right_to_left
+		if freeze_panes:
+			self.sheet.freeze_panes = freeze_panes
+		for col, width in (column_widths or {}).items():
+			self.sheet.column_dimensions[self.column_letter(col)].width = width
+
+	def append(self, cells, height=None, merge=None):
+		"""
+		Append one row. `merge` is a list of (first_col, last_col) ranges
+		(1-based) merged on this row.
+		"""
+		from openpyxl.cell import WriteOnlyCell
+
+		self.row += 1
+		# The row is serialized by append, so its height has to be known before
+		if height:
+			self.sheet.row_dimensions[self.row].height = height
+
+		row = []
+		for cell in cells:
+			value, style = cell if isinstance(cell, tuple) else (cell, None)
+			if style:
+				value = WriteOnlyCell(self.sheet, value=value)
+				value.style = style
+			row.append(value)
+		self.sheet.append(row)
+
+		for first_col, last_col in merge or ():
+			self.sheet.merged_cells.add(
+				f"{self.column_letter(first_col)}{self.row}:{self.column_letter(last_col)}{self.row}"
+			)
+
+	def send(self, filename):
+		"""Save to a temp file and return it as the download of the current request"""
+		fd, path = tempfile.mkstemp(suffix=".xlsx")
+		os.close(fd)
+		try:
+			self.workbook.save(path)
+			with open(path, "rb") as f:
+				frappe.local.response.filecontent = f.read()
+		finally:
+			os.remove(path)
+
+		frappe.local.response.filename = cstr(filename)
+		frappe.local.response.type = "download"
+		frappe.local.response.content_type = XLSX_CONTENT_TYPE
+
+	@staticmethod
+	def column_letter(col):
+		from openpyxl.utils import get_column_letter
+
+		return get_column_letter(col)
+
+
+def send_table(title, columns, rows, filename, right_to_left=True):
+	"""
+	Stream a flat table as the download of the current request.
+
+	`columns` are (fieldname, label, width) and `rows` an iterable of dicts;
+	rows alternate between two shaded styles under a bold header.
+	"""
+	from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+
+	side = Side(style="thin", color="cbd5e1")
+	border = Border(left=side, right=side, top=side, bottom=side)
+	alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
+
+	def fill(color):
+		return PatternFill(start_color=color, end_color=color, fill_type="solid")
+
+	styles = [
+		make_style("table_header", font=Font(name="Segoe UI", bold=True, size=11, color="FFFFFF"),
+			fill=fill("0f172a"), alignment=alignment, border=border),
+		make_style("table_row", font=Font(name="Segoe UI", size=10), fill=fill("f8fafc"),
+			alignment=alignment, border=border),
+		make_style("table_row_alt", font=Font(name="Segoe UI", size=10), fill=fill("eef2ff"),
+			alignment=alignment, border=border),
+	]
+
+	writer = XlsxStreamWriter(
+		title,
+		styles,
+		column_widths={idx: width for idx, (_fieldname, _label, width) in enumerate(columns, 1)},
+		freeze_panes="A2",
+		right_to_left=right_to_left,
+	)
+	writer.append([(label, "table_header") for _fieldname, label, _width in columns], height=25)
+
+	for idx, row in enumerate(rows):
+		style = "table_row" if idx % 2 == 0 else "table_row_alt"
+		writer.append([(row.get(fieldname), style) for fieldname, _label, _width in columns])
+
+	writer.send(filename)
@@ -0,0 +1,267 @@
+# Copyright (c) 2026, Administrator and contributors
+# For license information, please see license.txt
+
+"""
+Expenses dashboard data service.
+
+Both dashboard pages read their tiles from here. Results are cached per
+filter set (not per user) under a version number that is bumped after an
+Expense Entry is submitted or cancelled, so every viewer of the same filters
+shares one computation until the data actually changes. A lock around the
+computation keeps viewers arriving together on a fresh version from all
+computing it.
+
+`get_dashboard_updates` is the refresh endpoint: it answers from the version
+alone while nothing changed, and otherwise only returns the tiles whose
+content hash differs from what the client already shows.
+"""
+
+import hashlib
+from collections import defaultdict
+
+import frappe
+from frappe.utils import add_months, cint, flt, get_first_day, get_last_day, getdate, today
+
+from expenses_management.expenses_management.cache_version.cache_version import (
+	bump_cache_version,
+	get_cache_version,
+)
+from expenses_management.expenses_management.doctype.monthly_expense_summary.monthly_expense_summary import (
+	get_cells_in_range,
+	get_expense_cells,
+)
+
+DASHBOARD_PREFIX = "expenses_management:expense_dashboard"
+DASHBOARD_VERSION_KEY = "expenses_management:expense_dashboard_version_counter"
+DASHBOARD_TTL = 60 * 60
+
+# Seconds a viewer waits for another viewer computing the same filters
+DASHBOARD_LOCK_WAIT = 30
+
+
+@frappe.whitelist()
+def get_dashboard(company=None, from_date=None, to_date=None, cost_center=None, expense_type=None):
+	"""Dashboard tiles for the filters as {version, hashes, data}"""
+	filters = get_dashboard_filters(company, from_date, to_date, cost_center, expense_type)
+	version = get_dashboard_version()
+	key = ":".join([DASHBOARD_PREFIX, version, frappe.as_json(filters, indent=None)])
+
+	payload = frappe.cache.get_value(key)
+	if payload is not None:
+		return payload
+
+	lock = frappe.cache.lock(frappe.cache.make_key(f"{key}:lock"), timeout=DASHBOARD_LOCK_WAIT * 2)
+	locked = lock.acquire(blocking_timeout=DASHBOARD_LOCK_WAIT)
+	try:
+		# Another viewer may have computed it while we waited
+		payload = frappe.cache.get_value(key)
+		if payload is None:
+			data = build_dashboard_data(filters)
+			payload = {
+				"version": version,
+				"hashes": {tile: get_tile_hash(value) for tile, value in data.items()},
+				"data": data,
+			}
+			frappe.cache.set_value(key, payload, expires_in_sec=DASHBOARD_TTL)
+	finally:
+		if locked:
+			lock.release()
+
+	return payload
+
+
+@frappe.whitelist()
+def get_dashboard_updates(
+	version=None, hashes=None,
+	company=None, from_date=None, to_date=None, cost_center=None, expense_type=None
+):
+	"""
+	Incremental refresh: `version` and `hashes` are what the client got last.
+	Returns the current version and hashes, and the changed tiles only.
+	"""
+	current_version = get_dashboard_version()
+	if version == current_version:
+		return {"version": current_version, "tiles": {}}
+
+	payload = get_dashboard(company, from_date, to_date, cost_center, expense_type)
+	hashes = frappe.parse_json(hashes) or {}
+
+	return {
+		"version": payload["version"],
+		"hashes": payload["hashes"],
+		"tiles": {
+			tile: payload["data"][tile]
+			for tile, tile_hash in payload["hashes"].items()
+			if hashes.get(tile) != tile_hash
+		},
+	}
+
+
+def get_dashboard_version():
+	"""Data version plus the date, as defaults and year to date follow today"""
+	return f"{get_cache_version(DASHBOARD_VERSION_KEY)}:{today()}"
+
+
+def clear_dashboard_cache(doc=None, method=None):
+	"""Expense Entry on_submit / on_cancel: bump the version once the change is committed"""
+	bump_cache_version(DASHBOARD_VERSION_KEY)
+
+
+def get_tile_hash(value):
+	return hashlib.sha1(frappe.as_json(value, indent=None).encode()).hexdigest()
+
+
+def get_dashboard_filters(company=None, from_date=None, to_date=None, cost_center=None, expense_type=None):
+	"""Filters with the default period resolved, so equal requests share a cache key"""
+	return frappe._dict({
+		"company": None if not company or company == "All" else company,
+		"from_date": getdate(from_date) if from_date else get_first_day(add_months(today(), -1)),
+		"to_date": getdate(to_date) if to_date else get_last_day(today()),
+		"cost_center": cost_center or None,
+		"expense_type": expense_type or None,
+	})
+
+
+# ============================================
+# TILES
+# ============================================
+
+def build_dashboard_data(filters):
+	"""
+	Compute every tile.
+
+	Totals, breakdowns, stats and the 12-month trend are summed from the
+	monthly expense cube (one query, plus one over the entries when a date
+	range starts or ends mid-month); only the top expenses are read from the
+	entries themselves.
+	"""
+	company, cost_center, expense_type = filters.company, filters.cost_center, filters.expense_type
+	from_date, to_date = filters.from_date, filters.to_date
+
+	# Previous period for comparison
+	prev_from = add_months(from_date, -1)
+	prev_to = add_months(to_date, -1)
+
+	# Year to date (always use today as end date, not filter to_date)
+	year_start = getdate(f"{getdate(today()).year}-01-01")
+	today_date = getdate(today())
+
+	# Monthly trend (last 12 months)
+	trend_months = [get_first_day(add_months(to_date, -i)) for i in range(11, -1, -1)]
+
+	cells = get_expense_cells(
+		[
+			(from_date, to_date),
+			(prev_from, prev_to),
+			(year_start, today_date),
+			(trend_months[0], get_last_day(trend_months[-1])),
+		],
+		company=company,
+		cost_center=cost_center,
+	)
+	current_cells = get_cells_in_range(cells, from_date, to_date)
+
+	current_total = sum_cells(current_cells)
+	prev_total = sum_cells(get_cells_in_range(cells, prev_from, prev_to))
+	ytd_total = sum_cells(get_cells_in_range(cells, year_start, today_date))
+
+	# Calculate change percentage
+	change = 0
+	if prev_total > 0:
+		change = ((current_total - prev_total) / prev_total) * 100
+
+	# Expense count and average: entries are counted once, in their first line's cell
+	count = cint(sum_cells(current_cells, "primary_entry_count"))
+
+	# Expenses by type
+	expenses_by_type = group_cells(
+		[c for c in current_cells if not expense_type or c.expense_type == expense_type],
+		"expense_type",
+		count_field="entry_count",
+	)[:10]
+
+	# Expenses by cost center
+	expenses_by_cc = group_cells([c for c in current_cells if c.cost_center], "cost_center")[:10]
+
+	monthly_trend = [
+		{
+			"month": month_start.strftime("%b %Y"),
+			"total": flt(sum_cells(get_cells_in_range(cells, month_start, get_last_day(month_start))), 2),
+		}
+		for month_start in trend_months
+	]
+
+	# Expenses by company (only when "All" is selected)
+	expenses_by_company = []
+	if not company:
+		expenses_by_company = group_cells(current_cells, "company", with_tax=True)
+
+	return {
+		"current_period": {
+			"total": flt(current_total, 2),
+			"change": flt(change, 2),
+			"from_date": from_date.strftime("%Y-%m-%d"),
+			"to_date": to_date.strftime("%Y-%m-%d"),
+		},
+		"year_to_date": {"total": flt(ytd_total, 2)},
+		"stats": {
+			"count": count,
+			"average": flt(current_total / count if count else 0, 2),
+			"total_tax": flt(sum_cells(current_cells, "tax_amount"), 2),
+		},
+		"expenses_by_type": expenses_by_type,
+		"expenses_by_cost_center": expenses_by_cc,
+		"expenses_by_company": expenses_by_company,
+		"monthly_trend": monthly_trend,
+		"top_expenses": get_top_expenses(filters),
+		"is_all_companies": not company,
+	}
+
+
+def get_top_expenses(filters):
+	conditions = ["ee.docstatus = 1", "ee.posting_date BETWEEN %(from_date)s AND %(to_date)s"]
+	if filters.company:
+		conditions.append("ee.company = %(company)s")
+	if filters.cost_center:
+		conditions.append("ee.cost_center = %(cost_center)s")
+
+	return frappe.db.sql(
+		f"""
+		SELECT
+			ee.name,
+			ee.posting_date,
+			ee.total_amount,
+			ee.cost_center,
+			ee.remarks
+		FROM `tabExpense Entry` ee
+		WHERE {" AND ".join(conditions)}
+		ORDER BY ee.total_amount DESC
+		LIMIT 10
+		""",
+		filters,
+		as_dict=True,
+	)
+
+
+def sum_cells(cells, field="amount"):
+	return sum(flt(cell[field]) for cell in cells)
+
+
+def group_cells(cells, key, count_field="primary_entry_count", with_tax=False):
+	"""Totals and entry counts per value of `key`, largest total first"""
+	groups = defaultdict(lambda: {"total": 0, "count": 0, "total_tax": 0})
+	for cell in cells:
+		group = groups[cell[key]]
+		group["total"] += flt(cell.amount)
+		group["count"] += cint(cell[count_field])
+		group["total_tax"] += flt(cell.tax_amount)
+
+	rows = []
+	for value, group in groups.items():
+		row = {key: value, "total": flt(group["total"], 2), "count": group["count"]}
+		if with_tax:
+			row["average"] = flt(group["total"] / group["count"] if group["count"] else 0, 2)
+			row["total_tax"] = flt(group["total_tax"], 2)
+		rows.append(row)
+
+	return sorted(rows, key=lambda row: row["total"], reverse=True)
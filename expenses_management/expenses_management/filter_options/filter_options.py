@@ -0,0 +1,117 @@
+# Copyright (c) 2026, Administrator and contributors
+# For license information, please see license.txt
+
+"""
+Per user cache of the filter options of the analytics pages.
+
+Options are cached per page and user (user permissions shape what a user may
+pick) for FILTER_OPTIONS_TTL. Every key carries a version number that is bumped
+once a change to one of the source doctypes is committed, so a new Branch or
+Territory shows up on the next page open without scanning for stale keys.
+
+Customers are not part of the options: the pages pick them through a Link
+field backed by `search_customers`.
+"""
+
+import frappe
+
+from expenses_management.expenses_management.cache_version.cache_version import (
+	bump_cache_version,
+	get_cache_version,
+)
+from expenses_management.expenses_management.sales_analytics.sales_analytics import get_user_restrictions
+
+FILTER_OPTIONS_PREFIX = "expenses_management:filter_options"
+FILTER_OPTIONS_VERSION_KEY = "expenses_management:filter_options_version_counter"
+FILTER_OPTIONS_TTL = 60 * 60
+
+# Doctypes the filter options are read from (see hooks.py doc_events)
+FILTER_OPTION_DOCTYPES = (
+	"Company",
+	"Branch",
+	"POS Profile",
+	"Customer Group",
+	"Territory",
+	"Sales Person",
+	"Item Group",
+	"Item",
+	"Warehouse",
+	"Department",
+	"Loan Product",
+	"Loan",
+	"User Permission",
+)
+
+# Item fields the options are built from (lengths of the purchase requirements page)
+FILTER_OPTION_ITEM_FIELDS = ("custom_length", "disabled", "is_stock_item")
+
+
+def get_cached_filter_options(page, build, *args):
+	"""
+	Return `build(*args)` for the session user, cached per page, user and args.
+	"""
+	key = ":".join(
+		[FILTER_OPTIONS_PREFIX, page, str(get_filter_options_version()), frappe.session.user]
+		+ [str(arg) for arg in args]
+	)
+
+	options = frappe.cache.get_value(key)
+	if options is None:
+		options = build(*args)
+		frappe.cache.set_value(key, options, expires_in_sec=FILTER_OPTIONS_TTL)
+	return options
+
+
+def get_filter_options_version():
+	return get_cache_version(FILTER_OPTIONS_VERSION_KEY)
+
+
+def clear_filter_options(doc=None, method=None):
+	"""on_update / after_rename / on_trash of the FILTER_OPTION_DOCTYPES"""
+	bump_cache_version(FILTER_OPTIONS_VERSION_KEY)
+
+
+def clear_filter_options_for_item(doc, method=None):
+	"""Item on_update: only when a field the options are built from changed"""
+	if any(doc.has_value_changed(field) for field in FILTER_OPTION_ITEM_FIELDS):
+		clear_filter_options()
+
+
+@frappe.whitelist()
+@frappe.validate_and_sanitize_search_inputs
+def search_customers(doctype, txt, searchfield, start, page_len, filters):
+	"""
+	Typeahead for the customer filter of the sales pages: enabled customers
+	matching `txt` on id or name, limited by the user restrictions.
+	"""
+	restrictions = get_user_restrictions()
+
+	conditions = []
+	values = {"txt": f"%{txt}%", "start": int(start or 0), "page_len": int(page_len or 20)}
+
+	if restrictions.get("customers"):
+		conditions.append("name IN %(allowed_customers)s")
+		values["allowed_customers"] = tuple(restrictions["customers"])
+	if restrictions.get("territories"):
+		conditions.append("territory IN %(allowed_territories)s")
+		values["allowed_territories"] = tuple(restrictions["territories"])
+	if restrictions.get("customer_groups"):
+		conditions.append("customer_group IN %(allowed_customer_groups)s")
+		values["allowed_customer_groups"] = tuple(restrictions["customer_groups"])
+
+	extra_where = "".join(f" AND {condition}" for condition in conditions)
+
+	return frappe.db.sql(
+		f"""
+		SELECT name, customer_name
+		FROM `tabCustomer`
+		WHERE disabled = 0
+		AND (name LIKE %(txt)s OR customer_name LIKE %(txt)s)
+		{extra_where}
+		ORDER BY
+			CASE WHEN name LIKE %(txt)s THEN 0 ELSE 1 END,
+			customer_name
+		LIMIT %(start)s, %(page_len)s
+		""",
+		values,
+	)
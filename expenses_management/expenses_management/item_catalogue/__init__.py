@@ -0,0 +1,2 @@
+# Copyright (c) 2026, Administrator and contributors
+# For license information, please see license.txt
@@ -0,0 +1,122 @@
+# Copyright (c) 2026, Administrator and contributors
+# For license information, please see license.txt
+
+"""
+Cached catalogue of the stock masters read by the purchase requirements page:
+the item group tree, enabled stock items with their weight / length and the
+leaf warehouses of every company.
+
+The catalogue is stored under a version number that is bumped once an Item,
+Item Group or Warehouse change is committed (see hooks.py doc_events), so a
+report run only queries Bin and the sales aggregates.
+"""
+
+import frappe
+from frappe.utils import flt
+
+from expenses_management.expenses_management.cache_version.cache_version import (
+	bump_cache_version,
+	get_cache_version,
+)
+
+CATALOGUE_PREFIX = "expenses_management:item_catalogue"
+CATALOGUE_VERSION_KEY = "expenses_management:item_catalogue_version_counter"
+CATALOGUE_TTL = 24 * 60 * 60
+
+# Item fields the catalogue is built from
+CATALOGUE_ITEM_FIELDS = ("item_name", "weight_per_unit", "custom_length", "item_group", "disabled", "is_stock_item")
+
+# Item group whose children are the default groups of the purchase requirements
+BEAM_ITEM_GROUP = "Beam"
+
+
+def get_item_catalogue():
+	"""
+	Return {
+		"item_groups": {item_group: {"parent": parent_item_group, "is_group": 0 / 1}},
+		"items": [{item_code, item_name, weight_per_unit, custom_length, item_group}],
+		"lengths": sorted distinct custom_length of the items,
+		"warehouses": {company: [leaf enabled warehouses]},
+	}
+	Items are sorted by item group, length and name.
+	"""
+	key = f"{CATALOGUE_PREFIX}:{get_catalogue_version()}"
+	catalogue = frappe.cache.get_value(key)
+	if catalogue is None:
+		catalogue = build_item_catalogue()
+		frappe.cache.set_value(key, catalogue, expires_in_sec=CATALOGUE_TTL)
+	return catalogue
+
+
+def build_item_catalogue():
+	item_groups = frappe.db.sql(
+		"SELECT name, parent_item_group, is_group FROM `tabItem Group`",
+		as_dict=True,
+	)
+
+	items = frappe.db.sql(
+		"""
+		SELECT
+			item_code,
+			item_name,
+			COALESCE(weight_per_unit, 0) AS weight_per_unit,
+			COALESCE(custom_length, 0) AS custom_length,
+			item_group
+		FROM `tabItem`
+		WHERE disabled = 0 AND is_stock_item = 1
+		ORDER BY item_group, custom_length, item_name
+		""",
+		as_dict=True,
+	)
+
+	warehouses = {}
+	for company, warehouse in frappe.db.sql(
+		"""
+		SELECT company, name FROM `tabWarehouse`
+		WHERE is_group = 0 AND disabled = 0
+		ORDER BY name
+		"""
+	):
+		warehouses.setdefault(company, []).append(warehouse)
+
+	return {
+		"item_groups": {g.name: {"parent": g.parent_item_group, "is_group": g.is_group} for g in item_groups},
+		"items": [dict(item) for item in items],
+		"lengths": sorted({flt(item.custom_length) for item in items if flt(item.custom_length) > 0}),
+		"warehouses": warehouses,
+	}
+
+
+def get_child_item_groups(catalogue, parent=BEAM_ITEM_GROUP):
+	"""Direct children of an item group"""
+	return sorted(name for name, group in catalogue["item_groups"].items() if group["parent"] == parent)
+
+
+def get_leaf_item_groups(catalogue):
+	return sorted(name for name, group in catalogue["item_groups"].items() if not group["is_group"])
+
+
+def get_catalogue_items(catalogue, item_groups, lengths=None):
+	"""Catalogue items of the given groups, optionally limited to some lengths"""
+	item_groups = set(item_groups)
+	lengths = {flt(length) for length in lengths or []}
+	return [
+		frappe._dict(item)
+		for item in catalogue["items"]
+		if item["item_group"] in item_groups and (not lengths or flt(item["custom_length"]) in lengths)
+	]
+
+
+def get_catalogue_version():
+	return get_cache_version(CATALOGUE_VERSION_KEY)
+
+	"""Item Group / Warehouse on_update, after_rename and on_trash, Item after_rename and on_trash"""
+def clear_item_catalogue(doc=None, method=None):
+	"""Item / Item Group / Warehouse on_update, after_rename and on_trash"""
+	bump_cache_version(CATALOGUE_VERSION_KEY)
+
+
+def clear_item_catalogue_for_item(doc, method=None):
+	"""Item on_update: only when a field the catalogue is built from changed"""
+	if any(doc.has_value_changed(field) for field in CATALOGUE_ITEM_FIELDS):
+		clear_item_catalogue()
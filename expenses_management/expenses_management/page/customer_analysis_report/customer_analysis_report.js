@@ -90,7 +90,8 @@ class CustomerAnalysisReport {
 				{ fieldtype: 'Column Break' },
 				{ label: __('إلى تاريخ'), fieldname: 'to_date', fieldtype: 'Date', default: me.filters.to_date, reqd: 1 },
 				{ fieldtype: 'Section Break' },
-				{ label: __('العميل'), fieldname: 'customer', fieldtype: 'Link', options: 'Customer', default: me.filters.customer },
+				{ label: __('العميل'), fieldname: 'customer', fieldtype: 'Link', options: 'Customer', default: me.filters.customer,
+					get_query: () => ({ query: 'expenses_management.expenses_management.filter_options.filter_options.search_customers' }) },
 				{ fieldtype: 'Column Break' },
 				{ label: __('نقطة البيع'), fieldname: 'pos_profile', fieldtype: 'Link', options: 'POS Profile', default: me.filters.pos_profile },
 				{ fieldtype: 'Column Break' },
@@ -322,6 +323,8 @@ class CustomerAnalysisReport {
 				.float-btn.reload-btn:hover i { animation: spin 0.6s ease-in-out; }
 				.float-btn.print-btn { background: linear-gradient(135deg, #2563eb, #3b82f6); animation-delay: 0.3s; }
 				.float-btn.print-btn:hover { box-shadow: 0 8px 30px rgba(37, 99, 235, 0.6); }
+				.float-btn.excel-btn { background: linear-gradient(135deg, #16a34a, #22c55e); animation-delay: 0.4s; }
+				.float-btn.excel-btn:hover { box-shadow: 0 8px 30px rgba(34, 197, 94, 0.6); }
 				.float-btn.pdf-btn { background: linear-gradient(135deg, #dc2626, #ef4444); animation-delay: 0.4s; }
 				.float-btn.pdf-btn:hover { box-shadow: 0 8px 30px rgba(239, 68, 68, 0.6); }
 				.float-btn i { font-size: 18px; font-weight: 900; }
@@ -1076,6 +1079,7 @@ class CustomerAnalysisReport {
 				<button class="float-btn settings-btn" id="settings-btn"><i class="fa fa-cog"></i><span class="btn-tooltip">إعدادات التقرير</span></button>
 				<button class="float-btn reload-btn" id="reload-btn"><i class="fa fa-refresh"></i><span class="btn-tooltip">تحديث التقرير</span></button>
 				<button class="float-btn print-btn" id="print-btn"><i class="fa fa-print"></i><span class="btn-tooltip">طباعة PDF</span></button>
+				<button class="float-btn excel-btn" id="excel-btn"><i class="fa fa-file-excel-o"></i><span class="btn-tooltip">تصدير Excel</span></button>
 			</div>
 			<div class="customer-analysis-report">
 				<div id="report-content">
@@ -1091,6 +1095,18 @@ class CustomerAnalysisReport {
 		$('#settings-btn').off('click').on('click', () => this.show_settings_dialog());
 		$('#reload-btn').off('click').on('click', () => this.generate_report());
 		$('#print-btn').off('click').on('click', () => this.generate_pdf_and_print());
+		$('#excel-btn').off('click').on('click', () => this.export_excel());
+	}
+
+	export_excel() {
+		if (!this.data || !this.data.customers || this.data.customers.length === 0) {
+			frappe.msgprint({ title: __('خطأ'), indicator: 'red', message: __('لا توجد بيانات للتصدير') });
+			return;
+		}
+
+		// Served as a file download; the result of the report job is reused when still cached
+		window.open('/api/method/expenses_management.expenses_management.page.customer_analysis_report.customer_analysis_report.export_excel?'
+			+ $.param(this.get_filters()));
 	}
 
 	generate_report() {
@@ -1108,21 +1124,21 @@ class CustomerAnalysisReport {
 
 		$('#report-content').html(`<div class="loading-box"><div class="spinner"></div><div class="loading-txt">جاري تحميل البيانات...</div></div>`);
 
-		frappe.call({
-			method: 'expenses_management.expenses_management.page.customer_analysis_report.customer_analysis_report.get_report_data',
-			args: filters,
-			callback: (r) => {
-				if (r.message && r.message.customers && r.message.customers.length > 0) {
-					this.data = r.message;
-					this.render_report(r.message);
+		expenses_management.report_jobs
+			.run('customer_analysis_report', filters, (progress) => {
+				$('#report-content .loading-txt').text(`جاري تحميل البيانات... ${progress}%`);
+			})
+			.then((data) => {
+				if (data && data.customers && data.customers.length > 0) {
+					this.data = data;
+					this.render_report(data);
 				} else {
 					$('#report-content').html(`<div class="empty-box"><h4>لا توجد بيانات</h4><p>لا يوجد عملاء للفلاتر المحددة</p></div>`);
 				}
-			},
-			error: () => {
+			})
+			.catch(() => {
 				$('#report-content').html(`<div class="empty-box"><h4>خطأ في تحميل البيانات</h4><p>يرجى المحاولة مرة أخرى</p></div>`);
-			}
-		});
+			});
 	}
 
 	render_report(data) {
@@ -1137,14 +1153,33 @@ class CustomerAnalysisReport {
 		sortedCustomers.forEach((c, idx) => { html += this.render_customer_card(c, idx); });
 		$('#report-content').html(html);
 
+		// Invoice lines are loaded per customer on first expand
+		this.customer_items = {};
+		const me = this;
+
 		// Customer panel toggle
 		$('.items-toggle').off('click').on('click', function() {
 			$(this).toggleClass('open');
-			$(this).next('.items-panel').toggleClass('show');
+			const $panel = $(this).next('.items-panel');
+			$panel.toggleClass('show');
+
+			const customer = $(this).attr('data-customer');
+			if ($panel.hasClass('show') && !me.customer_items[customer]) {
+				me.load_customer_items(customer, $panel, 1);
+			}
+		});
+
+		// Load the next page of invoices of a customer
+		$('#report-content').off('click', '.load-more-btn').on('click', '.load-more-btn', function() {
+			const customer = $(this).attr('data-customer');
+			const state = me.customer_items[customer];
+			if (state) {
+				me.load_customer_items(customer, $(this).closest('.items-panel'), state.page + 1);
+			}
 		});
 
 		// Invoice row click to expand/collapse items
-		$('.invoice-row').off('click').on('click', function(e) {
+		$('#report-content').off('click', '.invoice-row').on('click', '.invoice-row', function(e) {
 			// Don't toggle if clicking on the invoice link
 			if ($(e.target).closest('.inv-link').length) return;
 
@@ -1162,6 +1197,43 @@ class CustomerAnalysisReport {
 		});
 	}
 
+	load_customer_items(customer, $panel, page) {
+		const state = this.customer_items[customer] || { items: [], page: 0, has_more: false };
+		this.customer_items[customer] = state;
+
+		if (page === 1) {
+			$panel.html(`<div class="loading-box" style="padding:30px;"><div class="spinner"></div></div>`);
+		} else {
+			$panel.find('.load-more-btn').prop('disabled', true);
+		}
+
+		const filters = Object.assign({}, this.data.filters || {});
+		delete filters.use_credit_days;
+
+		frappe.call({
+			method: 'expenses_management.expenses_management.page.customer_analysis_report.customer_analysis_report.get_customer_items',
+			args: Object.assign(filters, { customer: customer, page: page }),
+			callback: (r) => {
+				const res = r.message || {};
+				state.items = state.items.concat(res.items || []);
+				state.page = res.page || page;
+				state.has_more = !!res.has_more;
+
+				let html = this.render_invoices_list(state.items, customer);
+				if (state.has_more) {
+					html += `<div style="text-align:center; padding:12px;"><button class="btn btn-default btn-sm load-more-btn" data-customer="${customer}">عرض المزيد من الفواتير</button></div>`;
+				}
+				$panel.html(html);
+			},
+			error: () => {
+				if (page === 1) {
+					delete this.customer_items[customer];
+				}
+				$panel.html(`<div class="empty-box" style="padding:30px;"><p>خطأ في تحميل الفواتير</p></div>`);
+			}
+		});
+	}
+
 	render_summary_header(data) {
 		const totals = data.totals || {};
 		const filters = data.filters || {};
@@ -1269,12 +1341,12 @@ class CustomerAnalysisReport {
 							<span class="toggle-label">تفاصيل الفواتير</span>
 							<span class="toggle-counts">
 								<span class="count-badge invoices"><i class="fa fa-file-text-o"></i> ${c.invoice_count_period || 0} فاتورة</span>
-								<span class="count-badge items"><i class="fa fa-cubes"></i> ${(c.items || []).length} صنف</span>
+								<span class="count-badge items"><i class="fa fa-cubes"></i> ${c.total_items_count || 0} صنف</span>
 							</span>
 						</div>
 						<i class="fa fa-chevron-down toggle-icon"></i>
 					</div>
-					<div class="items-panel">${this.render_invoices_list(c.items, c.customer)}</div>
+					<div class="items-panel"></div>
 				</div>
 			</div>
 		`;
@@ -1573,10 +1645,12 @@ class CustomerAnalysisReport {
 					</table>
 			`;
 
-			if (c.items && c.items.length > 0) {
+			// Only customers expanded on screen have their invoice lines loaded
+			const custItems = ((this.customer_items || {})[c.customer] || {}).items || [];
+			if (custItems.length > 0) {
 				// Group items by invoice
 				const invoicesMap = {};
-				c.items.forEach(item => {
+				custItems.forEach(item => {
 					const invId = item.invoice_id;
 					if (!invoicesMap[invId]) {
 						invoicesMap[invId] = {
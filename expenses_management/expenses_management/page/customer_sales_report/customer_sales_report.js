@@ -89,7 +89,8 @@ class CustomerSalesReport {
 				{ fieldtype: 'Column Break' },
 				{ label: __('إلى تاريخ'), fieldname: 'to_date', fieldtype: 'Date', default: me.filters.to_date, reqd: 1 },
 				{ fieldtype: 'Section Break' },
-				{ label: __('العميل'), fieldname: 'customer', fieldtype: 'Link', options: 'Customer', default: me.filters.customer },
+				{ label: __('العميل'), fieldname: 'customer', fieldtype: 'Link', options: 'Customer', default: me.filters.customer,
+					get_query: () => ({ query: 'expenses_management.expenses_management.filter_options.filter_options.search_customers' }) },
 				{ fieldtype: 'Column Break' },
 				{ label: __('نقطة البيع'), fieldname: 'pos_profile', fieldtype: 'Link', options: 'POS Profile', default: me.filters.pos_profile },
 				{ fieldtype: 'Column Break' },
@@ -315,6 +316,8 @@ class CustomerSalesReport {
 				.float-btn.reload-btn:hover i { animation: spin 0.6s ease-in-out; }
 				.float-btn.print-btn { background: linear-gradient(135deg, #2563eb, #3b82f6); animation-delay: 0.3s; }
 				.float-btn.print-btn:hover { box-shadow: 0 8px 30px rgba(37, 99, 235, 0.6); }
+				.float-btn.excel-btn { background: linear-gradient(135deg, #16a34a, #22c55e); animation-delay: 0.4s; }
+				.float-btn.excel-btn:hover { box-shadow: 0 8px 30px rgba(34, 197, 94, 0.6); }
 				.float-btn i { font-size: 18px; font-weight: 900; }
 				.float-btn .btn-tooltip {
 					position: absolute;
@@ -838,6 +841,7 @@ class CustomerSalesReport {
 				<button class="float-btn settings-btn" id="settings-btn"><i class="fa fa-cog"></i><span class="btn-tooltip">إعدادات التقرير</span></button>
 				<button class="float-btn reload-btn" id="reload-btn"><i class="fa fa-refresh"></i><span class="btn-tooltip">تحديث التقرير</span></button>
 				<button class="float-btn print-btn" id="print-btn"><i class="fa fa-print"></i><span class="btn-tooltip">طباعة</span></button>
+				<button class="float-btn excel-btn" id="excel-btn"><i class="fa fa-file-excel-o"></i><span class="btn-tooltip">تصدير Excel</span></button>
 			</div>
 			<div class="customer-sales-report">
 				<div id="report-content">
@@ -852,6 +856,18 @@ class CustomerSalesReport {
 		$('#settings-btn').off('click').on('click', () => this.show_settings_dialog());
 		$('#reload-btn').off('click').on('click', () => this.generate_report());
 		$('#print-btn').off('click').on('click', () => window.print());
+		$('#excel-btn').off('click').on('click', () => this.export_excel());
+	}
+
+	export_excel() {
+		if (!this.data || !this.data.customers || this.data.customers.length === 0) {
+			frappe.msgprint({ title: __('خطأ'), indicator: 'red', message: __('لا توجد بيانات للتصدير') });
+			return;
+		}
+
+		// Served as a file download; the result of the report job is reused when still cached
+		window.open('/api/method/expenses_management.expenses_management.page.customer_sales_report.customer_sales_report.export_excel?'
+			+ $.param(this.get_filters()));
 	}
 
 	generate_report() {
@@ -869,21 +885,21 @@ class CustomerSalesReport {
 
 		$('#report-content').html(`<div class="loading-box"><div class="spinner"></div><div class="loading-txt">جاري تحميل البيانات...</div></div>`);
 
-		frappe.call({
-			method: 'expenses_management.expenses_management.page.customer_sales_report.customer_sales_report.get_report_data',
-			args: filters,
-			callback: (r) => {
-				if (r.message && r.message.customers && r.message.customers.length > 0) {
-					this.data = r.message;
-					this.render_report(r.message);
+		expenses_management.report_jobs
+			.run('customer_sales_report', filters, (progress) => {
+				$('#report-content .loading-txt').text(`جاري تحميل البيانات... ${progress}%`);
+			})
+			.then((data) => {
+				if (data && data.customers && data.customers.length > 0) {
+					this.data = data;
+					this.render_report(data);
 				} else {
 					$('#report-content').html(`<div class="empty-box"><h4>لا توجد بيانات</h4><p>لا يوجد عملاء للفلاتر المحددة</p></div>`);
 				}
-			},
-			error: () => {
+			})
+			.catch(() => {
 				$('#report-content').html(`<div class="empty-box"><h4>خطأ في تحميل البيانات</h4><p>يرجى المحاولة مرة أخرى</p></div>`);
-			}
-		});
+			});
 	}
 
 	render_report(data) {
@@ -6,13 +6,19 @@ from frappe import _
 from frappe.utils import today, getdate, flt, cint
 from collections import defaultdict
 
-
-def is_admin_or_system_manager():
-    """Check if user is Administrator or has System Manager role"""
-    if frappe.session.user == "Administrator":
-        return True
-    user_roles = frappe.get_roles()
-    return "System Manager" in user_roles
+from expenses_management.expenses_management.excel_export.excel_export import send_table
+from expenses_management.expenses_management.filter_options.filter_options import get_cached_filter_options
+from expenses_management.expenses_management.report_jobs.report_jobs import get_report_job_result, publish_report_progress
+from expenses_management.expenses_management.sales_analytics.sales_analytics import (
+    get_all_customer_items_batch,
+    get_customer_credit_limits,
+    get_customer_terms,
+    get_filter_options_data,
+    get_invoice_dates,
+    get_last_invoices_before,
+    get_report_conditions,
+    get_sold_lines,
+)
 
 
 def has_permission_to_view():
@@ -26,37 +32,6 @@ def has_permission_to_view():
     return False
 
 
-def get_user_restrictions():
-    """Get user permission restrictions for filtering data"""
-    if is_admin_or_system_manager():
-        return {}
-
-    restrictions = {}
-    user_permissions = frappe.permissions.get_user_permissions()
-
-    # Check for Customer restrictions
-    if "Customer" in user_permissions:
-        restrictions["customers"] = [p.get("doc") for p in user_permissions["Customer"] if p.get("doc")]
-
-    # Check for Territory restrictions
-    if "Territory" in user_permissions:
-        restrictions["territories"] = [p.get("doc") for p in user_permissions["Territory"] if p.get("doc")]
-
-    # Check for Customer Group restrictions
-    if "Customer Group" in user_permissions:
-        restrictions["customer_groups"] = [p.get("doc") for p in user_permissions["Customer Group"] if p.get("doc")]
-
-    # Check for Company restrictions
-    if "Company" in user_permissions:
-        restrictions["companies"] = [p.get("doc") for p in user_permissions["Company"] if p.get("doc")]
-
-    # Check for Branch restrictions
-    if "Branch" in user_permissions:
-        restrictions["branches"] = [p.get("doc") for p in user_permissions["Branch"] if p.get("doc")]
-
-    return restrictions
-
-
 @frappe.whitelist()
 def get_filter_options():
     """Get options for report filters using SQL"""
@@ -64,74 +39,7 @@ def get_filter_options():
     if not has_permission_to_view():
         frappe.throw(_("You don't have permission to view this report"))
 
-    restrictions = get_user_restrictions()
-
-    # Companies
-    if restrictions.get("companies"):
-        companies = restrictions["companies"]
-    else:
-        companies = frappe.db.sql("SELECT name FROM `tabCompany`", as_list=1)
-        companies = [c[0] for c in companies]
-
-    # Branches
-    if restrictions.get("branches"):
-        branches = restrictions["branches"]
-    else:
-        branches = frappe.db.sql("SELECT name FROM `tabBranch`", as_list=1)
-        branches = [b[0] for b in branches]
-
-    # Customers
-    if restrictions.get("customers"):
-        customer_list = restrictions["customers"]
-        placeholders = ", ".join(["%s"] * len(customer_list))
-        customers = frappe.db.sql(f"""
-            SELECT name, customer_name FROM `tabCustomer`
-            WHERE disabled = 0 AND name IN ({placeholders})
-            ORDER BY customer_name
-        """, tuple(customer_list), as_dict=1)
-    elif restrictions.get("territories"):
-        territory_list = restrictions["territories"]
-        placeholders = ", ".join(["%s"] * len(territory_list))
-        customers = frappe.db.sql(f"""
-            SELECT name, customer_name FROM `tabCustomer`
-            WHERE disabled = 0 AND territory IN ({placeholders})
-            ORDER BY customer_name
-        """, tuple(territory_list), as_dict=1)
-    elif restrictions.get("customer_groups"):
-        group_list = restrictions["customer_groups"]
-        placeholders = ", ".join(["%s"] * len(group_list))
-        customers = frappe.db.sql(f"""
-            SELECT name, customer_name FROM `tabCustomer`
-            WHERE disabled = 0 AND customer_group IN ({placeholders})
-            ORDER BY customer_name
-        """, tuple(group_list), as_dict=1)
-    else:
-        customers = frappe.db.sql("""
-            SELECT name, customer_name FROM `tabCustomer`
-            WHERE disabled = 0 ORDER BY customer_name
-        """, as_dict=1)
-
-    pos_profiles = frappe.db.sql("SELECT name FROM `tabPOS Profile` WHERE disabled = 0", as_list=1)
-    pos_profiles = [p[0] for p in pos_profiles]
-
-    customer_groups = frappe.db.sql("SELECT name FROM `tabCustomer Group`", as_list=1)
-    customer_groups = [c[0] for c in customer_groups]
-
-    territories = frappe.db.sql("SELECT name FROM `tabTerritory`", as_list=1)
-    territories = [t[0] for t in territories]
-
-    sales_persons = frappe.db.sql("SELECT name FROM `tabSales Person`", as_list=1)
-    sales_persons = [s[0] for s in sales_persons]
-
-    return {
-        "companies": companies,
-        "branches": branches,
-        "customers": customers,
-        "pos_profiles": pos_profiles,
-        "customer_groups": customer_groups,
-        "territories": territories,
-        "sales_persons": sales_persons
-    }
+    return get_cached_filter_options("customer_sales_report", get_filter_options_data)
 
 
 @frappe.whitelist()
@@ -155,70 +63,13 @@ def get_report_data(company, from_date=None, to_date=None, branch=None, customer
     from_date = getdate(from_date)
     to_date = getdate(to_date)
 
-    # Get user restrictions
-    restrictions = get_user_restrictions()
-
-    values = {
-        "company": company,
-        "from_date": from_date,
-        "to_date": to_date
-    }
+    q = get_report_conditions(company, from_date, to_date, branch, customer, pos_profile,
+                              customer_group, territory, sales_person, payment_status)
 
-    extra_conditions = []
-    customer_conditions = []
-
-    # Apply user restrictions
-    if restrictions.get("customers"):
-        customer_conditions.append("c.name IN %(allowed_customers)s")
-        values["allowed_customers"] = tuple(restrictions["customers"])
-    if restrictions.get("territories"):
-        customer_conditions.append("c.territory IN %(allowed_territories)s")
-        values["allowed_territories"] = tuple(restrictions["territories"])
-    if restrictions.get("customer_groups"):
-        customer_conditions.append("c.customer_group IN %(allowed_customer_groups)s")
-        values["allowed_customer_groups"] = tuple(restrictions["customer_groups"])
-    if restrictions.get("branches"):
-        extra_conditions.append("si.branch IN %(allowed_branches)s")
-        values["allowed_branches"] = tuple(restrictions["branches"])
-
-    # Apply filters from UI
-    if branch:
-        extra_conditions.append("si.branch = %(branch)s")
-        values["branch"] = branch
-    if customer:
-        extra_conditions.append("si.customer = %(customer)s")
-        values["customer"] = customer
-    if pos_profile:
-        extra_conditions.append("si.pos_profile = %(pos_profile)s")
-        values["pos_profile"] = pos_profile
-    if customer_group:
-        customer_conditions.append("c.customer_group = %(customer_group)s")
-        values["customer_group"] = customer_group
-    if territory:
-        customer_conditions.append("c.territory = %(territory)s")
-        values["territory"] = territory
-    if sales_person:
-        extra_conditions.append("EXISTS (SELECT 1 FROM `tabSales Team` st WHERE st.parent = si.name AND st.sales_person = %(sales_person)s)")
-        values["sales_person"] = sales_person
-
-    if payment_status:
-        if payment_status == "paid":
-            extra_conditions.append("si.outstanding_amount = 0")
-        elif payment_status == "not_paid":
-            extra_conditions.append("si.outstanding_amount > 0")
-        elif payment_status == "credit":
-            extra_conditions.append("si.outstanding_amount > 0 AND si.outstanding_amount < si.grand_total")
-        elif payment_status == "unpaid":
-            extra_conditions.append("si.outstanding_amount = si.grand_total AND si.outstanding_amount > 0")
-
-    extra_where = (" AND " + " AND ".join(extra_conditions)) if extra_conditions else ""
-
-    # Build customer join and conditions
-    customer_join = "LEFT JOIN `tabCustomer` c ON c.name = si.customer"
-    customer_where = (" AND " + " AND ".join(customer_conditions)) if customer_conditions else ""
-
-    customers_data = get_customers_sales_data(company, from_date, to_date, values, extra_where, customer_join, customer_where, use_credit_days)
-    period_totals = calculate_period_totals(values, extra_where, customer_join, customer_where)
+    publish_report_progress(10)
+    customers_data = get_customers_sales_data(company, from_date, to_date, q, use_credit_days)
+    publish_report_progress(80)
+    period_totals = calculate_period_totals(q)
 
     return {
         "customers": customers_data,
@@ -239,6 +90,53 @@ def get_report_data(company, from_date=None, to_date=None, branch=None, customer
     }
 
 
+# Customer summary columns of the Excel export: (fieldname, label, width)
+EXCEL_COLUMNS = [
+    ("customer", "رقم العميل", 16),
+    ("customer_name", "اسم العميل", 30),
+    ("credit_limit", "حد الائتمان", 14),
+    ("credit_remaining", "المتبقي من الائتمان", 14),
+    ("credit_days", "أيام الائتمان", 10),
+    ("total_purchase_period", "مبيعات الفترة", 16),
+    ("invoice_count_period", "فواتير الفترة", 10),
+    ("total_returns_period", "مرتجعات الفترة", 14),
+    ("total_purchase_all_time", "إجمالي المبيعات", 16),
+    ("invoice_count_all_time", "إجمالي الفواتير", 10),
+    ("total_balance", "الرصيد", 16),
+    ("total_due", "المستحق", 16),
+    ("total_weight_tons", "الوزن (طن)", 12),
+    ("total_items_count", "أصناف", 10),
+    ("top_item_group", "أعلى مجموعة أصناف", 20),
+    ("first_invoice_date", "أول فاتورة", 12),
+    ("last_invoice_date", "آخر فاتورة قبل الفترة", 12),
+    ("last_invoice_id", "رقم آخر فاتورة", 20),
+    ("last_invoice_amount", "قيمة آخر فاتورة", 14),
+]
+
+
+@frappe.whitelist()
+def export_excel(company, from_date=None, to_date=None, branch=None, customer=None, pos_profile=None,
+                 customer_group=None, territory=None, sales_person=None, payment_status=None, sort_by=None, sort_order=None, use_credit_days=None):
+    """Customer summary of the report as a streamed Excel file"""
+
+    if not has_permission_to_view():
+        frappe.throw(_("You don't have permission to view this report"))
+
+    filters = {
+        "company": company, "from_date": from_date, "to_date": to_date, "branch": branch, "customer": customer,
+        "pos_profile": pos_profile, "customer_group": customer_group, "territory": territory,
+        "sales_person": sales_person, "payment_status": payment_status, "sort_by": sort_by,
+        "sort_order": sort_order, "use_credit_days": use_credit_days
+    }
+
+    # Reuse the result of the report job when still cached
+    result = get_report_job_result("customer_sales_report", filters) or get_report_data(**filters)
+    report_filters = result.get("filters", {})
+
+    filename = "customer_sales_{}_{}.xlsx".format(report_filters.get("from_date", ""), report_filters.get("to_date", ""))
+    send_table("تقرير مبيعات العملاء", EXCEL_COLUMNS, result.get("customers", []), filename)
+
+
 def get_empty_totals():
     return {
         "total_customers": 0,
@@ -256,9 +154,11 @@ def get_empty_totals():
     }
 
 
-def calculate_period_totals(values, extra_where, customer_join, customer_where):
+def calculate_period_totals(q):
     """Calculate totals using SQL - WITHOUT profit"""
 
+    values, extra_where, customer_join, customer_where = q.params, q.extra_where, q.customer_join, q.customer_where
+
     combined_totals = frappe.db.sql(f"""
         SELECT
             COUNT(DISTINCT si.customer) as total_customers,
@@ -298,21 +198,17 @@ def calculate_period_totals(values, extra_where, customer_join, customer_where):
         )
     """, values, as_dict=1)
 
-    # Get weight and items count (no profit)
+    # Get weight and items count (no profit), every line weighs weight_per_unit kg
+    # (1 when unset) like the customer rows
+    lines = get_sold_lines(q.summary, q)
     items_totals = frappe.db.sql(f"""
         SELECT
-            COUNT(*) as total_items_count,
-            COUNT(DISTINCT sii.item_code) as unique_items_count,
-            COALESCE(SUM(CASE WHEN si.is_return = 0 THEN sii.stock_qty * COALESCE(item.weight_per_unit, 1) ELSE 0 END), 0) / 1000 as total_weight_tons
-        FROM `tabSales Invoice Item` sii
-        INNER JOIN `tabSales Invoice` si ON si.name = sii.parent
-        LEFT JOIN `tabItem` item ON item.name = sii.item_code
-        {customer_join}
-        WHERE si.docstatus = 1
-        AND si.company = %(company)s
-        AND si.posting_date BETWEEN %(from_date)s AND %(to_date)s
-        {customer_where}
-        {extra_where}
+            COALESCE(SUM({lines.line_count}), 0) as total_items_count,
+            COUNT(DISTINCT {lines.item_code}) as unique_items_count,
+            COALESCE(SUM(CASE WHEN {lines.is_return} = 0 THEN {lines.stock_qty} * COALESCE(NULLIF(item.weight_per_unit, 0), 1) ELSE 0 END), 0) / 1000 as total_weight_tons
+        FROM {lines.tables}
+        WHERE {lines.where}
+        AND {lines.posting_date} BETWEEN %(from_date)s AND %(to_date)s
     """, values, as_dict=1)
 
     inv_data = combined_totals[0] if combined_totals else {}
@@ -335,9 +231,11 @@ def calculate_period_totals(values, extra_where, customer_join, customer_where):
     }
 
 
-def get_customers_sales_data(company, from_date, to_date, values, extra_where, customer_join, customer_where, use_credit_days=False):
+def get_customers_sales_data(company, from_date, to_date, q, use_credit_days=False):
     """Get customer sales data using SQL - WITHOUT profit information"""
 
+    values, extra_where, customer_join, customer_where = q.params, q.extra_where, q.customer_join, q.customer_where
+
     # Get all customers with period totals
     period_data = frappe.db.sql(f"""
         SELECT
@@ -361,45 +259,8 @@ def get_customers_sales_data(company, from_date, to_date, values, extra_where, c
 
     customer_list = tuple([d.customer for d in period_data])
 
-    # Get customer names and payment terms
-    customer_info = frappe.db.sql("""
-        SELECT name, customer_name, payment_terms
-        FROM `tabCustomer`
-        WHERE name IN %(customers)s
-    """, {"customers": customer_list}, as_dict=1)
-
-    customer_names = {c.name: c.customer_name or c.name for c in customer_info}
-    customer_payment_terms = {c.name: c.payment_terms for c in customer_info if c.payment_terms}
-
-    # Get credit days from payment terms
-    customer_credit_days = {}
-    if customer_payment_terms:
-        payment_terms_list = tuple(set(customer_payment_terms.values()))
-        credit_days_data = frappe.db.sql("""
-            SELECT parent, MAX(credit_days) as credit_days
-            FROM `tabPayment Terms Template Detail`
-            WHERE parent IN %(terms)s
-            GROUP BY parent
-        """, {"terms": payment_terms_list}, as_dict=1)
-
-        terms_to_days = {d.parent: cint(d.credit_days) for d in credit_days_data if cint(d.credit_days) > 0}
-        for cust, terms in customer_payment_terms.items():
-            if terms in terms_to_days:
-                customer_credit_days[cust] = terms_to_days[terms]
-
-    # Get credit limits
-    credit_limit_data = frappe.db.sql("""
-        SELECT parent as customer, credit_limit, company
-        FROM `tabCustomer Credit Limit`
-        WHERE parent IN %(customers)s
-        AND (company = %(company)s OR company IS NULL OR company = '')
-        ORDER BY CASE WHEN company = %(company)s THEN 0 ELSE 1 END
-    """, {"customers": customer_list, "company": company}, as_dict=1)
-
-    customer_credit_limits = {}
-    for cl in credit_limit_data:
-        if cl.customer not in customer_credit_limits and flt(cl.credit_limit) > 0:
-            customer_credit_limits[cl.customer] = flt(cl.credit_limit)
+    customer_names, customer_credit_days = get_customer_terms(customer_list)
+    customer_credit_limits = get_customer_credit_limits(customer_list, company)
 
     # All-time totals + due amounts
     all_time_data = frappe.db.sql("""
@@ -421,25 +282,20 @@ def get_customers_sales_data(company, from_date, to_date, values, extra_where, c
     all_time_map = {d.customer: d for d in all_time_data}
 
     # Top item groups
+    lines = get_sold_lines(q.summary, q)
     top_item_groups = frappe.db.sql(f"""
         SELECT
-            si.customer,
-            i.item_group,
-            COUNT(*) as item_count,
-            ROUND(SUM(sii.base_net_amount), 2) as group_amount
-        FROM `tabSales Invoice Item` sii
-        INNER JOIN `tabSales Invoice` si ON si.name = sii.parent
-        LEFT JOIN `tabItem` i ON i.name = sii.item_code
-        {customer_join}
-        WHERE si.docstatus = 1
-        AND si.company = %(company)s
-        AND si.posting_date BETWEEN %(from_date)s AND %(to_date)s
-        AND si.customer IN %(customers)s
-        AND si.is_return = 0
-        {customer_where}
-        {extra_where}
-        GROUP BY si.customer, i.item_group
-        ORDER BY si.customer, group_amount DESC
+            {lines.customer} as customer,
+            item.item_group,
+            SUM({lines.line_count}) as item_count,
+            ROUND(SUM({lines.net_amount}), 2) as group_amount
+        FROM {lines.tables}
+        WHERE {lines.where}
+        AND {lines.posting_date} BETWEEN %(from_date)s AND %(to_date)s
+        AND {lines.customer} IN %(customers)s
+        AND {lines.is_return} = 0
+        GROUP BY {lines.customer}, item.item_group
+        ORDER BY {lines.customer}, group_amount DESC
     """, {**values, "customers": customer_list}, as_dict=1)
 
     top_group_map = defaultdict(list)
@@ -452,50 +308,14 @@ def get_customers_sales_data(company, from_date, to_date, values, extra_where, c
             })
 
     # Invoice dates
-    invoice_dates = frappe.db.sql("""
-        SELECT
-            si.customer,
-            MIN(si.posting_date) as first_invoice_date,
-            MAX(si.posting_date) as last_invoice_date
-        FROM `tabSales Invoice` si
-        WHERE si.docstatus = 1
-        AND si.company = %(company)s
-        AND si.customer IN %(customers)s
-        AND si.is_return = 0
-        GROUP BY si.customer
-    """, {"company": company, "customers": customer_list}, as_dict=1)
-
-    invoice_dates_map = {d.customer: d for d in invoice_dates}
+    invoice_dates_map = get_invoice_dates(company, customer_list)
 
     # Last invoice before period (no profit)
-    last_invoice_details = frappe.db.sql("""
-        SELECT
-            si.customer,
-            si.name as last_invoice_id,
-            si.posting_date as last_invoice_date,
-            si.base_grand_total as last_invoice_amount
-        FROM `tabSales Invoice` si
-        WHERE si.docstatus = 1
-        AND si.company = %(company)s
-        AND si.customer IN %(customers)s
-        AND si.is_return = 0
-        AND si.posting_date < %(from_date)s
-        AND si.posting_date = (
-            SELECT MAX(si2.posting_date)
-            FROM `tabSales Invoice` si2
-            WHERE si2.customer = si.customer
-            AND si2.docstatus = 1
-            AND si2.company = %(company)s
-            AND si2.is_return = 0
-            AND si2.posting_date < %(from_date)s
-        )
-        GROUP BY si.customer
-    """, {"company": company, "customers": customer_list, "from_date": from_date}, as_dict=1)
-
-    last_invoice_map = {d.customer: d for d in last_invoice_details}
+    last_invoice_map = get_last_invoices_before(company, customer_list, from_date)
 
     # Get items data (no profit)
-    items_data = get_all_customer_items_batch(values, extra_where, customer_join, customer_where, customer_list)
+    items_data = get_all_customer_items_batch(values, extra_where, customer_join, customer_where, customer_list,
+        weigh_all_lines=True)
 
     # Build result
     result = []
@@ -560,107 +380,3 @@ def get_customers_sales_data(company, from_date, to_date, values, extra_where, c
 
     result.sort(key=lambda x: x.get("customer_name", ""))
     return result
-
-
-def get_all_customer_items_batch(values, extra_where, customer_join, customer_where, customer_list):
-    """Get items sold to all customers using SQL - WITHOUT profit"""
-
-    items = frappe.db.sql(f"""
-        SELECT
-            si.customer,
-            si.name as invoice_id,
-            si.posting_date,
-            si.owner as invoice_owner,
-            si.branch as invoice_branch,
-            si.base_grand_total as invoice_grand_total,
-            si.outstanding_amount as invoice_outstanding_amount,
-            sii.item_code,
-            sii.item_name,
-            sii.uom as invoice_uom,
-            sii.stock_uom,
-            sii.qty,
-            sii.stock_qty,
-            sii.base_net_amount as total_amount,
-            COALESCE(sii.base_net_amount * (si.base_total_taxes_and_charges / NULLIF(si.base_net_total, 0)), 0) as tax_amount,
-            COALESCE(item.weight_per_unit, 1) as weight_per_unit
-        FROM `tabSales Invoice Item` sii
-        INNER JOIN `tabSales Invoice` si ON si.name = sii.parent
-        LEFT JOIN `tabItem` item ON item.name = sii.item_code
-        {customer_join}
-        WHERE si.docstatus = 1
-        AND si.company = %(company)s
-        AND si.posting_date BETWEEN %(from_date)s AND %(to_date)s
-        AND si.customer IN %(customers)s
-        AND si.is_return = 0
-        {customer_where}
-        {extra_where}
-        ORDER BY si.customer, si.posting_date DESC, si.name
-    """, {**values, "customers": customer_list}, as_dict=1)
-
-    if not items:
-        return {}
-
-    # Get unique item codes and owners
-    item_codes = list(set([i.item_code for i in items]))
-    owner_list = list(set([i.invoice_owner for i in items if i.invoice_owner]))
-
-    # Batch get owner names
-    owner_names = {}
-    if owner_list:
-        owner_data = frappe.db.sql("""
-            SELECT name, full_name FROM `tabUser` WHERE name IN %(owners)s
-        """, {"owners": tuple(owner_list)}, as_dict=1)
-        owner_names = {d.name: d.full_name or d.name for d in owner_data}
-
-    # Batch get stock levels
-    stock_map = {}
-    if item_codes:
-        stock_data = frappe.db.sql("""
-            SELECT
-                b.item_code,
-                COALESCE(SUM(b.actual_qty), 0) as available_qty
-            FROM `tabBin` b
-            WHERE b.item_code IN %(items)s
-            GROUP BY b.item_code
-        """, {"items": tuple(item_codes)}, as_dict=1)
-        stock_map = {d.item_code: d.available_qty for d in stock_data}
-
-    # Group items by customer
-    customer_items = defaultdict(list)
-    for item in items:
-        cust = item.customer
-
-        weight_per_unit_kg = flt(item.weight_per_unit) or 1
-        total_weight_kg = flt(item.stock_qty) * weight_per_unit_kg
-        weight_in_tons = total_weight_kg / 1000
-
-        rate_per_ton = flt(item.total_amount) / weight_in_tons if weight_in_tons > 0 else 0
-        creator_name = owner_names.get(item.invoice_owner, item.invoice_owner or "")
-
-        tax_amount = flt(item.tax_amount, 2)
-        total_after_tax = flt(item.total_amount, 2) + tax_amount
-
-        customer_items[cust].append({
-            "invoice_id": item.invoice_id,
-            "posting_date": str(item.posting_date) if item.posting_date else "",
-            "invoice_creator": creator_name,
-            "invoice_branch": item.invoice_branch or "",
-            "item_code": item.item_code,
-            "item_name": item.item_name,
-            "invoice_uom": item.invoice_uom,
-            "stock_uom": item.stock_uom,
-            "qty": flt(item.qty, 3),
-            "stock_qty": flt(item.stock_qty, 3),
-            "weight_per_unit_kg": weight_per_unit_kg,
-            "total_weight_kg": flt(total_weight_kg, 2),
-            "weight_in_tons": flt(weight_in_tons, 4),
-            "total_amount": flt(item.total_amount, 2),
-            "tax_amount": tax_amount,
-            "total_after_tax": total_after_tax,
-            "rate_per_ton": flt(rate_per_ton, 2),
-            "current_stock": flt(stock_map.get(item.item_code, 0), 3),
-            "invoice_grand_total": flt(item.invoice_grand_total, 2),
-            "invoice_outstanding_amount": flt(item.invoice_outstanding_amount, 2)
-        })
-
-    return dict(customer_items)
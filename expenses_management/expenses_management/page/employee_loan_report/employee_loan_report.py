@@ -3,9 +3,15 @@ from frappe import _
 from frappe.utils import today, getdate, flt, cint
 from collections import defaultdict
 
+from expenses_management.expenses_management.filter_options.filter_options import get_cached_filter_options
+
 
 @frappe.whitelist()
 def get_filter_options():
+	return get_cached_filter_options("employee_loan_report", get_filter_options_data)
+
+
+def get_filter_options_data():
 	companies = frappe.db.get_all("Company", filters={"is_group": 0}, pluck="name", order_by="name")
 	branches = frappe.db.get_all("Branch", pluck="name", order_by="name")
 	departments = frappe.db.get_all("Department", filters={"is_group": 0}, pluck="name", order_by="name")
@@ -27,14 +27,22 @@ class ExpensesDashboard {
 	}
 }
 
+// Seconds between checks for changed tiles
+const DASHBOARD_REFRESH_INTERVAL = 60;
+const DASHBOARD_SERVICE = 'expenses_management.expenses_management.expense_dashboard.expense_dashboard';
+let dashboard_state = { version: null, hashes: {}, data: null };
+let dashboard_refresh_timer = null;
+
 function load_dashboard_data(page) {
 	page.main.find('.expenses-dashboard').css('opacity', '0.5');
 	frappe.call({
-		method: 'expenses_management.expenses_management.page.expenses_dashboard.expenses_dashboard.get_dashboard_data',
+		method: DASHBOARD_SERVICE + '.get_dashboard',
 		args: dashboard_filters,
 		callback: function(r) {
 			if (r.message) {
-				render_dashboard(page, r.message);
+				dashboard_state = r.message;
+				render_dashboard(page, r.message.data);
+				schedule_dashboard_refresh(page);
 			} else {
 				page.main.html('<div class="text-center text-muted" style="padding: 50px;">No data available</div>');
 			}
@@ -45,6 +53,32 @@ function load_dashboard_data(page) {
 	});
 }
 
+function schedule_dashboard_refresh(page) {
+	if (dashboard_refresh_timer) return;
+
+	// Only tiles that changed since the last load come back; nothing while the data is unchanged
+	dashboard_refresh_timer = setInterval(() => {
+		if (!dashboard_state.data || !$(page.wrapper).is(':visible')) return;
+
+		frappe.call({
+			method: DASHBOARD_SERVICE + '.get_dashboard_updates',
+			args: Object.assign({
+				version: dashboard_state.version,
+				hashes: dashboard_state.hashes
+			}, dashboard_filters),
+			callback: function(r) {
+				if (!r.message) return;
+				dashboard_state.version = r.message.version;
+				if (r.message.hashes) dashboard_state.hashes = r.message.hashes;
+				if (Object.keys(r.message.tiles).length) {
+					Object.assign(dashboard_state.data, r.message.tiles);
+					render_dashboard(page, dashboard_state.data);
+				}
+			}
+		});
+	}, DASHBOARD_REFRESH_INTERVAL * 1000);
+}
+
 function render_dashboard(page, data) {
 	Object.keys(chart_instances).forEach(key => { if (chart_instances[key]) chart_instances[key] = null; });
 
@@ -332,25 +332,29 @@ class PurchaseRequirementsReport {
 
 		$('#report-content').html(`<div class="loading-box"><div class="spinner"></div><div class="loading-txt">\u062c\u0627\u0631\u064a \u062a\u062d\u0645\u064a\u0644 \u0627\u0644\u0628\u064a\u0627\u0646\u0627\u062a...</div></div>`);
 
-		frappe.call({
-			method: 'expenses_management.expenses_management.page.purchase_requirements_report.purchase_requirements_report.get_purchase_requirements_data',
-			args: {
+		expenses_management.report_jobs
+			.run('purchase_requirements_report', {
 				company: this.filters.company,
 				from_date: this.filters.from_date,
 				to_date: this.filters.to_date,
 				item_groups: JSON.stringify(this.filters.item_groups),
 				warehouses: JSON.stringify(this.filters.warehouses),
 				lengths: JSON.stringify(this.filters.lengths)
-			},
-			callback: (r) => {
-				if (r.message && r.message.items && r.message.items.length > 0) {
-					this.data = r.message;
-					this.render_report(r.message);
+			}, (progress) => {
+				$('#report-content .loading-txt').text(`\u062c\u0627\u0631\u064a \u062a\u062d\u0645\u064a\u0644 \u0627\u0644\u0628\u064a\u0627\u0646\u0627\u062a... ${progress}%`);
+			})
+			.then((data) => {
+				if (data && data.items && data.items.length > 0) {
+					this.data = data;
+					this.render_report(data);
 				} else {
 					$('#report-content').html(`<div class="empty-box"><i class="fa fa-inbox"></i><h4>\u0644\u0627 \u062a\u0648\u062c\u062f \u0628\u064a\u0627\u0646\u0627\u062a</h4><p>\u0644\u0627 \u064a\u0648\u062c\u062f \u0623\u0635\u0646\u0627\u0641 \u0644\u0644\u0641\u0644\u0627\u062a\u0631 \u0627\u0644\u0645\u062d\u062f\u062f\u0629</p></div>`);
 				}
-			}
-		});
+			})
+			.catch((message) => {
+				$('#report-content').empty();
+				if (message) frappe.msgprint(message);
+			});
 	}
 
 	render_report(data) {
@@ -493,8 +497,10 @@ class PurchaseRequirementsReport {
 				let orderedQty = stockData.ordered_qty || 0;
 				let totalQty = actualQty + orderedQty;
 				let salesQty = (item.sales_data && item.sales_data[wh]) || 0;
-				let requiredPcs = Math.max(0, (salesQty - totalQty)) * 1.1;
-				let requiredTons = requiredPcs * (item.weight_per_unit || 0) / 1000;
+				// Forecast based requirement computed by the server
+				let required = (item.required_data && item.required_data[wh]) || {};
+				let requiredPcs = required.required_qty || 0;
+				let requiredTons = required.required_tons || 0;
 
 				grandTotalStock += actualQty;
 				grandTotalOrdered += orderedQty;
@@ -1,9 +1,25 @@
 import frappe
 from frappe import _
-from frappe.utils import today, getdate, flt
-from collections import defaultdict
+from frappe.utils import today, getdate, flt, cint, date_diff
 import json
-import io
+
+import numpy as np
+
+from expenses_management.expenses_management.demand_forecast.demand_forecast import (
+	forecast_demand,
+	get_required_quantities,
+	get_sales_matrix,
+)
+from expenses_management.expenses_management.excel_export.excel_export import XlsxStreamWriter, make_style
+from expenses_management.expenses_management.filter_options.filter_options import get_cached_filter_options
+from expenses_management.expenses_management.item_catalogue.item_catalogue import (
+	BEAM_ITEM_GROUP,
+	get_catalogue_items,
+	get_child_item_groups,
+	get_item_catalogue,
+	get_leaf_item_groups,
+)
+from expenses_management.expenses_management.report_jobs.report_jobs import get_report_job_result, publish_report_progress
 
 
 def has_permission_to_view():
@@ -24,26 +40,16 @@ def get_filter_options():
 	if not has_permission_to_view():
 		frappe.throw(_("You don't have permission to view this report"))
 
+	return get_cached_filter_options("purchase_requirements_report", get_filter_options_data)
+
+
+def get_filter_options_data():
 	companies = frappe.db.sql("SELECT name FROM `tabCompany` ORDER BY name", as_list=1)
 	companies = [c[0] for c in companies]
 
-	item_groups = frappe.db.sql("""
-		SELECT name FROM `tabItem Group`
-		WHERE is_group = 0
-		ORDER BY name
-	""", as_list=1)
-	item_groups = [g[0] for g in item_groups]
-
-	lengths = []
-	if item_groups:
-		lengths = frappe.db.sql("""
-			SELECT DISTINCT custom_length
-			FROM `tabItem`
-			WHERE custom_length IS NOT NULL AND custom_length > 0
-			AND disabled = 0 AND is_stock_item = 1
-			ORDER BY custom_length
-		""", as_list=1)
-		lengths = [float(l[0]) for l in lengths]
+	catalogue = get_item_catalogue()
+	item_groups = get_leaf_item_groups(catalogue)
+	lengths = catalogue["lengths"] if item_groups else []
 
 	return {
 		"companies": companies,
@@ -57,18 +63,16 @@ def get_warehouses_for_company(company):
 	if not has_permission_to_view():
 		frappe.throw(_("You don't have permission to view this report"))
 
-	warehouses = frappe.db.sql("""
-		SELECT name FROM `tabWarehouse`
-		WHERE company = %(company)s
-		AND is_group = 0 AND disabled = 0
-		ORDER BY name
-	""", {"company": company}, as_list=1)
-	return [w[0] for w in warehouses]
+	return get_cached_filter_options("purchase_requirements_warehouses", get_company_warehouses, company)
+
+
+def get_company_warehouses(company):
+	return get_item_catalogue()["warehouses"].get(company, [])
 
 
 @frappe.whitelist()
 def get_purchase_requirements_data(company, from_date, to_date,
-	item_groups=None, warehouses=None, lengths=None):
+	item_groups=None, warehouses=None, lengths=None, horizon_days=None):
 
 	if not has_permission_to_view():
 		frappe.throw(_("You don't have permission to view this report"))
@@ -86,20 +90,14 @@ def get_purchase_requirements_data(company, from_date, to_date,
 	if isinstance(lengths, str):
 		lengths = json.loads(lengths)
 
+	# Item groups, items and warehouses come from the cached catalogue
+	catalogue = get_item_catalogue()
+
 	if not item_groups:
-		item_groups = frappe.db.sql("""
-			SELECT name FROM `tabItem Group`
-			WHERE parent_item_group = 'Beam'
-		""", as_list=1)
-		item_groups = [g[0] for g in item_groups]
+		item_groups = get_child_item_groups(catalogue, BEAM_ITEM_GROUP)
 
 	if not warehouses:
-		warehouses = frappe.db.sql("""
-			SELECT name FROM `tabWarehouse`
-			WHERE company = %(company)s AND is_group = 0 AND disabled = 0
-			ORDER BY name
-		""", {"company": company}, as_list=1)
-		warehouses = [w[0] for w in warehouses]
+		warehouses = get_company_warehouses(company)
 
 	if not item_groups or not warehouses:
 		return {
@@ -114,25 +112,7 @@ def get_purchase_requirements_data(company, from_date, to_date,
 			}
 		}
 
-	item_conditions = "WHERE item.item_group IN %(item_groups)s AND item.disabled = 0 AND item.is_stock_item = 1"
-	item_values = {"item_groups": tuple(item_groups)}
-
-	if lengths:
-		float_lengths = [float(l) for l in lengths]
-		item_conditions += " AND item.custom_length IN %(lengths)s"
-		item_values["lengths"] = tuple(float_lengths)
-
-	items = frappe.db.sql("""
-		SELECT
-			item.item_code,
-			item.item_name,
-			COALESCE(item.weight_per_unit, 0) as weight_per_unit,
-			COALESCE(item.custom_length, 0) as custom_length,
-			item.item_group
-		FROM `tabItem` item
-		{conditions}
-		ORDER BY item.item_group, item.custom_length, item.item_name
-	""".format(conditions=item_conditions), item_values, as_dict=1)
+	items = get_catalogue_items(catalogue, item_groups, lengths)
 
 	if not items:
 		return {
@@ -149,6 +129,8 @@ def get_purchase_requirements_data(company, from_date, to_date,
 
 	item_codes = tuple([i.item_code for i in items])
 
+	publish_report_progress(20)
+
 	bin_data = frappe.db.sql("""
 		SELECT
 			b.item_code,
@@ -163,60 +145,58 @@ def get_purchase_requirements_data(company, from_date, to_date,
 		"warehouses": tuple(warehouses)
 	}, as_dict=1)
 
-	stock_map = defaultdict(lambda: defaultdict(lambda: {"actual_qty": 0, "ordered_qty": 0}))
+	item_index = {ic: i for i, ic in enumerate(item_codes)}
+	warehouse_index = {wh: w for w, wh in enumerate(warehouses)}
+
+	actual = np.zeros((len(item_codes), len(warehouses)))
+	ordered = np.zeros((len(item_codes), len(warehouses)))
 	for b in bin_data:
-		stock_map[b.item_code][b.warehouse]["actual_qty"] = flt(b.actual_qty)
-		stock_map[b.item_code][b.warehouse]["ordered_qty"] = flt(b.ordered_qty)
+		actual[item_index[b.item_code], warehouse_index[b.warehouse]] = flt(b.actual_qty)
+		ordered[item_index[b.item_code], warehouse_index[b.warehouse]] = flt(b.ordered_qty)
+
+	publish_report_progress(40)
+
+	# Recent daily sales and period totals per (item, warehouse) in one grouped
+	# query, forecast over the horizon (the length of the selected period unless given)
+	sales, sold = get_sales_matrix(company, item_codes, warehouses, from_date, to_date)
+	horizon_days = cint(horizon_days) or date_diff(to_date, from_date) + 1
+	forecast, _moving_average, _seasonal_naive = forecast_demand(sales, horizon_days)
+	required_qty, required_tons = get_required_quantities(
+		forecast, actual + ordered, [item.weight_per_unit for item in items]
+	)
 
-	sales_data = frappe.db.sql("""
-		SELECT
-			sii.item_code,
-			sii.warehouse,
-			SUM(sii.stock_qty) as total_sold_qty
-		FROM `tabSales Invoice Item` sii
-		INNER JOIN `tabSales Invoice` si ON si.name = sii.parent
-		WHERE si.docstatus = 1
-		AND si.company = %(company)s
-		AND si.is_return = 0
-		AND si.posting_date BETWEEN %(from_date)s AND %(to_date)s
-		AND sii.item_code IN %(item_codes)s
-		AND sii.warehouse IN %(warehouses)s
-		GROUP BY sii.item_code, sii.warehouse
-	""", {
-		"company": company,
-		"from_date": from_date,
-		"to_date": to_date,
-		"item_codes": item_codes,
-		"warehouses": tuple(warehouses)
-	}, as_dict=1)
+	publish_report_progress(90)
 
-	sales_map = defaultdict(lambda: defaultdict(float))
-	for s in sales_data:
-		if s.warehouse:
-			sales_map[s.item_code][s.warehouse] = flt(s.total_sold_qty)
+	actual, ordered, sold = actual.tolist(), ordered.tolist(), sold.tolist()
+	forecast, required_qty, required_tons = forecast.tolist(), required_qty.tolist(), required_tons.tolist()
 
 	result_items = []
-	for item in items:
-		ic = item.item_code
+	for i, item in enumerate(items):
 		item_stock = {}
 		item_sales = {}
+		item_required = {}
 
-		for wh in warehouses:
-			sd = stock_map[ic][wh]
+		for w, wh in enumerate(warehouses):
 			item_stock[wh] = {
-				"actual_qty": sd["actual_qty"],
-				"ordered_qty": sd["ordered_qty"]
+				"actual_qty": actual[i][w],
+				"ordered_qty": ordered[i][w]
+			}
+			item_sales[wh] = sold[i][w]
+			item_required[wh] = {
+				"forecast_qty": round(forecast[i][w], 2),
+				"required_qty": required_qty[i][w],
+				"required_tons": round(required_tons[i][w], 3)
 			}
-			item_sales[wh] = sales_map[ic].get(wh, 0)
 
 		result_items.append({
-			"item_code": ic,
+			"item_code": item.item_code,
 			"item_name": item.item_name,
 			"weight_per_unit": item.weight_per_unit,
 			"custom_length": item.custom_length,
 			"item_group": item.item_group,
 			"stock_data": item_stock,
-			"sales_data": item_sales
+			"sales_data": item_sales,
+			"required_data": item_required
 		})
 
 	return {
@@ -236,15 +216,16 @@ def get_purchase_requirements_data(company, from_date, to_date,
 def export_excel(company, from_date, to_date,
 	item_groups=None, warehouses=None, lengths=None, actual_required=None):
 
-	from openpyxl import Workbook
 	from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-	from openpyxl.utils import get_column_letter
 
 	if not has_permission_to_view():
 		frappe.throw(_("You don't have permission to view this report"))
 
-	# Get same data as the report
-	result = get_purchase_requirements_data(company, from_date, to_date,
+	# Same data as the report - reuse the result of the report job when still cached
+	result = get_report_job_result("purchase_requirements_report", {
+		"company": company, "from_date": from_date, "to_date": to_date,
+		"item_groups": item_groups, "warehouses": warehouses, "lengths": lengths
+	}) or get_purchase_requirements_data(company, from_date, to_date,
 		item_groups, warehouses, lengths)
 
 	items = result.get("items", [])
@@ -256,28 +237,7 @@ def export_excel(company, from_date, to_date,
 	if not actual_required:
 		actual_required = {}
 
-	wb = Workbook()
-	ws = wb.active
-	ws.title = "شيت المشتريات"
-	ws.sheet_view.rightToLeft = True
-
-	# Styles
-	header_font = Font(name='Segoe UI', bold=True, size=12, color='FFFFFF')
-	sub_header_font = Font(name='Segoe UI', bold=True, size=10, color='FFFFFF')
-	data_font = Font(name='Segoe UI', bold=True, size=10)
-	total_font = Font(name='Segoe UI', bold=True, size=11, color='1e293b')
-
-	dark_fill = PatternFill(start_color='0f172a', end_color='1e293b', fill_type='solid')
-	item_fill = PatternFill(start_color='eef2ff', end_color='eef2ff', fill_type='solid')
-	item_fill_alt = PatternFill(start_color='e0e7ff', end_color='e0e7ff', fill_type='solid')
-	wh_even_fill = PatternFill(start_color='1e3a5f', end_color='1e3a5f', fill_type='solid')
-	wh_odd_fill = PatternFill(start_color='2d1b69', end_color='2d1b69', fill_type='solid')
-	wh_sub_even = PatternFill(start_color='1e3a5f', end_color='1e3a5f', fill_type='solid')
-	wh_sub_odd = PatternFill(start_color='2d1b69', end_color='2d1b69', fill_type='solid')
-	data_even_fill = PatternFill(start_color='f8fafc', end_color='f8fafc', fill_type='solid')
-	data_odd_fill = PatternFill(start_color='f0f4ff', end_color='f0f4ff', fill_type='solid')
-	total_fill = PatternFill(start_color='f1f5f9', end_color='f1f5f9', fill_type='solid')
-
+	# Named styles, registered once in the workbook
 	thin_border = Border(
 		left=Side(style='thin', color='cbd5e1'),
 		right=Side(style='thin', color='cbd5e1'),
@@ -287,6 +247,31 @@ def export_excel(company, from_date, to_date,
 	center_align = Alignment(horizontal='center', vertical='center', wrap_text=True)
 	right_align = Alignment(horizontal='right', vertical='center', wrap_text=True)
 
+	def fill(color, end_color=None):
+		return PatternFill(start_color=color, end_color=end_color or color, fill_type='solid')
+
+	def style(name, size, color, fill_color, alignment=center_align):
+		return make_style(name, font=Font(name='Segoe UI', bold=True, size=size, color=color),
+			fill=fill_color, alignment=alignment, border=thin_border)
+
+	dark_fill = fill('0f172a', '1e293b')
+	styles = [
+		style('pr_header', 12, 'FFFFFF', dark_fill),
+		style('pr_header_wh_even', 12, 'FFFFFF', fill('1e3a5f')),
+		style('pr_header_wh_odd', 12, 'FFFFFF', fill('2d1b69')),
+		style('pr_sub_header', 10, 'FFFFFF', dark_fill),
+		style('pr_sub_header_wh_even', 10, 'FFFFFF', fill('1e3a5f')),
+		style('pr_sub_header_wh_odd', 10, 'FFFFFF', fill('2d1b69')),
+		style('pr_group', 12, 'FFFFFF', fill('6366f1', '8b5cf6'), Alignment(horizontal='right', vertical='center')),
+		style('pr_item', 10, None, fill('eef2ff')),
+		style('pr_item_alt', 10, None, fill('e0e7ff')),
+		style('pr_item_name', 10, None, fill('eef2ff'), right_align),
+		style('pr_item_name_alt', 10, None, fill('e0e7ff'), right_align),
+		style('pr_data_even', 10, None, fill('f8fafc')),
+		style('pr_data_odd', 10, None, fill('f0f4ff')),
+		style('pr_total', 11, '1e293b', fill('f1f5f9')),
+	]
+
 	# Column layout:
 	# 6 item detail cols + 7 per warehouse + 5 total cols
 	item_cols = ['#', 'رقم الصنف', 'اسم الصنف', 'الوزن', 'الطول', 'نوع الجسر']
@@ -297,79 +282,38 @@ def export_excel(company, from_date, to_date,
 	num_wh_subs = len(wh_sub_cols)
 	num_total_cols = len(total_cols)
 	total_columns = num_item_cols + (num_wh_subs * len(wh_list)) + num_total_cols
+	totals_start = num_item_cols + 1 + (len(wh_list) * num_wh_subs)
+
+	# Column widths: index #, item code, item name (wider), then the numbers
+	column_widths = {col: 12 for col in range(1, total_columns + 1)}
+	column_widths.update({1: 5, 2: 14, 3: 28})
+
+	# Freeze panes: freeze the first 2 rows
+	writer = XlsxStreamWriter("شيت المشتريات", styles, column_widths, freeze_panes='A3', right_to_left=True)
+
+	def wh_style(prefix, wh_idx):
+		return prefix + ('_wh_even' if wh_idx % 2 == 0 else '_wh_odd')
 
 	# ---- Row 1: Group headers with merged cells ----
-	row1 = 1
-	# Item details merged header
-	ws.merge_cells(start_row=row1, start_column=1, end_row=row1, end_column=num_item_cols)
-	cell = ws.cell(row=row1, column=1, value='بيانات الصنف')
-	cell.font = header_font
-	cell.fill = dark_fill
-	cell.alignment = center_align
-	cell.border = thin_border
-
-	# Warehouse merged headers
+	row = [('بيانات الصنف', 'pr_header')] + [(None, 'pr_header')] * (num_item_cols - 1)
+	merge = [(1, num_item_cols)]
 	for wh_idx, wh in enumerate(wh_list):
-		wh_short = wh.replace(' - م', '')
 		start_col = num_item_cols + 1 + (wh_idx * num_wh_subs)
-		end_col = start_col + num_wh_subs - 1
-		ws.merge_cells(start_row=row1, start_column=start_col, end_row=row1, end_column=end_col)
-		cell = ws.cell(row=row1, column=start_col, value=wh_short)
-		cell.font = header_font
-		cell.fill = wh_even_fill if wh_idx % 2 == 0 else wh_odd_fill
-		cell.alignment = center_align
-		cell.border = thin_border
-
-	# Totals merged header
-	totals_start = num_item_cols + 1 + (len(wh_list) * num_wh_subs)
-	ws.merge_cells(start_row=row1, start_column=totals_start, end_row=row1, end_column=total_columns)
-	cell = ws.cell(row=row1, column=totals_start, value='الإجماليات')
-	cell.font = header_font
-	cell.fill = dark_fill
-	cell.alignment = center_align
-	cell.border = thin_border
-
-	# Fill borders for merged cells
-	for col in range(1, total_columns + 1):
-		c = ws.cell(row=row1, column=col)
-		c.border = thin_border
-		if not c.fill or c.fill.start_color.rgb == '00000000':
-			c.fill = dark_fill
-			c.font = header_font
-			c.alignment = center_align
+		header_style = wh_style('pr_header', wh_idx)
+		row += [(wh.replace(' - م', ''), header_style)] + [(None, header_style)] * (num_wh_subs - 1)
+		merge.append((start_col, start_col + num_wh_subs - 1))
+	row += [('الإجماليات', 'pr_header')] + [(None, 'pr_header')] * (num_total_cols - 1)
+	merge.append((totals_start, total_columns))
+	writer.append(row, height=30, merge=merge)
 
 	# ---- Row 2: Sub-headers ----
-	row2 = 2
-	for i, name in enumerate(item_cols):
-		cell = ws.cell(row=row2, column=i + 1, value=name)
-		cell.font = sub_header_font
-		cell.fill = dark_fill
-		cell.alignment = center_align
-		cell.border = thin_border
-
+	row = [(name, 'pr_sub_header') for name in item_cols]
 	for wh_idx in range(len(wh_list)):
-		for sub_idx, sub_name in enumerate(wh_sub_cols):
-			col = num_item_cols + 1 + (wh_idx * num_wh_subs) + sub_idx
-			cell = ws.cell(row=row2, column=col, value=sub_name)
-			cell.font = sub_header_font
-			cell.fill = wh_sub_even if wh_idx % 2 == 0 else wh_sub_odd
-			cell.alignment = center_align
-			cell.border = thin_border
-
-	for i, name in enumerate(total_cols):
-		col = totals_start + i
-		cell = ws.cell(row=row2, column=col, value=name)
-		cell.font = sub_header_font
-		cell.fill = dark_fill
-		cell.alignment = center_align
-		cell.border = thin_border
-
-	# Style for group separator rows
-	group_font = Font(name='Segoe UI', bold=True, size=12, color='FFFFFF')
-	group_fill = PatternFill(start_color='6366f1', end_color='8b5cf6', fill_type='solid')
+		row += [(name, wh_style('pr_sub_header', wh_idx)) for name in wh_sub_cols]
+	row += [(name, 'pr_sub_header') for name in total_cols]
+	writer.append(row, height=25)
 
 	# ---- Data rows ----
-	data_row = 3
 	visible_idx = 0
 	current_group = ''
 	for item in items:
@@ -387,43 +331,36 @@ def export_excel(company, from_date, to_date,
 		# Add group separator row when item_group changes
 		if item.get("item_group") != current_group:
 			current_group = item.get("item_group", "")
-			ws.merge_cells(start_row=data_row, start_column=1, end_row=data_row, end_column=total_columns)
-			cell = ws.cell(row=data_row, column=1, value=current_group)
-			cell.font = group_font
-			cell.fill = group_fill
-			cell.alignment = Alignment(horizontal='right', vertical='center')
-			cell.border = thin_border
-			for c in range(2, total_columns + 1):
-				ws.cell(row=data_row, column=c).border = thin_border
-				ws.cell(row=data_row, column=c).fill = group_fill
-			ws.row_dimensions[data_row].height = 28
-			data_row += 1
-
-		row_fill = item_fill if visible_idx % 2 == 0 else item_fill_alt
+			writer.append([(current_group, 'pr_group')] + [(None, 'pr_group')] * (total_columns - 1),
+				height=28, merge=[(1, total_columns)])
+
+		alt = '' if visible_idx % 2 == 0 else '_alt'
 		visible_idx += 1
 
 		# Item details
 		item_values = [visible_idx, item["item_code"], item["item_name"], item["weight_per_unit"], item["custom_length"], item["item_group"]]
-		for i, val in enumerate(item_values):
-			cell = ws.cell(row=data_row, column=i + 1, value=val)
-			cell.font = data_font
-			cell.fill = row_fill
-			cell.alignment = right_align if i == 2 else center_align
-			cell.border = thin_border
+		row = [(val, ('pr_item_name' if i == 2 else 'pr_item') + alt) for i, val in enumerate(item_values)]
 
 		grand_stock = 0
 		grand_ordered = 0
 		grand_sales = 0
+		grand_actual_req = 0
 
 		for wh_idx, wh in enumerate(wh_list):
-			wh_fill = data_even_fill if wh_idx % 2 == 0 else data_odd_fill
+			data_style = 'pr_data_even' if wh_idx % 2 == 0 else 'pr_data_odd'
 			sd = item.get("stock_data", {}).get(wh, {})
 			actual_qty = flt(sd.get("actual_qty", 0))
 			ordered_qty = flt(sd.get("ordered_qty", 0))
 			total_qty = actual_qty + ordered_qty
 			sales_qty = flt(item.get("sales_data", {}).get(wh, 0))
-			required_pcs = max(0, (sales_qty - total_qty)) * 1.1
-			required_tons = required_pcs * flt(item.get("weight_per_unit", 0)) / 1000
+			# Forecast based requirement of the report, shortfall of the period sales otherwise
+			required = item.get("required_data", {}).get(wh)
+			if required:
+				required_pcs = flt(required.get("required_qty"))
+				required_tons = flt(required.get("required_tons"))
+			else:
+				required_pcs = max(0, (sales_qty - total_qty)) * 1.1
+				required_tons = required_pcs * flt(item.get("weight_per_unit", 0)) / 1000
 
 			grand_stock += actual_qty
 			grand_ordered += ordered_qty
@@ -432,65 +369,19 @@ def export_excel(company, from_date, to_date,
 			# Get actual required from input data
 			ar_key = "{}|{}".format(item["item_code"], wh)
 			actual_req = flt(actual_required.get(ar_key, 0))
+			grand_actual_req += actual_req
 
-			wh_values = [actual_qty, ordered_qty, total_qty, sales_qty, round(required_pcs), round(required_tons, 2), actual_req or '']
-			for sub_idx, val in enumerate(wh_values):
-				col = num_item_cols + 1 + (wh_idx * num_wh_subs) + sub_idx
-				cell = ws.cell(row=data_row, column=col, value=val if val != '' else None)
-				cell.font = data_font
-				cell.fill = wh_fill
-				cell.alignment = center_align
-				cell.border = thin_border
+			wh_values = [actual_qty, ordered_qty, total_qty, sales_qty, round(required_pcs), round(required_tons, 2), actual_req or None]
+			row += [(val, data_style) for val in wh_values]
 
 		grand_total = grand_stock + grand_ordered
 		grand_stock_tons = grand_total * flt(item.get("weight_per_unit", 0)) / 1000
 		grand_sales_tons = grand_sales * flt(item.get("weight_per_unit", 0)) / 1000
 
-		# Sum actual required for this item
-		grand_actual_req = 0
-		for wh in wh_list:
-			ar_key = "{}|{}".format(item["item_code"], wh)
-			grand_actual_req += flt(actual_required.get(ar_key, 0))
-
-		total_values = [grand_total, round(grand_stock_tons, 2), grand_sales, round(grand_sales_tons, 2), grand_actual_req or '']
-		for i, val in enumerate(total_values):
-			col = totals_start + i
-			cell = ws.cell(row=data_row, column=col, value=val if val != '' else None)
-			cell.font = total_font
-			cell.fill = total_fill
-			cell.alignment = center_align
-			cell.border = thin_border
-
-		data_row += 1
-
-	# Auto-fit column widths
-	for col in range(1, total_columns + 1):
-		col_letter = get_column_letter(col)
-		if col == 1:  # index #
-			ws.column_dimensions[col_letter].width = 5
-		elif col == 2:  # item code
-			ws.column_dimensions[col_letter].width = 14
-		elif col == 3:  # item name - wider
-			ws.column_dimensions[col_letter].width = 28
-		else:
-			ws.column_dimensions[col_letter].width = 12
-
-	# Freeze panes: freeze first 2 rows and first 5 columns
-	ws.freeze_panes = 'A3'
-
-	# Row heights
-	ws.row_dimensions[1].height = 30
-	ws.row_dimensions[2].height = 25
-
-	# Save to BytesIO
-	output = io.BytesIO()
-	wb.save(output)
-	output.seek(0)
-	xlsx_data = output.getvalue()
+		total_values = [grand_total, round(grand_stock_tons, 2), grand_sales, round(grand_sales_tons, 2), grand_actual_req or None]
+		row += [(val, 'pr_total') for val in total_values]
 
-	filename = "purchase_requirements_{}_{}.xlsx".format(filters.get("from_date", ""), filters.get("to_date", ""))
+		writer.append(row)
 
-	frappe.local.response.filename = filename
-	frappe.local.response.filecontent = xlsx_data
-	frappe.local.response.type = "download"
-	frappe.local.response.content_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+	filename = "purchase_requirements_{}_{}.xlsx".format(filters.get("from_date", ""), filters.get("to_date", ""))
+	writer.send(filename)
@@ -7,7 +7,16 @@ frappe.pages['sales-invoice-realtime'].on_page_load = function(wrapper) {
 
 	$(wrapper).find('.page-head').hide();
 
-	new SalesInvoiceRealtimeDashboard(wrapper);
+	wrapper.dashboard = new SalesInvoiceRealtimeDashboard(wrapper);
+
+	// Stop listening while another page is shown
+	$(wrapper).on('hide', () => wrapper.dashboard.destroy());
+};
+
+frappe.pages['sales-invoice-realtime'].on_page_show = function(wrapper) {
+	if (wrapper.dashboard) {
+		wrapper.dashboard.resume();
+	}
 };
 
 class SalesInvoiceRealtimeDashboard {
@@ -33,7 +42,9 @@ class SalesInvoiceRealtimeDashboard {
 		this.current_popup_invoice = null;
 		this.popup_show_time = null;
 		this.polling_interval = null;
+		this.subscribed = false;
 		this.last_checked_invoice = null;
+		this.invoices = [];
 
 		this.init();
 	}
@@ -44,6 +55,7 @@ class SalesInvoiceRealtimeDashboard {
 		this.setup_layout();
 		console.log('Layout setup complete');
 		this.load_invoices();
+		this.subscribe();
 		this.start_polling();
 	}
 
@@ -846,7 +858,8 @@ class SalesInvoiceRealtimeDashboard {
 
 			if (response.message && response.message.length > 0) {
 				console.log(`Found ${response.message.length} invoices`);
-				this.render_invoice_list(response.message);
+				this.invoices = response.message;
+				this.render_invoice_list(this.invoices);
 
 				const latest = response.message[0];
 				if (!this.last_checked_invoice || this.last_checked_invoice !== latest.name) {
@@ -1088,31 +1101,54 @@ class SalesInvoiceRealtimeDashboard {
 		this.current_popup_invoice = null;
 	}
 
+	subscribe() {
+		// Submitted invoices are pushed by the server (Sales Invoice on_submit)
+		this.on_invoice_pushed = (invoice) => this.show_new_invoice(invoice);
+		frappe.realtime.doctype_subscribe('Sales Invoice');
+		frappe.realtime.on('sales_invoice_realtime', this.on_invoice_pushed);
+		this.subscribed = true;
+	}
+
+	resume() {
+		// Back on the page after destroy(): catch up and listen again
+		if (this.subscribed) return;
+		this.load_invoices();
+		this.subscribe();
+		this.start_polling();
+	}
+
+	show_new_invoice(invoice) {
+		if (!invoice || invoice.name === this.last_checked_invoice) return;
+
+		// Close current popup immediately and show new one
+		if (this.current_popup_invoice) {
+			this.hide_popup_immediately();
+		}
+		this.show_popup(invoice);
+		this.last_checked_invoice = invoice.name;
+
+		this.invoices = [invoice].concat(this.invoices.filter(inv => inv.name !== invoice.name)).slice(0, 50);
+		this.render_invoice_list(this.invoices);
+	}
+
 	start_polling() {
+		// Fallback for missed pushes: the server answers with nothing while
+		// the latest invoice is still the one on screen
 		this.polling_interval = setInterval(async () => {
 			try {
 				const response = await frappe.call({
 					method: 'expenses_management.expenses_management.page.sales_invoice_realtime.sales_invoice_realtime.get_latest_invoice',
+					args: { since: this.last_checked_invoice },
 					freeze: false
 				});
 
 				if (response.message) {
-					const latest = response.message;
-
-					if (!this.last_checked_invoice || this.last_checked_invoice !== latest.name) {
-						// Close current popup immediately and show new one
-						if (this.current_popup_invoice) {
-							this.hide_popup_immediately();
-						}
-						this.show_popup(latest);
-						this.last_checked_invoice = latest.name;
-						this.load_invoices();
-					}
+					this.show_new_invoice(response.message);
 				}
 			} catch (error) {
 				console.error('Polling error:', error);
 			}
-		}, 5000);
+		}, 30000);
 	}
 
 	destroy() {
@@ -1121,6 +1157,12 @@ class SalesInvoiceRealtimeDashboard {
 		}
 		if (this.polling_interval) {
 			clearInterval(this.polling_interval);
+			this.polling_interval = null;
+		}
+		if (this.subscribed) {
+			frappe.realtime.off('sales_invoice_realtime', this.on_invoice_pushed);
+			frappe.realtime.doctype_unsubscribe('Sales Invoice');
+			this.subscribed = false;
 		}
 	}
 }
@@ -161,7 +161,24 @@ frappe.query_reports["Almouhana Financial Statement"] = {
 		}
 		return value;
 	},
-	onload: function () {
+	onload: function (report) {
+		if (frappe.user.has_role("System Manager")) {
+			report.page.add_inner_button(__("Cache Statistics"), function () {
+				frappe.call({
+					method: "expenses_management.expenses_management.report_cache.report_cache.get_report_cache_stats",
+					callback: function (r) {
+						let rows = (r.message || [])
+							.map((d) => `<tr><td>${d.report}</td><td>${d.hits}</td><td>${d.misses}</td><td>${d.hit_ratio}%</td></tr>`)
+							.join("");
+						frappe.msgprint({
+							title: __("Report Cache Statistics"),
+							message: `<table class="table table-bordered"><tr><th>${__("Report")}</th><th>${__("Hits")}</th><th>${__("Misses")}</th><th>${__("Hit Ratio")}</th></tr>${rows}</table>`,
+						});
+					},
+				});
+			});
+		}
+
 		let fiscal_year = erpnext.utils.get_fiscal_year(frappe.datetime.get_today());
 
 		frappe.model.with_doc("Fiscal Year", fiscal_year, function (r) {
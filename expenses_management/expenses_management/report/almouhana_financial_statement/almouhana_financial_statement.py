@@ -5,6 +5,7 @@
 from collections import defaultdict
 
 import frappe
+import numpy as np
 from frappe import _
 from frappe.query_builder import Criterion
 from frappe.utils import flt, getdate
@@ -40,6 +41,8 @@ from erpnext.accounts.report.profit_and_loss_statement.profit_and_loss_statement
 from erpnext.accounts.report.utils import convert, convert_to_presentation_currency
 from erpnext.accounts.utils import get_zero_cutoff
 
+from expenses_management.expenses_management.report_cache.report_cache import get_cached_report_result
+
 value_fields = (
 	"opening_debit",
 	"opening_credit",
@@ -51,6 +54,16 @@ value_fields = (
 
 
 def execute(filters=None):
+	if not filters.get("company"):
+		return [], [], [], []
+
+	# Results are reused until a new GL posting lands in the company tree
+	return get_cached_report_result(
+		"Almouhana Financial Statement", filters, lambda: get_report_result(filters)
+	)
+
+
+def get_report_result(filters):
 	columns, data, message, chart = [], [], [], []
 
 	if not filters.get("company"):
@@ -343,29 +356,27 @@ def get_trial_balance_data(fiscal_year, companies, filters):
 			root_type=root.root_type,
 		)
 
-	# Always calculate per each subsidiary company
-	calculate_trial_balance_values(
-		accounts_by_name, gl_entries_by_account, companies_list,
-		companies, filters, start_date
-	)
-	accumulate_trial_balance_values_into_parents(accounts, accounts_by_name, companies_list)
-	apply_opening_closing_for_parents(accounts, accounts_by_name, parent_children_map, companies_list)
+	# Always calculate per each subsidiary company, values are held in an
+	# (accounts x companies x value_fields) matrix until output
+	tb = build_trial_balance_matrix(accounts_by_name, gl_entries_by_account, companies_list, start_date)
 
-	# If accumulated, also compute the group total by summing all subsidiaries
-	if accumulated:
-		compute_accumulated_group_values(accounts, accounts_by_name, companies_list, group_company)
+	# Net leaves, roll up into parents, net parents and, if accumulated,
+	# add the group total by summing all subsidiaries
+	calculate_trial_balance_matrix(
+		tb, accounts, accounts_by_name, parent_children_map, companies_list, accumulated
+	)
 
 	# Determine which columns to show in data
 	display_companies = list(companies_list)
 	if accumulated:
 		display_companies.append(group_company + "_total")
 
-	data = prepare_trial_balance_data(accounts, filters, parent_children_map, display_companies, company_currency)
+	data = prepare_trial_balance_data(accounts, tb, display_companies, company_currency)
 	data = filter_out_zero_value_rows(
 		data, parent_children_map, show_zero_values=filters.get("show_zero_values")
 	)
 
-	total_row = calculate_trial_balance_total_row(accounts, display_companies, company_currency)
+	total_row = calculate_trial_balance_total_row(accounts, tb, display_companies, company_currency)
 	data.extend([{}, total_row])
 
 	columns = get_trial_balance_columns(companies_list, filters, is_group, accumulated, group_company)
@@ -373,20 +384,6 @@ def get_trial_balance_data(fiscal_year, companies, filters):
 	return columns, data, None
 
 
-def compute_accumulated_group_values(accounts, accounts_by_name, companies_list, group_company):
-	"""Sum all subsidiary company values into a group total pseudo-company column."""
-	total_key = group_company + "_total"
-
-	for key, account in accounts_by_name.items():
-		for field in value_fields:
-			total_field = total_key + "_" + field
-			account[total_field] = 0.0
-			for company in companies_list:
-				account[total_field] += flt(account.get(company + "_" + field, 0.0))
-
-	# Also set on account objects in the list (they reference same dicts via accounts_by_name)
-
-
 def get_trial_balance_columns(companies, filters, is_group=False, accumulated=False, group_company=None):
 	columns = [
 		{
@@ -481,96 +478,117 @@ def _make_tb_columns(company_key, apply_currency_formatter, label_prefix=""):
 	]
 
 
-def calculate_trial_balance_values(accounts_by_name, gl_entries_by_account, companies_list, companies, filters, start_date):
-	"""Calculate opening, period, and closing debit/credit values per each company.
+def build_trial_balance_matrix(accounts_by_name, gl_entries_by_account, companies_list, start_date):
+	"""Load GL entries into an (accounts x companies x value_fields) matrix.
 
-	Each GL entry goes to the company it belongs to.
+	Each GL entry goes to the company it belongs to, split into opening
+	(before start date) and period debit/credit. Closing = opening + period.
+	Rows are indexed by the identity of the account dicts in accounts_by_name.
 	"""
-	for key, account in accounts_by_name.items():
-		# Initialize values for all companies
-		for company in companies_list:
-			account[company + "_opening_debit"] = 0.0
-			account[company + "_opening_credit"] = 0.0
-			account[company + "_debit"] = 0.0
-			account[company + "_credit"] = 0.0
-			account[company + "_closing_debit"] = 0.0
-			account[company + "_closing_credit"] = 0.0
+	row_index = {id(account): idx for idx, account in enumerate(accounts_by_name.values())}
+	company_index = {company: idx for idx, company in enumerate(companies_list)}
+	start_date = getdate(start_date)
 
+	rows, cols, fields, amounts = [], [], [], []
+	for key, account in accounts_by_name.items():
+		row = row_index[id(account)]
 		for entry in gl_entries_by_account.get(key, []):
-			entry_company = entry.company
+			col = company_index.get(entry.company)
+			if col is None:
+				continue
 
-			for company in companies_list:
-				if entry_company != company:
-					continue
+			# opening_debit/opening_credit or debit/credit
+			field = 0 if entry.posting_date < start_date else 2
+			rows.extend((row, row))
+			cols.extend((col, col))
+			fields.extend((field, field + 1))
+			amounts.extend((flt(entry.debit), flt(entry.credit)))
 
-				debit, credit = flt(entry.debit), flt(entry.credit)
+	values = np.zeros((len(row_index), len(companies_list), len(value_fields)))
+	if amounts:
+		np.add.at(values, (np.array(rows), np.array(cols), np.array(fields)), np.array(amounts))
 
-				if entry.posting_date < getdate(start_date):
-					account[company + "_opening_debit"] += debit
-					account[company + "_opening_credit"] += credit
-				else:
-					account[company + "_debit"] += debit
-					account[company + "_credit"] += credit
-
-		# Calculate closing = opening + period
-		for company in companies_list:
-			account[company + "_closing_debit"] = account[company + "_opening_debit"] + account[company + "_debit"]
-			account[company + "_closing_credit"] = account[company + "_opening_credit"] + account[company + "_credit"]
-
-		# Apply opening/closing netting for leaf (non-group) accounts based on root_type
-		is_group_account = account.get("is_group", 0)
-		if not is_group_account:
-			root_type = account.get("root_type", "")
-			for company in companies_list:
-				_apply_opening_closing_netting(account, company, root_type)
-
-
-def _apply_opening_closing_netting(row, company_key, root_type):
-	"""Net opening/closing Dr/Cr based on root_type.
-
-	Asset, Equity, Expense accounts are naturally Debit-side.
-	Liability, Income accounts are naturally Credit-side.
+	values[:, :, 4] = values[:, :, 0] + values[:, :, 2]
+	values[:, :, 5] = values[:, :, 1] + values[:, :, 3]
+
+	return frappe._dict(matrix=values, row_index=row_index)
+
+
+def apply_opening_closing_netting(values, row_mask):
+	"""Net opening/closing Dr/Cr of the masked rows.
+
+	Asset, Equity, Expense accounts are naturally Debit-side and Liability,
+	Income accounts Credit-side, but either way the net balance ends up on the
+	side it falls on: Dr = max(Dr - Cr, 0), Cr = max(Cr - Dr, 0). Period
+	debit/credit are left untouched.
 	"""
-	dr_or_cr = "debit" if root_type in ("Asset", "Equity", "Expense") else "credit"
-	reverse_dr_or_cr = "credit" if dr_or_cr == "debit" else "debit"
-
-	for col_type in ("opening", "closing"):
-		valid_col = company_key + "_" + col_type + "_" + dr_or_cr
-		reverse_col = company_key + "_" + col_type + "_" + reverse_dr_or_cr
-		row[valid_col] -= row[reverse_col]
-		if row[valid_col] < 0:
-			row[reverse_col] = abs(row[valid_col])
-			row[valid_col] = 0.0
-		else:
-			row[reverse_col] = 0.0
+	for debit_field, credit_field in ((0, 1), (4, 5)):
+		net = values[row_mask, :, debit_field] - values[row_mask, :, credit_field]
+		values[row_mask, :, debit_field] = np.maximum(net, 0.0)
+		values[row_mask, :, credit_field] = np.maximum(-net, 0.0)
 
 
-def accumulate_trial_balance_values_into_parents(accounts, accounts_by_name, companies):
-	"""Accumulate children's values in parent accounts."""
-	for d in reversed(accounts):
-		if d.parent_account_name and d.parent_account_name in accounts_by_name:
-			parent = accounts_by_name[d.parent_account_name]
-			for company in companies:
-				for field in value_fields:
-					company_field = company + "_" + field
-					parent[company_field] = parent.get(company_field, 0.0) + d.get(company_field, 0.0)
+def accumulate_trial_balance_matrix_into_parents(tb, accounts, accounts_by_name):
+	"""Accumulate children's values into parent accounts, deepest level first.
+
+	All children of one depth are added to their parents with a single
+	scatter-add, so the cost is one vector operation per tree level.
+	"""
+	parent_of = {}
+	for d in accounts:
+		parent = accounts_by_name.get(d.parent_account_name) if d.parent_account_name else None
+		if parent is not None and parent is not d:
+			parent_of[tb.row_index[id(d)]] = tb.row_index[id(parent)]
+
+	def get_depth(row, seen=()):
+		parent = parent_of.get(row)
+		if parent is None or parent in seen:
+			return 0
+		return get_depth(parent, seen + (row,)) + 1
+
+	levels = defaultdict(list)
+	for child in parent_of:
+		levels[get_depth(child)].append(child)
+
+	for depth in sorted(levels, reverse=True):
+		children = np.array(levels[depth])
+		parents = np.array([parent_of[c] for c in levels[depth]])
+		np.add.at(tb.matrix, parents, tb.matrix[children])
+
+
+def calculate_trial_balance_matrix(tb, accounts, accounts_by_name, parent_children_map, companies_list, accumulated):
+	"""Net leaves, accumulate into parents, net parents and add the group total column."""
+	leaf_mask = np.zeros(len(tb.row_index), dtype=bool)
+	parent_mask = np.zeros(len(tb.row_index), dtype=bool)
 
+	for account in accounts_by_name.values():
+		if not account.get("is_group", 0):
+			leaf_mask[tb.row_index[id(account)]] = True
 
-def apply_opening_closing_for_parents(accounts, accounts_by_name, parent_children_map, companies):
-	"""Apply opening/closing netting for parent (group) accounts after accumulation."""
 	for d in accounts:
 		if parent_children_map.get(d.get("account_key") or d.get("name")):
-			root_type = d.get("root_type", "")
-			for company in companies:
-				_apply_opening_closing_netting(d, company, root_type)
+			parent_mask[tb.row_index[id(d)]] = True
+
+	apply_opening_closing_netting(tb.matrix, leaf_mask)
+	accumulate_trial_balance_matrix_into_parents(tb, accounts, accounts_by_name)
+	apply_opening_closing_netting(tb.matrix, parent_mask)
 
+	# Group total pseudo-company = sum of all subsidiary companies
+	if accumulated:
+		tb.matrix = np.concatenate([tb.matrix, tb.matrix.sum(axis=1, keepdims=True)], axis=1)
 
-def prepare_trial_balance_data(accounts, filters, parent_children_map, display_companies, company_currency):
-	"""Prepare data rows for trial balance."""
+
+def prepare_trial_balance_data(accounts, tb, display_companies, company_currency):
+	"""Materialize the output rows from the value matrix."""
 	data = []
+	zero_cutoff = get_zero_cutoff(company_currency)
+	fieldnames = [company + "_" + field for company in display_companies for field in value_fields]
+
+	rounded = np.round(tb.matrix, 3)
+	has_values = (np.abs(rounded) >= zero_cutoff).any(axis=(1, 2))
 
 	for d in accounts:
-		has_value = False
+		idx = tb.row_index[id(d)]
 		row = frappe._dict({
 			"account_name": (
 				f"{_(d.account_number)} - {_(d.account_name)}" if d.account_number else _(d.account_name)
@@ -580,21 +598,14 @@ def prepare_trial_balance_data(accounts, filters, parent_children_map, display_c
 			"indent": flt(d.indent),
 			"currency": company_currency,
 		})
-
-		for company in display_companies:
-			for field in value_fields:
-				company_field = company + "_" + field
-				row[company_field] = flt(d.get(company_field, 0.0), 3)
-				if abs(row[company_field]) >= get_zero_cutoff(company_currency):
-					has_value = True
-
-		row["has_value"] = has_value
+		row.update(zip(fieldnames, rounded[idx].ravel().tolist()))
+		row["has_value"] = bool(has_values[idx])
 		data.append(row)
 
 	return data
 
 
-def calculate_trial_balance_total_row(accounts, display_companies, company_currency):
+def calculate_trial_balance_total_row(accounts, tb, display_companies, company_currency):
 	"""Calculate total row from root accounts."""
 	total_row = {
 		"account_name": "'" + _("Total") + "'",
@@ -606,16 +617,12 @@ def calculate_trial_balance_total_row(accounts, display_companies, company_curre
 		"currency": company_currency,
 	}
 
-	for company in display_companies:
-		for field in value_fields:
-			total_row[company + "_" + field] = 0.0
+	root_rows = [tb.row_index[id(d)] for d in accounts if not d.parent_account]
+	totals = tb.matrix[root_rows].sum(axis=0) if root_rows else np.zeros(tb.matrix.shape[1:])
 
-	for d in accounts:
-		if not d.parent_account:
-			for company in display_companies:
-				for field in value_fields:
-					company_field = company + "_" + field
-					total_row[company_field] += d.get(company_field, 0.0)
+	for company_idx, company in enumerate(display_companies):
+		for field_idx, field in enumerate(value_fields):
+			total_row[company + "_" + field] = float(totals[company_idx, field_idx])
 
 	return total_row
 
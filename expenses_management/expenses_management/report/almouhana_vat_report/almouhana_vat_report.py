@@ -1,20 +1,63 @@
 import frappe
 from frappe import _
 
+from expenses_management.expenses_management.report_cache.report_cache import get_cached_report_result
+from expenses_management.expenses_management.vat_ledger.vat_ledger import is_vat_ledger_ready
 
-def get_descendants_of(company):
-    """Get all descendant companies of a group company (recursive)"""
+
+def get_company_tree(company):
+    """Get the company and all its descendants with their is_group flag in one query"""
     lft, rgt = frappe.db.get_value("Company", company, ["lft", "rgt"])
     if lft and rgt:
-        return frappe.db.sql_list(
+        return frappe.db.sql(
             """
-            SELECT name FROM `tabCompany`
+            SELECT name, is_group FROM `tabCompany`
             WHERE lft >= %s AND rgt <= %s
             ORDER BY name
             """,
             (lft, rgt),
+            as_dict=True,
         )
-    return [company]
+    return [frappe._dict(name=company, is_group=0)]
+
+
+def resolve_filters(filters):
+    """
+    Resolve the report filters once per run.
+
+    Holds the company set (the company and its descendants for a group),
+    the leaf companies for consolidation and the date bounds. Every section
+    query binds `companies`, `from_date` and `to_date` as parameters, so the
+    company tree is looked up once and the SQL text stays the same across
+    sections and companies.
+    """
+    filters = filters or {}
+    resolved = frappe._dict(
+        company=filters.get("company"),
+        from_date=filters.get("from_date"),
+        to_date=filters.get("to_date"),
+        is_group=0,
+        companies=None,
+        leaf_companies=[],
+    )
+
+    if resolved.company:
+        tree = get_company_tree(resolved.company)
+        resolved.is_group = next((c.is_group for c in tree if c.name == resolved.company), 0)
+
+        if resolved.is_group:
+            resolved.companies = tuple(c.name for c in tree)
+            # Only leaf companies carry transactions
+            resolved.leaf_companies = [c.name for c in tree if not c.is_group]
+        else:
+            resolved.companies = (resolved.company,)
+
+    return resolved
+
+
+def get_company_filters(resolved, company):
+    """Resolved filters narrowed to a single company of the tree"""
+    return frappe._dict(resolved, company=company, is_group=0, companies=(company,), leaf_companies=[])
 
 
 def get_tax_accounts(company):
@@ -28,31 +71,31 @@ def get_tax_accounts(company):
 
 
 def execute(filters=None):
+    # Results are reused until a new GL posting lands in the company tree
+    return get_cached_report_result(
+        "Almouhana VAT Report", filters, lambda: get_report_result(filters)
+    )
+
+
+def get_report_result(filters):
     columns = get_columns()
     data = []
 
-    # Check if it's a group company for consolidated reporting
-    is_group = False
-    companies = []
-    if filters and filters.get("company"):
-        is_group = frappe.db.get_value("Company", filters.get("company"), "is_group")
-        if is_group:
-            companies = get_descendants_of(filters.get("company"))
-            # Filter out the group company itself (only include leaf companies with transactions)
-            companies = [c for c in companies if not frappe.db.get_value("Company", c, "is_group")]
-
-    if is_group and len(companies) > 1:
+    # Company tree and date bounds are resolved once and shared by every section
+    resolved = resolve_filters(filters)
+
+    if resolved.is_group and len(resolved.leaf_companies) > 1:
         # Consolidated report - show each company separately
-        data = generate_consolidated_report(filters, companies)
+        data = generate_consolidated_report(resolved, resolved.leaf_companies)
     else:
         # Single company report
-        data = generate_single_company_report(filters)
+        data = generate_single_company_report(resolved)
 
     return columns, data
 
 
 def generate_single_company_report(filters):
-    """Generate report for a single company - matching GL entries"""
+    """Generate report for a single company - matching GL entries (filters are resolved)"""
     data = []
 
     # -----------------------------
@@ -353,7 +396,7 @@ def generate_single_company_report(filters):
 
 
 def generate_consolidated_report(filters, companies):
-    """Generate consolidated report showing each company's data and totals"""
+    """Generate consolidated report showing each company's data and totals (filters are resolved)"""
     data = []
 
     # Initialize grand totals
@@ -366,11 +409,7 @@ def generate_consolidated_report(filters, companies):
 
     # Process each company
     for company in companies:
-        company_filters = {
-            "company": company,
-            "from_date": filters.get("from_date"),
-            "to_date": filters.get("to_date"),
-        }
+        company_filters = get_company_filters(filters, company)
 
         # Get data for this company
         sales_totals = get_sales_vat_totals(company_filters)
@@ -579,17 +618,11 @@ def generate_consolidated_report(filters, companies):
 # -----------------------------
 
 def build_company_condition(filters, table_alias="si"):
-    """Build company filter condition"""
-    if not filters or not filters.get("company"):
+    """Build company filter condition from resolved filters (see resolve_filters)"""
+    if not filters or not filters.get("companies"):
         return ""
 
-    is_group = frappe.db.get_value("Company", filters.get("company"), "is_group")
-    if is_group:
-        companies = get_descendants_of(filters.get("company"))
-        if companies:
-            company_list = ", ".join([f"'{c}'" for c in companies])
-            return f"{table_alias}.company IN ({company_list})"
-    return f"{table_alias}.company = %(company)s"
+    return f"{table_alias}.company IN %(companies)s"
 
 
 def build_date_condition(filters, table_alias="si"):
@@ -608,12 +641,61 @@ def build_date_condition(filters, table_alias="si"):
     return " AND ".join(conditions) if conditions else ""
 
 
+def build_invoice_where_clause(filters, table_alias):
+    """Build the docstatus/company/date WHERE clause for an invoice table alias"""
+    conditions = [f"{table_alias}.docstatus = 1"]
+
+    company_cond = build_company_condition(filters, table_alias)
+    if company_cond:
+        conditions.append(company_cond)
+
+    date_cond = build_date_condition(filters, table_alias)
+    if date_cond:
+        conditions.append(date_cond)
+
+    return " AND ".join(conditions)
+
+
+def get_vat_ledger_totals(filters, section):
+    """Pre-categorized totals per (category, is_return) from the VAT Ledger"""
+    conditions = ["vle.is_cancelled = 0", "vle.section = %(section)s"]
+
+    company_cond = build_company_condition(filters, "vle")
+    if company_cond:
+        conditions.append(company_cond)
+
+    date_cond = build_date_condition(filters, "vle")
+    if date_cond:
+        conditions.append(date_cond)
+
+    return frappe.db.sql(
+        f"""
+        SELECT
+            vle.category,
+            vle.is_return,
+            SUM(vle.net_amount) AS amount,
+            SUM(vle.vat_amount) AS vat
+        FROM `tabVAT Ledger Entry` vle
+        WHERE {" AND ".join(conditions)}
+        GROUP BY vle.category, vle.is_return
+        """,
+        dict(filters or {}, section=section),
+        as_dict=True,
+    )
+
+
 def get_sales_vat_totals(filters):
     """
     Get sales VAT totals from Sales Taxes and Charges table.
     Only includes rows where account_head has account_type = 'Tax'.
     - Amount = base_net_total (net amount excluding VAT)
     - VAT = sum of base_tax_amount from Tax account rows only
+
+    Invoices are categorized and summed in the database, so the query returns
+    one row per (category, is_return) instead of one row per invoice:
+    - Export flag set, or non-SAR without VAT = Exports
+    - Has VAT = Standard
+    - SAR without VAT is not included in the report
     """
     totals = {
         "Standard": {"amount": 0, "vat": 0, "returned_amount": 0, "returned_vat": 0},
@@ -623,73 +705,64 @@ def get_sales_vat_totals(filters):
         "Exempt": {"amount": 0, "vat": 0, "returned_amount": 0, "returned_vat": 0},
     }
 
-    # Build conditions
-    conditions = ["si.docstatus = 1"]
+    if is_vat_ledger_ready():
+        rows = get_vat_ledger_totals(filters, "Sales")
+    else:
+        rows = get_sales_vat_rows(filters)
 
-    company_cond = build_company_condition(filters, "si")
-    if company_cond:
-        conditions.append(company_cond)
+    for r in rows:
+        amount_key, vat_key = ("returned_amount", "returned_vat") if r.is_return else ("amount", "vat")
 
-    date_cond = build_date_condition(filters, "si")
-    if date_cond:
-        conditions.append(date_cond)
+        totals[r.category][amount_key] += r.amount or 0
+        # Exports are zero-rated, only Standard carries VAT
+        if r.category == "Standard":
+            totals[r.category][vat_key] += r.vat or 0
+
+    return totals
 
-    where_clause = " AND ".join(conditions)
 
-    # Get invoices with VAT from taxes table (only Tax account type rows)
+def get_sales_vat_rows(filters):
+    """Sales totals per (category, is_return) computed from the source invoices"""
+    # The tax subquery is restricted to the same invoices as the outer query
+    # so it never groups over the whole taxes table
     query = f"""
         SELECT
-            si.name AS invoice,
-            si.is_return,
-            si.currency,
-            si.custom_zatca_export_invoice,
-            si.base_net_total AS net_amount,
-            COALESCE(vat.vat_amount, 0) AS vat_amount
-        FROM `tabSales Invoice` si
-        LEFT JOIN (
+            t.category,
+            t.is_return,
+            SUM(ABS(t.net_amount)) AS amount,
+            SUM(ABS(t.vat_amount)) AS vat
+        FROM (
             SELECT
-                stc.parent,
-                SUM(stc.base_tax_amount) AS vat_amount
-            FROM `tabSales Taxes and Charges` stc
-            INNER JOIN `tabAccount` acc ON acc.name = stc.account_head
-            WHERE acc.account_type = 'Tax'
-            GROUP BY stc.parent
-        ) vat ON vat.parent = si.name
-        WHERE {where_clause}
+                si.is_return,
+                si.base_net_total AS net_amount,
+                COALESCE(vat.vat_amount, 0) AS vat_amount,
+                CASE
+                    WHEN IFNULL(si.custom_zatca_export_invoice, 0) = 1 THEN 'Exports'
+                    WHEN IFNULL(NULLIF(si.currency, ''), 'SAR') != 'SAR'
+                        AND COALESCE(vat.vat_amount, 0) = 0 THEN 'Exports'
+                    WHEN COALESCE(vat.vat_amount, 0) != 0 THEN 'Standard'
+                    ELSE NULL
+                END AS category
+            FROM `tabSales Invoice` si
+            LEFT JOIN (
+                SELECT
+                    stc.parent,
+                    SUM(stc.base_tax_amount) AS vat_amount
+                FROM `tabSales Taxes and Charges` stc
+                INNER JOIN `tabSales Invoice` inv ON inv.name = stc.parent
+                INNER JOIN `tabAccount` acc ON acc.name = stc.account_head
+                WHERE acc.account_type = 'Tax'
+                AND stc.parenttype = 'Sales Invoice'
+                AND {build_invoice_where_clause(filters, "inv")}
+                GROUP BY stc.parent
+            ) vat ON vat.parent = si.name
+            WHERE {build_invoice_where_clause(filters, "si")}
+        ) t
+        WHERE t.category IS NOT NULL
+        GROUP BY t.category, t.is_return
     """
 
-    rows = frappe.db.sql(query, filters, as_dict=True)
-
-    for r in rows:
-        is_return = bool(r.get("is_return"))
-        net_amount = abs(r.get("net_amount") or 0)
-        vat_amount = abs(r.get("vat_amount") or 0)
-        currency = r.get("currency") or "SAR"
-        is_export = int(r.get("custom_zatca_export_invoice") or 0) == 1
-
-        # Determine which fields to update
-        if is_return:
-            amount_key = "returned_amount"
-            vat_key = "returned_vat"
-        else:
-            amount_key = "amount"
-            vat_key = "vat"
-
-        # Categorize the invoice
-        if is_export:
-            totals["Exports"][amount_key] += net_amount
-        elif currency != "SAR" and vat_amount == 0:
-            # Non-SAR with no VAT = Export
-            totals["Exports"][amount_key] += net_amount
-        elif vat_amount > 0:
-            # Standard rated (has VAT)
-            totals["Standard"][amount_key] += net_amount
-            totals["Standard"][vat_key] += vat_amount
-        elif currency == "SAR" and vat_amount == 0 and net_amount > 0:
-            # SAR with no VAT - skip (not included in report)
-            pass
-
-    return totals
+    return frappe.db.sql(query, filters, as_dict=True)
 
 
 def get_purchase_vat_totals(filters):
@@ -698,6 +771,13 @@ def get_purchase_vat_totals(filters):
     Only includes rows where account_head has account_type = 'Tax'.
     - Amount = base_net_total (net amount excluding VAT)
     - VAT = sum of base_tax_amount from Tax account rows only
+
+    Invoices are categorized and summed in the database, one row per
+    (category, is_return):
+    - Import flag set = ImportsCustoms (VAT paid at customs)
+    - Non-SAR = ImportsReverseCharge
+    - Has VAT = Standard
+    - SAR without VAT is not included in the report
     """
     totals = {
         "Standard": {"amount": 0, "vat": 0, "returned_amount": 0, "returned_vat": 0},
@@ -707,91 +787,63 @@ def get_purchase_vat_totals(filters):
         "Exempt": {"amount": 0, "vat": 0, "returned_amount": 0, "returned_vat": 0},
     }
 
-    # Build conditions
-    conditions = ["pi.docstatus = 1"]
+    if is_vat_ledger_ready():
+        rows = get_vat_ledger_totals(filters, "Purchase")
+    else:
+        rows = get_purchase_vat_rows(filters)
 
-    company_cond = build_company_condition(filters, "pi")
-    if company_cond:
-        conditions.append(company_cond)
+    for r in rows:
+        amount_key, vat_key = ("returned_amount", "returned_vat") if r.is_return else ("amount", "vat")
 
-    date_cond = build_date_condition(filters, "pi")
-    if date_cond:
-        conditions.append(date_cond)
+        totals[r.category][amount_key] += r.amount or 0
+        totals[r.category][vat_key] += r.vat or 0
 
-    where_clause = " AND ".join(conditions)
+    return totals
 
-    # Get invoices with VAT from taxes table (only Tax account type rows)
-    # Also get transport/expense charges to subtract from net amount
-    # Transport fees (أجور نقل) are stored as negative values in the taxes table
+
+def get_purchase_vat_rows(filters):
+    """Purchase totals per (category, is_return) computed from the source invoices"""
+    # VAT and transport/expense charges come from one pass over the taxes of
+    # the invoices in range. Transport fees (أجور نقل) are stored as negative
+    # values in the taxes table and reduce the net amount.
     query = f"""
         SELECT
-            pi.name AS invoice,
-            pi.is_return,
-            pi.currency,
-            pi.custom_zatca_import_invoice,
-            pi.base_net_total AS gross_net_amount,
-            COALESCE(vat.vat_amount, 0) AS vat_amount,
-            COALESCE(transport.transport_amount, 0) AS transport_amount
-        FROM `tabPurchase Invoice` pi
-        LEFT JOIN (
-            SELECT
-                ptc.parent,
-                SUM(ptc.base_tax_amount) AS vat_amount
-            FROM `tabPurchase Taxes and Charges` ptc
-            INNER JOIN `tabAccount` acc ON acc.name = ptc.account_head
-            WHERE acc.account_type = 'Tax'
-            GROUP BY ptc.parent
-        ) vat ON vat.parent = pi.name
-        LEFT JOIN (
+            t.category,
+            t.is_return,
+            SUM(ABS(t.net_amount)) AS amount,
+            SUM(ABS(t.vat_amount)) AS vat
+        FROM (
             SELECT
-                ptc.parent,
-                SUM(ptc.base_tax_amount) AS transport_amount
-            FROM `tabPurchase Taxes and Charges` ptc
-            INNER JOIN `tabAccount` acc ON acc.name = ptc.account_head
-            WHERE acc.account_type = 'Expense Account'
-            GROUP BY ptc.parent
-        ) transport ON transport.parent = pi.name
-        WHERE {where_clause}
+                pi.is_return,
+                pi.base_net_total + COALESCE(tax.transport_amount, 0) AS net_amount,
+                COALESCE(tax.vat_amount, 0) AS vat_amount,
+                CASE
+                    WHEN IFNULL(pi.custom_zatca_import_invoice, 0) = 1 THEN 'ImportsCustoms'
+                    WHEN IFNULL(NULLIF(pi.currency, ''), 'SAR') != 'SAR' THEN 'ImportsReverseCharge'
+                    WHEN COALESCE(tax.vat_amount, 0) != 0 THEN 'Standard'
+                    ELSE NULL
+                END AS category
+            FROM `tabPurchase Invoice` pi
+            LEFT JOIN (
+                SELECT
+                    ptc.parent,
+                    SUM(CASE WHEN acc.account_type = 'Tax' THEN ptc.base_tax_amount ELSE 0 END) AS vat_amount,
+                    SUM(CASE WHEN acc.account_type = 'Expense Account' THEN ptc.base_tax_amount ELSE 0 END) AS transport_amount
+                FROM `tabPurchase Taxes and Charges` ptc
+                INNER JOIN `tabPurchase Invoice` inv ON inv.name = ptc.parent
+                INNER JOIN `tabAccount` acc ON acc.name = ptc.account_head
+                WHERE acc.account_type IN ('Tax', 'Expense Account')
+                AND ptc.parenttype = 'Purchase Invoice'
+                AND {build_invoice_where_clause(filters, "inv")}
+                GROUP BY ptc.parent
+            ) tax ON tax.parent = pi.name
+            WHERE {build_invoice_where_clause(filters, "pi")}
+        ) t
+        WHERE t.category IS NOT NULL
+        GROUP BY t.category, t.is_return
     """
 
-    rows = frappe.db.sql(query, filters, as_dict=True)
-
-    for r in rows:
-        is_return = bool(r.get("is_return"))
-        gross_net_amount = r.get("gross_net_amount") or 0
-        transport_amount = r.get("transport_amount") or 0  # This is negative for deductions
-        # Calculate actual net amount by adding transport fees (negative values reduce the total)
-        net_amount = abs(gross_net_amount + transport_amount)
-        vat_amount = abs(r.get("vat_amount") or 0)
-        currency = r.get("currency") or "SAR"
-        is_import = int(r.get("custom_zatca_import_invoice") or 0) == 1
-
-        # Determine which fields to update
-        if is_return:
-            amount_key = "returned_amount"
-            vat_key = "returned_vat"
-        else:
-            amount_key = "amount"
-            vat_key = "vat"
-
-        # Categorize the invoice
-        if is_import:
-            # Import invoice - VAT paid at customs
-            totals["ImportsCustoms"][amount_key] += net_amount
-            totals["ImportsCustoms"][vat_key] += vat_amount
-        elif currency != "SAR":
-            # Non-SAR = Imports Reverse Charge
-            totals["ImportsReverseCharge"][amount_key] += net_amount
-            totals["ImportsReverseCharge"][vat_key] += vat_amount
-        elif vat_amount > 0:
-            # Standard rated (has VAT)
-            totals["Standard"][amount_key] += net_amount
-            totals["Standard"][vat_key] += vat_amount
-        elif currency == "SAR" and vat_amount == 0 and net_amount > 0:
-            # SAR with no VAT - skip (not included in report)
-            pass
-
-    return totals
+    return frappe.db.sql(query, filters, as_dict=True)
 
 
 def get_expenses_vat_totals(filters):
@@ -804,26 +856,22 @@ def get_expenses_vat_totals(filters):
         "Zero Rated": {"amount": 0, "vat": 0},
     }
 
+    if is_vat_ledger_ready():
+        for r in get_vat_ledger_totals(filters, "Expense"):
+            totals[r.category]["amount"] += r.amount or 0
+            totals[r.category]["vat"] += r.vat or 0
+        return totals
+
     # Build conditions for GL query
     conditions = ["gl.is_cancelled = 0", "gl.voucher_type = 'Expense Entry'"]
 
-    if filters:
-        if filters.get("company"):
-            is_group = frappe.db.get_value("Company", filters.get("company"), "is_group")
-            if is_group:
-                companies = get_descendants_of(filters.get("company"))
-                if companies:
-                    company_list = ", ".join([f"'{c}'" for c in companies])
-                    conditions.append(f"gl.company IN ({company_list})")
-            else:
-                conditions.append("gl.company = %(company)s")
-
-        if filters.get("from_date") and filters.get("to_date"):
-            conditions.append("gl.posting_date BETWEEN %(from_date)s AND %(to_date)s")
-        elif filters.get("from_date"):
-            conditions.append("gl.posting_date >= %(from_date)s")
-        elif filters.get("to_date"):
-            conditions.append("gl.posting_date <= %(to_date)s")
+    company_cond = build_company_condition(filters, "gl")
+    if company_cond:
+        conditions.append(company_cond)
+
+    date_cond = build_date_condition(filters, "gl")
+    if date_cond:
+        conditions.append(date_cond)
 
     where_clause = " AND ".join(conditions)
 
@@ -863,26 +911,20 @@ def get_journal_entry_vat(filters):
     """
     result = {"vat": 0}
 
+    if is_vat_ledger_ready():
+        result["vat"] = sum(r.vat or 0 for r in get_vat_ledger_totals(filters, "Journal"))
+        return result
+
     # Build conditions
     conditions = ["gl.is_cancelled = 0", "gl.voucher_type = 'Journal Entry'", "acc.account_type = 'Tax'"]
 
-    if filters:
-        if filters.get("company"):
-            is_group = frappe.db.get_value("Company", filters.get("company"), "is_group")
-            if is_group:
-                companies = get_descendants_of(filters.get("company"))
-                if companies:
-                    company_list = ", ".join([f"'{c}'" for c in companies])
-                    conditions.append(f"gl.company IN ({company_list})")
-            else:
-                conditions.append("gl.company = %(company)s")
-
-        if filters.get("from_date") and filters.get("to_date"):
-            conditions.append("gl.posting_date BETWEEN %(from_date)s AND %(to_date)s")
-        elif filters.get("from_date"):
-            conditions.append("gl.posting_date >= %(from_date)s")
-        elif filters.get("to_date"):
-            conditions.append("gl.posting_date <= %(to_date)s")
+    company_cond = build_company_condition(filters, "gl")
+    if company_cond:
+        conditions.append(company_cond)
+
+    date_cond = build_date_condition(filters, "gl")
+    if date_cond:
+        conditions.append(date_cond)
 
     where_clause = " AND ".join(conditions)
 
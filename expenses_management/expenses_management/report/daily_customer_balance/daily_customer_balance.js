@@ -18,6 +18,19 @@ frappe.query_reports["Daily Customer Balance"] = {
 			"default": frappe.datetime.get_today(),
 			"reqd": 1
 		},
+		{
+			"fieldname": "to_date",
+			"label": __("To Date"),
+			"fieldtype": "Date",
+			"description": __("Show every day from Date to To Date")
+		},
+		{
+			"fieldname": "view",
+			"label": __("View"),
+			"fieldtype": "Select",
+			"options": ["Customer / Day", "Pivot"],
+			"default": "Customer / Day"
+		},
 		{
 			"fieldname": "customer",
 			"label": __("Customer"),
@@ -30,5 +43,16 @@ frappe.query_reports["Daily Customer Balance"] = {
 			"fieldtype": "Check",
 			"default": 1
 		}
-	]
+	],
+	"onload": function(report) {
+		report.page.add_inner_button(__("Export CSV"), function() {
+			let filters = report.get_filter_values(true);
+			if (!filters) return;
+
+			window.open(
+				"/api/method/expenses_management.expenses_management.report.daily_customer_balance.daily_customer_balance.export_csv?"
+				+ $.param({ filters: JSON.stringify(filters) })
+			);
+		});
+	}
 };
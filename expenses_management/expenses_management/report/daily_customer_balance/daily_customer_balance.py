@@ -1,18 +1,68 @@
 # Copyright (c) 2026, Administrator and contributors
 # For license information, please see license.txt
 
+import csv
+import io
+from itertools import groupby
+
 import frappe
 from frappe import _
-from frappe.utils import flt
+from frappe.utils import add_days, cstr, date_diff, flt, formatdate, getdate
+
+from expenses_management.expenses_management.doctype.customer_balance_snapshot.customer_balance_snapshot import (
+	get_latest_snapshot_date,
+)
+
+# Longest date range the report rolls forward in one run
+MAX_RANGE_DAYS = 366
+
+PIVOT_VIEW = "Pivot"
 
 
 def execute(filters=None):
 	if not filters:
 		return [], []
 
+	columns, rows = get_report(filters)
+	return columns, list(rows)
+
+
+def get_report(filters):
+	"""
+	Columns and a row iterator for the filters.
+
+	With a To Date the report rolls forward over the whole range: one row per
+	customer per day, or one row per customer with a closing balance column
+	per day in the pivot view. Rows are generated lazily so the CSV export
+	can stream them.
+	"""
+	from_date = getdate(filters.get("date"))
+	to_date = getdate(filters.get("to_date") or from_date)
+
+	if to_date < from_date:
+		frappe.throw(_("To Date cannot be before Date"))
+	if date_diff(to_date, from_date) >= MAX_RANGE_DAYS:
+		frappe.throw(_("The date range cannot be longer than {0} days").format(MAX_RANGE_DAYS))
+
+	dates = [add_days(from_date, i) for i in range(date_diff(to_date, from_date) + 1)]
+	balances = get_daily_balances(filters, dates)
+
+	if filters.get("view") == PIVOT_VIEW:
+		return get_pivot_columns(dates), get_pivot_rows(balances, filters.get("today_only"))
+
 	columns = get_columns()
-	data = get_data(filters)
-	return columns, data
+	if len(dates) > 1:
+		columns.insert(0, {
+			"fieldname": "date",
+			"label": _("Date"),
+			"fieldtype": "Date",
+			"width": 110
+		})
+
+	if filters.get("today_only"):
+		balances = (row for row in balances if row.transactions)
+
+	return columns, balances
 
 
 def get_columns():
@@ -76,205 +126,350 @@ def get_columns():
 	]
 
 
-def get_data(filters):
-	"""Fetch daily customer balance data"""
-	date = filters.get("date")
+def get_pivot_columns(dates):
+	"""Customer totals over the range with one closing balance column per day"""
+	columns = get_columns()
+	day_columns = [
+		{
+			"fieldname": get_pivot_fieldname(day),
+			"label": formatdate(day),
+			"fieldtype": "Currency",
+			"width": 120
+		}
+		for day in dates
+	]
+	# Per-day closing balances between the range totals and the closing balance
+	return columns[:5] + day_columns + columns[5:]
+
+
+def get_pivot_fieldname(day):
+	return "balance_" + day.strftime("%Y%m%d")
+
+
+def get_daily_balances(filters, dates):
+	"""
+	Daily balances of every customer over the dates, in customer / date order.
+
+	The state at the start of the range is read once (snapshot plus the gap
+	up to the first date), then rolled forward day by day over the stream of
+	movements sorted by customer and date. Opening and closing follow the
+	single-day report: the next day opens at the GL balance, the day closes
+	at opening + invoiced - payments.
+	"""
+	from_date, to_date = dates[0], dates[-1]
 	company = filters.get("company")
-	customer_filter = filters.get("customer")
 
-	customer_condition = ""
-	if customer_filter:
-		customer_condition = "AND si.customer = %(customer)s"
+	opening_state = {row.customer: row for row in get_opening_state(company, from_date, filters.get("customer"))}
+	movements = {
+		customer: {row.posting_date: row for row in rows}
+		for customer, rows in groupby(
+			get_movements(company, from_date, to_date, filters.get("customer")),
+			key=lambda row: row.customer,
+		)
+	}
+
+	customers = sorted(set(opening_state) | set(movements))
+	customer_names = dict(frappe.get_all(
+		"Customer",
+		filters={"name": ["in", customers]},
+		fields=["name", "customer_name"],
+		as_list=True,
+	)) if customers else {}
+
+	# Everything is fetched up front; rows are only built while iterating
+	return iter_daily_balances(customers, customer_names, opening_state, movements, dates)
+
+
+def iter_daily_balances(customers, customer_names, opening_state, movements, dates):
+	for customer in customers:
+		state = opening_state.get(customer) or frappe._dict()
+		days = movements.get(customer) or {}
+
+		opening = flt(state.opening_balance)
+		overdue = flt(state.overdue_balance)
+		last_invoice_date = state.last_invoice_date
+		last_payment_date = state.last_payment_date
+
+		for day in dates:
+			movement = days.get(day) or frappe._dict()
+			invoiced = flt(movement.total_invoiced)
+			payments = flt(movement.total_payments)
+			overdue += flt(movement.overdue_balance)
+			if movement.invoices:
+				last_invoice_date = day
+			if movement.payments:
+				last_payment_date = day
+
+			yield frappe._dict({
+				"date": day,
+				"customer": customer,
+				"customer_name": customer_names.get(customer) or customer,
+				"opening_balance": opening,
+				"total_invoiced": invoiced,
+				"total_payments": payments,
+				"closing_balance": opening + invoiced - payments,
+				"overdue_balance": overdue,
+				"last_invoice_date": last_invoice_date,
+				"last_payment_date": last_payment_date,
+				# Invoices and payments of the day, for "Today's Transactions Only"
+				"transactions": flt(movement.invoices) + flt(movement.payments),
+			})
+
+			opening += flt(movement.gl_balance)
+
+
+def get_pivot_rows(balances, transactions_only=False):
+	"""Fold the daily balances into one row per customer"""
+	for customer, days in groupby(balances, key=lambda row: row.customer):
+		days = list(days)
+		if transactions_only and not any(day.transactions for day in days):
+			continue
 
-	# Opening balance: total outstanding from invoices posted before the selected date
-	opening_data = frappe.db.sql("""
-		SELECT
-			si.customer,
-			SUM(si.outstanding_amount) as opening_balance
-		FROM `tabSales Invoice` si
-		WHERE si.docstatus = 1
-			AND si.company = %(company)s
-			AND si.posting_date < %(date)s
-			{customer_condition}
-		GROUP BY si.customer
-	""".format(customer_condition=customer_condition), filters, as_dict=1)
-
-	# Day's invoiced: total grand_total from invoices posted on the selected date
-	invoiced_data = frappe.db.sql("""
+		row = frappe._dict(days[-1])
+		row.opening_balance = days[0].opening_balance
+		row.total_invoiced = sum(day.total_invoiced for day in days)
+		row.total_payments = sum(day.total_payments for day in days)
+		for day in days:
+			row[get_pivot_fieldname(day.date)] = day.closing_balance
+		yield row
+
+
+def get_opening_state(company, date, customer=None):
+	"""
+	Per customer, as of the start of the date: the GL balance, the overdue
+	outstanding and the last invoice / payment dates.
+
+	Reads the latest snapshot on or before the date and the entries posted
+	since, in one statement.
+	"""
+	snapshot_date = get_latest_snapshot_date(company, date)
+	values = {
+		"company": company,
+		"date": date,
+		"customer": customer,
+		"snapshot_date": snapshot_date,
+		"from_date": snapshot_date or getdate("1900-01-01"),
+	}
+	conditions = get_customer_conditions(customer)
+
+	return frappe.db.sql("""
 		SELECT
-			si.customer,
-			SUM(si.base_grand_total) as total_invoiced
-		FROM `tabSales Invoice` si
-		WHERE si.docstatus = 1
-			AND si.company = %(company)s
-			AND si.posting_date = %(date)s
-			{customer_condition}
-		GROUP BY si.customer
-	""".format(customer_condition=customer_condition), filters, as_dict=1)
-
-	# Day's payments: Payment Entries + paid amount on Sales Invoices (POS/cash)
-	payment_customer_condition = ""
-	if customer_filter:
-		payment_customer_condition = "AND pe.party = %(customer)s"
-
-	payment_data = frappe.db.sql("""
-		SELECT customer, SUM(total_payments) as total_payments
+			customer,
+			SUM(opening_balance) as opening_balance,
+			SUM(overdue_balance) as overdue_balance,
+			MAX(last_invoice_date) as last_invoice_date,
+			MAX(last_payment_date) as last_payment_date
 		FROM (
+			-- Balance at the snapshot
+			SELECT
+				cbs.customer,
+				cbs.balance as opening_balance,
+				0 as overdue_balance,
+				cbs.last_invoice_date,
+				cbs.last_payment_date
+			FROM `tabCustomer Balance Snapshot` cbs
+			WHERE cbs.company = %(company)s
+				AND cbs.snapshot_date = %(snapshot_date)s
+				{snapshot_condition}
+
+			UNION ALL
+
+			-- GL entries posted between the snapshot and the date
+			SELECT gle.party, SUM(gle.debit - gle.credit), 0, NULL, NULL
+			FROM `tabGL Entry` gle
+			WHERE gle.company = %(company)s
+				AND gle.party_type = 'Customer'
+				AND gle.is_cancelled = 0
+				AND gle.posting_date >= %(from_date)s AND gle.posting_date < %(date)s
+				{gl_condition}
+			GROUP BY gle.party
+
+			UNION ALL
+
+			-- Last invoice and last paid invoice (POS/cash) since the snapshot
 			SELECT
-				pe.party as customer,
-				SUM(pe.paid_amount) as total_payments
+				si.customer, 0, 0,
+				MAX(si.posting_date),
+				MAX(IF(si.base_grand_total - si.outstanding_amount > 0, si.posting_date, NULL))
+			FROM `tabSales Invoice` si
+			WHERE si.docstatus = 1
+				AND si.company = %(company)s
+				AND si.posting_date >= %(from_date)s AND si.posting_date < %(date)s
+				{si_condition}
+			GROUP BY si.customer
+
+			UNION ALL
+
+			-- Last Payment Entry since the snapshot
+			SELECT pe.party, 0, 0, NULL, MAX(pe.posting_date)
 			FROM `tabPayment Entry` pe
 			WHERE pe.docstatus = 1
 				AND pe.company = %(company)s
-				AND pe.posting_date = %(date)s
 				AND pe.party_type = 'Customer'
 				AND pe.payment_type = 'Receive'
-				{payment_customer_condition}
+				AND pe.posting_date >= %(from_date)s AND pe.posting_date < %(date)s
+				{pe_condition}
 			GROUP BY pe.party
 
 			UNION ALL
 
-			SELECT
-				si.customer,
-				SUM(si.base_grand_total - si.outstanding_amount) as total_payments
+			-- Outstanding of the invoices already overdue on the date
+			SELECT si.customer, 0, SUM(si.outstanding_amount), NULL, NULL
 			FROM `tabSales Invoice` si
 			WHERE si.docstatus = 1
 				AND si.company = %(company)s
-				AND si.posting_date = %(date)s
-				AND (si.base_grand_total - si.outstanding_amount) > 0
-				{customer_condition}
+				AND si.outstanding_amount > 0
+				AND si.due_date < %(date)s
+				AND si.posting_date <= %(date)s
+				{si_condition}
 			GROUP BY si.customer
-		) combined
+		) opening
 		GROUP BY customer
-	""".format(
-		payment_customer_condition=payment_customer_condition,
-		customer_condition=customer_condition
-	), filters, as_dict=1)
+	""".format(**conditions), values, as_dict=1)
 
-	# Overdue balance: outstanding from invoices where due_date has passed
-	overdue_data = frappe.db.sql("""
-		SELECT
-			si.customer,
-			SUM(si.outstanding_amount) as overdue_balance
-		FROM `tabSales Invoice` si
-		WHERE si.docstatus = 1
-			AND si.company = %(company)s
-			AND si.due_date < %(date)s
-			AND si.outstanding_amount > 0
-			AND si.posting_date <= %(date)s
-			{customer_condition}
-		GROUP BY si.customer
-	""".format(customer_condition=customer_condition), filters, as_dict=1)
-
-	# Last invoice date per customer (up to selected date)
-	last_invoice_data = frappe.db.sql("""
+
+def get_movements(company, from_date, to_date, customer=None):
+	"""
+	Per customer and day of the range: GL movement, invoiced and paid
+	amounts, invoice and payment counts and the outstanding that becomes
+	overdue that day, sorted by customer and date.
+	"""
+	values = {"company": company, "from_date": from_date, "to_date": to_date, "customer": customer}
+	conditions = get_customer_conditions(customer)
+
+	return frappe.db.sql("""
 		SELECT
-			si.customer,
-			MAX(si.posting_date) as last_invoice_date
-		FROM `tabSales Invoice` si
-		WHERE si.docstatus = 1
-			AND si.company = %(company)s
-			AND si.posting_date <= %(date)s
-			{customer_condition}
-		GROUP BY si.customer
-	""".format(customer_condition=customer_condition), filters, as_dict=1)
-
-	# Last payment date per customer (Payment Entries + paid invoices)
-	last_payment_data = frappe.db.sql("""
-		SELECT customer, MAX(last_payment_date) as last_payment_date
+			customer,
+			posting_date,
+			SUM(gl_balance) as gl_balance,
+			SUM(total_invoiced) as total_invoiced,
+			SUM(total_payments) as total_payments,
+			SUM(overdue_balance) as overdue_balance,
+			SUM(invoices) as invoices,
+			SUM(payments) as payments
 		FROM (
+			-- GL movement: rolls the opening balance to the next day
 			SELECT
-				pe.party as customer,
-				MAX(pe.posting_date) as last_payment_date
+				gle.party as customer,
+				gle.posting_date,
+				SUM(gle.debit - gle.credit) as gl_balance,
+				0 as total_invoiced,
+				0 as total_payments,
+				0 as overdue_balance,
+				0 as invoices,
+				0 as payments
+			FROM `tabGL Entry` gle
+			WHERE gle.company = %(company)s
+				AND gle.party_type = 'Customer'
+				AND gle.is_cancelled = 0
+				AND gle.posting_date BETWEEN %(from_date)s AND %(to_date)s
+				{gl_condition}
+			GROUP BY gle.party, gle.posting_date
+
+			UNION ALL
+
+			-- Invoiced and paid (POS/cash) amounts
+			SELECT
+				si.customer,
+				si.posting_date,
+				0,
+				SUM(si.base_grand_total),
+				SUM(IF(si.base_grand_total - si.outstanding_amount > 0,
+					si.base_grand_total - si.outstanding_amount, 0)),
+				0,
+				COUNT(*),
+				SUM(IF(si.base_grand_total - si.outstanding_amount > 0, 1, 0))
+			FROM `tabSales Invoice` si
+			WHERE si.docstatus = 1
+				AND si.company = %(company)s
+				AND si.posting_date BETWEEN %(from_date)s AND %(to_date)s
+				{si_condition}
+			GROUP BY si.customer, si.posting_date
+
+			UNION ALL
+
+			-- Payment Entries
+			SELECT pe.party, pe.posting_date, 0, 0, SUM(pe.paid_amount), 0, 0, COUNT(*)
 			FROM `tabPayment Entry` pe
 			WHERE pe.docstatus = 1
 				AND pe.company = %(company)s
-				AND pe.posting_date <= %(date)s
 				AND pe.party_type = 'Customer'
 				AND pe.payment_type = 'Receive'
-				{payment_customer_condition}
-			GROUP BY pe.party
+				AND pe.posting_date BETWEEN %(from_date)s AND %(to_date)s
+				{pe_condition}
+			GROUP BY pe.party, pe.posting_date
 
 			UNION ALL
 
+			-- Outstanding becoming overdue: posted and past its due date
 			SELECT
 				si.customer,
-				MAX(si.posting_date) as last_payment_date
+				GREATEST(si.posting_date, DATE_ADD(si.due_date, INTERVAL 1 DAY)) as overdue_date,
+				0, 0, 0, SUM(si.outstanding_amount), 0, 0
 			FROM `tabSales Invoice` si
 			WHERE si.docstatus = 1
 				AND si.company = %(company)s
-				AND si.posting_date <= %(date)s
-				AND (si.base_grand_total - si.outstanding_amount) > 0
-				{customer_condition}
-			GROUP BY si.customer
-		) combined
-		GROUP BY customer
-	""".format(
-		payment_customer_condition=payment_customer_condition,
-		customer_condition=customer_condition
-	), filters, as_dict=1)
-
-	# Merge all data into a single dict keyed by customer
-	customers = {}
-
-	for row in opening_data:
-		customers.setdefault(row.customer, {})
-		customers[row.customer]["opening_balance"] = flt(row.opening_balance)
-
-	for row in invoiced_data:
-		customers.setdefault(row.customer, {})
-		customers[row.customer]["total_invoiced"] = flt(row.total_invoiced)
-
-	for row in payment_data:
-		customers.setdefault(row.customer, {})
-		customers[row.customer]["total_payments"] = flt(row.total_payments)
-
-	for row in overdue_data:
-		customers.setdefault(row.customer, {})
-		customers[row.customer]["overdue_balance"] = flt(row.overdue_balance)
-
-	for row in last_invoice_data:
-		customers.setdefault(row.customer, {})
-		customers[row.customer]["last_invoice_date"] = row.last_invoice_date
-
-	for row in last_payment_data:
-		customers.setdefault(row.customer, {})
-		customers[row.customer]["last_payment_date"] = row.last_payment_date
-
-	# Customers with transactions today (invoices or payments on selected date)
-	today_customers = set()
-	for row in invoiced_data:
-		today_customers.add(row.customer)
-	for row in payment_data:
-		today_customers.add(row.customer)
-
-	today_only = filters.get("today_only")
-
-	# Build final data list
-	data = []
-	for customer, values in sorted(customers.items()):
-		# Skip customers with no transactions today if filter is checked
-		if today_only and customer not in today_customers:
-			continue
-
-		opening = flt(values.get("opening_balance", 0))
-		invoiced = flt(values.get("total_invoiced", 0))
-		payments = flt(values.get("total_payments", 0))
-		overdue = flt(values.get("overdue_balance", 0))
-		closing = opening + invoiced - payments
-
-		customer_name = frappe.db.get_value("Customer", customer, "customer_name") or customer
-
-		data.append({
-			"customer": customer,
-			"customer_name": customer_name,
-			"opening_balance": opening,
-			"total_invoiced": invoiced,
-			"total_payments": payments,
-			"closing_balance": closing,
-			"overdue_balance": overdue,
-			"last_invoice_date": values.get("last_invoice_date"),
-			"last_payment_date": values.get("last_payment_date"),
-		})
-
-	return data
+				AND si.outstanding_amount > 0
+				AND si.posting_date <= %(to_date)s
+				AND si.due_date < %(to_date)s
+				AND GREATEST(si.posting_date, DATE_ADD(si.due_date, INTERVAL 1 DAY)) > %(from_date)s
+				{si_condition}
+			GROUP BY si.customer, overdue_date
+		) movements
+		GROUP BY customer, posting_date
+		ORDER BY customer, posting_date
+	""".format(**conditions), values, as_dict=1)
+
+
+def get_customer_conditions(customer=None):
+	if not customer:
+		return {"snapshot_condition": "", "gl_condition": "", "si_condition": "", "pe_condition": ""}
+
+	return {
+		"snapshot_condition": "AND cbs.customer = %(customer)s",
+		"gl_condition": "AND gle.party = %(customer)s",
+		"si_condition": "AND si.customer = %(customer)s",
+		"pe_condition": "AND pe.party = %(customer)s",
+	}
+
+
+@frappe.whitelist()
+def export_csv(filters):
+	"""
+	Stream the report as CSV.
+
+	The queries run before the response is returned; the per-customer per-day
+	rows are only generated while the response body is written, so large
+	customer bases and long ranges are never held in memory as a whole.
+	"""
+	from werkzeug.wrappers import Response
+
+	if not frappe.get_doc("Report", "Daily Customer Balance").is_permitted():
+		frappe.throw(_("Not permitted"), frappe.PermissionError)
+
+	filters = frappe._dict(frappe.parse_json(filters))
+	columns, rows = get_report(filters)
+
+	def generate():
+		buffer = io.StringIO()
+		writer = csv.writer(buffer)
+
+		writer.writerow([column["label"] for column in columns])
+		for idx, row in enumerate(rows, 1):
+			writer.writerow([cstr(row.get(column["fieldname"])) for column in columns])
+			if idx % 1000 == 0:
+				yield buffer.getvalue()
+				buffer.seek(0)
+				buffer.truncate()
+
+		yield buffer.getvalue()
+
+	filename = "daily_customer_balance_{0}_{1}.csv".format(
+		filters.get("date"), filters.get("to_date") or filters.get("date")
+	)
+	return Response(
+		generate(),
+		mimetype="text/csv",
+		headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+		direct_passthrough=True,
+	)
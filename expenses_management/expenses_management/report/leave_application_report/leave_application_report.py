@@ -1,6 +1,9 @@
 # Copyright (c) 2026, Administrator and contributors
 # For license information, please see license.txt
 
+from bisect import bisect_left, bisect_right
+from itertools import accumulate, groupby
+
 import frappe
 from frappe.utils import getdate
 
@@ -80,6 +83,8 @@ def get_data(filters):
         ORDER BY la.employee, la.from_date
     """, values, as_dict=True)
 
+    balances = get_leave_balances(rows)
+
     data = []
     current_employee = None
     total_days = 0
@@ -94,10 +99,10 @@ def get_data(filters):
             })
             total_days = 0
 
-        row["balance_before"] = get_balance(
+        row["balance_before"] = balances.get_balance(
             row["employee"], row["leave_type"], row["from_date"], before=True
         )
-        row["balance_after"] = get_balance(
+        row["balance_after"] = balances.get_balance(
             row["employee"], row["leave_type"], row["to_date"], before=False
         )
 
@@ -116,15 +121,51 @@ def get_data(filters):
     return data
 
 
-def get_balance(employee, leave_type, date, before=True):
-    condition = "<" if before else "<="
+def get_leave_balances(rows):
+    """Load the ledger of every (employee, leave type) in the rows once"""
+    if not rows:
+        return LeaveBalances([])
 
-    result = frappe.db.sql(f"""
-        SELECT IFNULL(SUM(leaves), 0) AS balance
+    entries = frappe.db.sql("""
+        SELECT employee, leave_type, from_date, SUM(leaves) AS leaves
         FROM `tabLeave Ledger Entry`
-        WHERE employee = %s
-          AND leave_type = %s
-          AND from_date {condition} %s
-    """, (employee, leave_type, date), as_dict=True)
-
-    return result[0]["balance"] if result else 0
+        WHERE employee IN %(employees)s
+          AND leave_type IN %(leave_types)s
+          AND from_date IS NOT NULL
+        GROUP BY employee, leave_type, from_date
+        ORDER BY employee, leave_type, from_date
+    """, {
+        "employees": tuple({row["employee"] for row in rows}),
+        "leave_types": tuple({row["leave_type"] for row in rows}),
+    }, as_dict=True)
+
+    return LeaveBalances(entries)
+
+
+class LeaveBalances:
+    """
+    Leave balances of (employee, leave type) pairs on any date.
+
+    Ledger entries sorted by date are kept with their running total, so a
+    balance is a binary search instead of a SUM over the ledger.
+    """
+
+    def __init__(self, entries):
+        self.ledgers = {}
+        for key, group in groupby(entries, key=lambda e: (e["employee"], e["leave_type"])):
+            group = list(group)
+            self.ledgers[key] = (
+                [getdate(e["from_date"]) for e in group],
+                list(accumulate(e["leaves"] for e in group)),
+            )
+
+    def get_balance(self, employee, leave_type, date, before=True):
+        """Sum of the entries dated before the date (or on or before it)"""
+        ledger = self.ledgers.get((employee, leave_type))
+        if not ledger:
+            return 0
+
+        dates, totals = ledger
+        date = getdate(date)
+        idx = bisect_left(dates, date) if before else bisect_right(dates, date)
+        return totals[idx - 1] if idx else 0
@@ -29,6 +29,12 @@ frappe.query_reports["Mode of Payment Analysis"] = {
 			"label": __("Payment Type"),
 			"fieldtype": "Select",
 			"options": "\nReceive\nPay\nInternal Transfer"
+		},
+		{
+			"fieldname": "daily",
+			"label": __("Daily Cash Position"),
+			"fieldtype": "Check",
+			"description": __("One row per mode of payment and day between From Date and To Date")
 		}
 	],
 
@@ -57,6 +63,10 @@ frappe.query_reports["Mode of Payment Analysis"] = {
 			let color = data.net >= 0 ? "#10b981" : "#ef4444";
 			value = `<span style="color:${color}; font-weight:700;">${value}</span>`;
 		}
+		if (column.fieldname === "closing" && data) {
+			let color = data.closing >= 0 ? "#10b981" : "#ef4444";
+			value = `<span style="color:${color}; font-weight:700;">${value}</span>`;
+		}
 		if (column.fieldname === "before_net" && data) {
 			let color = data.before_net >= 0 ? "#10b981" : "#ef4444";
 			value = `<span style="color:${color}; font-weight:700;">${value}</span>`;
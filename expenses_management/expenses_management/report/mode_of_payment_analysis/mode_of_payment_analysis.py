@@ -1,7 +1,5 @@
 import frappe
 from frappe import _
-from frappe.utils import flt
-from collections import defaultdict
 
 
 def execute(filters=None):
@@ -15,19 +13,23 @@ def execute(filters=None):
 
 def get_columns(filters):
 	has_period = filters.get("from_date") and filters.get("to_date")
+	daily = has_period and filters.get("daily")
 
 	columns = [
 		{"fieldname": "mode_of_payment", "label": _("Mode of Payment"), "fieldtype": "Link", "options": "Mode of Payment", "width": 180},
 		{"fieldname": "type", "label": _("Type"), "fieldtype": "Data", "width": 70},
 	]
 
+	if daily:
+		columns.append({"fieldname": "posting_date", "label": _("Date"), "fieldtype": "Date", "width": 100})
+
 	if has_period:
 		columns.extend([
 			{"fieldname": "before_received", "label": _("Before Received"), "fieldtype": "Currency", "width": 130},
 			{"fieldname": "before_paid", "label": _("Before Paid"), "fieldtype": "Currency", "width": 120},
 			{"fieldname": "before_sales", "label": _("Before Sales"), "fieldtype": "Currency", "width": 120},
 			{"fieldname": "before_expense", "label": _("Before Expense"), "fieldtype": "Currency", "width": 120},
-			{"fieldname": "before_net", "label": _("Before Net"), "fieldtype": "Currency", "width": 110},
+			{"fieldname": "before_net", "label": _("Opening") if daily else _("Before Net"), "fieldtype": "Currency", "width": 110},
 		])
 
 	columns.extend([
@@ -39,20 +41,34 @@ def get_columns(filters):
 		{"fieldname": "total_in", "label": _("Total In"), "fieldtype": "Currency", "width": 120},
 		{"fieldname": "total_out", "label": _("Total Out"), "fieldtype": "Currency", "width": 120},
 		{"fieldname": "net", "label": _("Net"), "fieldtype": "Currency", "width": 120},
-		{"fieldname": "txn_count", "label": _("Txns"), "fieldtype": "Int", "width": 60},
 	])
 
+	if has_period:
+		columns.append({"fieldname": "closing", "label": _("Closing"), "fieldtype": "Currency", "width": 120})
+
+	columns.append({"fieldname": "txn_count", "label": _("Txns"), "fieldtype": "Int", "width": 60})
+
 	return columns
 
 
 def get_data(filters):
+	"""
+	Cash movement per mode of payment in one statement.
+
+	Payment Entries, Sales Invoice Payments and Expense Entries are grouped
+	per mode of payment and day, then split into the movements before the
+	period (opening) and within it. In daily mode every day of the period is a
+	row of its own (after one opening row per mode of payment) and its opening
+	is the running net of the rows before it.
+	"""
 	has_period = filters.get("from_date") and filters.get("to_date")
+	daily = has_period and filters.get("daily")
 
 	# Build base conditions
 	pe_conditions = ["pe.docstatus = 1"]
 	si_conditions = ["si.docstatus = 1"]
 	exp_conditions = ["ee.docstatus = 1"]
-	params = {}
+	params = {"not_set": _("Not Set")}
 
 	if filters.get("company"):
 		pe_conditions.append("pe.company = %(company)s")
@@ -70,159 +86,117 @@ def get_data(filters):
 		pe_conditions.append("pe.payment_type = %(payment_type)s")
 		params["payment_type"] = filters["payment_type"]
 
-	# Date conditions for main period
-	pe_date_cond = ""
-	si_date_cond = ""
-	exp_date_cond = ""
+	# Period: everything up to the end of the period, split at its start
 	if has_period:
-		pe_date_cond = "AND pe.posting_date BETWEEN %(from_date)s AND %(to_date)s"
-		si_date_cond = "AND si.posting_date BETWEEN %(from_date)s AND %(to_date)s"
-		exp_date_cond = "AND ee.posting_date BETWEEN %(from_date)s AND %(to_date)s"
+		pe_conditions.append("pe.posting_date <= %(to_date)s")
+		si_conditions.append("si.posting_date <= %(to_date)s")
+		exp_conditions.append("ee.posting_date <= %(to_date)s")
 		params["from_date"] = filters["from_date"]
 		params["to_date"] = filters["to_date"]
 
-	pe_where = " AND ".join(pe_conditions)
-	si_where = " AND ".join(si_conditions)
-	exp_where = " AND ".join(exp_conditions)
-
-	mop_map = defaultdict(lambda: {
-		"mode_of_payment": "",
-		"type": "",
-		"pe_received": 0, "pe_paid": 0, "pe_internal": 0,
-		"si_amount": 0, "exp_amount": 0,
-		"total_in": 0, "total_out": 0, "net": 0,
-		"txn_count": 0,
-		"before_received": 0, "before_paid": 0,
-		"before_sales": 0, "before_expense": 0, "before_net": 0,
-	})
-
-	# --- Mode of Payment master (for type) ---
-	mop_types = {}
-	for m in frappe.db.get_all("Mode of Payment", fields=["name", "type"]):
-		mop_types[m.name] = m.type
-
-	# === PAYMENT ENTRY (main period or all) ===
-	pe_rows = frappe.db.sql("""
-		SELECT pe.mode_of_payment, pe.payment_type,
-			SUM(pe.paid_amount) AS total_amount,
-			COUNT(*) AS cnt
-		FROM `tabPayment Entry` pe
-		WHERE {where} {date_cond}
-		GROUP BY pe.mode_of_payment, pe.payment_type
-	""".format(where=pe_where, date_cond=pe_date_cond), params, as_dict=True)
-
-	for r in pe_rows:
-		mop = r.mode_of_payment or _("Not Set")
-		rec = mop_map[mop]
-		rec["mode_of_payment"] = mop
-		rec["type"] = mop_types.get(mop, "")
-		amt = flt(r.total_amount)
-		if r.payment_type == "Receive":
-			rec["pe_received"] += amt
-		elif r.payment_type == "Pay":
-			rec["pe_paid"] += amt
-		elif r.payment_type == "Internal Transfer":
-			rec["pe_internal"] += amt
-		rec["txn_count"] += r.cnt
-
-	# === SALES INVOICE PAYMENT (main period or all) ===
-	si_rows = frappe.db.sql("""
-		SELECT sip.mode_of_payment,
-			SUM(sip.base_amount) AS total_amount,
-			COUNT(*) AS cnt
-		FROM `tabSales Invoice Payment` sip
-		INNER JOIN `tabSales Invoice` si ON si.name = sip.parent
-		WHERE {where} {date_cond}
-		GROUP BY sip.mode_of_payment
-	""".format(where=si_where, date_cond=si_date_cond), params, as_dict=True)
-
-	for r in si_rows:
-		mop = r.mode_of_payment or _("Not Set")
-		rec = mop_map[mop]
-		rec["mode_of_payment"] = mop
-		rec["type"] = mop_types.get(mop, "")
-		rec["si_amount"] += flt(r.total_amount)
-		rec["txn_count"] += r.cnt
-
-	# === EXPENSE ENTRY (main period or all) ===
-	exp_rows = frappe.db.sql("""
-		SELECT ee.mode_of_payment,
-			SUM(ee.total_amount) AS total_amount,
-			COUNT(*) AS cnt
-		FROM `tabExpense Entry` ee
-		WHERE {where} {date_cond}
-		GROUP BY ee.mode_of_payment
-	""".format(where=exp_where, date_cond=exp_date_cond), params, as_dict=True)
-
-	for r in exp_rows:
-		mop = r.mode_of_payment or _("Not Set")
-		rec = mop_map[mop]
-		rec["mode_of_payment"] = mop
-		rec["type"] = mop_types.get(mop, "")
-		rec["exp_amount"] += flt(r.total_amount)
-		rec["txn_count"] += r.cnt
-
-	# === BEFORE PERIOD (if period selected) ===
-	if has_period:
-		before_pe = frappe.db.sql("""
-			SELECT pe.mode_of_payment, pe.payment_type,
-				SUM(pe.paid_amount) AS total_amount
-			FROM `tabPayment Entry` pe
-			WHERE {where} AND pe.posting_date < %(from_date)s
-			GROUP BY pe.mode_of_payment, pe.payment_type
-		""".format(where=pe_where), params, as_dict=True)
-
-		for r in before_pe:
-			mop = r.mode_of_payment or _("Not Set")
-			rec = mop_map[mop]
-			rec["mode_of_payment"] = mop
-			rec["type"] = mop_types.get(mop, "")
-			if r.payment_type == "Receive":
-				rec["before_received"] += flt(r.total_amount)
-			elif r.payment_type == "Pay":
-				rec["before_paid"] += flt(r.total_amount)
-
-		before_si = frappe.db.sql("""
-			SELECT sip.mode_of_payment,
-				SUM(sip.base_amount) AS total_amount
-			FROM `tabSales Invoice Payment` sip
-			INNER JOIN `tabSales Invoice` si ON si.name = sip.parent
-			WHERE {where} AND si.posting_date < %(from_date)s
-			GROUP BY sip.mode_of_payment
-		""".format(where=si_where), params, as_dict=True)
-
-		for r in before_si:
-			mop = r.mode_of_payment or _("Not Set")
-			rec = mop_map[mop]
-			rec["before_sales"] += flt(r.total_amount)
-
-		before_exp = frappe.db.sql("""
-			SELECT ee.mode_of_payment,
-				SUM(ee.total_amount) AS total_amount
-			FROM `tabExpense Entry` ee
-			WHERE {where} AND ee.posting_date < %(from_date)s
-			GROUP BY ee.mode_of_payment
-		""".format(where=exp_where), params, as_dict=True)
-
-		for r in before_exp:
-			mop = r.mode_of_payment or _("Not Set")
-			rec = mop_map[mop]
-			rec["before_expense"] += flt(r.total_amount)
-
-	# --- Calculate totals ---
-	data = []
-	for rec in mop_map.values():
-		rec["total_in"] = flt(rec["pe_received"]) + flt(rec["si_amount"])
-		rec["total_out"] = flt(rec["pe_paid"]) + flt(rec["exp_amount"])
-		rec["net"] = flt(rec["total_in"]) - flt(rec["total_out"])
-
-		if has_period:
-			rec["before_net"] = (flt(rec["before_received"]) + flt(rec["before_sales"])) - (flt(rec["before_paid"]) + flt(rec["before_expense"]))
-
-		data.append(rec)
-
-	data.sort(key=lambda x: x["net"], reverse=True)
-	return data
+	is_opening = "m.posting_date < %(from_date)s" if has_period else "0"
+	bucket = f"IF({is_opening}, NULL, m.posting_date)" if daily else "NULL"
+	order_by = "mode_of_payment, posting_date" if daily else "net DESC"
+
+	# Opening of a row: the period opening plus the net of the rows before it
+	opening = """buckets.before_net + COALESCE(SUM(buckets.before_net + buckets.net) OVER (
+		PARTITION BY buckets.mode_of_payment
+		ORDER BY buckets.posting_date
+		ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+	), 0)"""
+
+	return frappe.db.sql("""
+		SELECT
+			buckets.mode_of_payment,
+			buckets.type,
+			buckets.posting_date,
+			buckets.before_received,
+			buckets.before_paid,
+			buckets.before_sales,
+			buckets.before_expense,
+			{opening} AS before_net,
+			buckets.pe_received,
+			buckets.pe_paid,
+			buckets.pe_internal,
+			buckets.si_amount,
+			buckets.exp_amount,
+			buckets.total_in,
+			buckets.total_out,
+			buckets.net,
+			{opening} + buckets.net AS closing,
+			buckets.txn_count
+		FROM (
+			SELECT
+				m.mode_of_payment,
+				MAX(IFNULL(mop.type, '')) AS type,
+				{bucket} AS posting_date,
+				SUM(IF({is_opening}, m.received, 0)) AS before_received,
+				SUM(IF({is_opening}, m.paid, 0)) AS before_paid,
+				SUM(IF({is_opening}, m.sales, 0)) AS before_sales,
+				SUM(IF({is_opening}, m.expense, 0)) AS before_expense,
+				SUM(IF({is_opening}, m.received + m.sales - m.paid - m.expense, 0)) AS before_net,
+				SUM(IF({is_opening}, 0, m.received)) AS pe_received,
+				SUM(IF({is_opening}, 0, m.paid)) AS pe_paid,
+				SUM(IF({is_opening}, 0, m.internal)) AS pe_internal,
+				SUM(IF({is_opening}, 0, m.sales)) AS si_amount,
+				SUM(IF({is_opening}, 0, m.expense)) AS exp_amount,
+				SUM(IF({is_opening}, 0, m.received + m.sales)) AS total_in,
+				SUM(IF({is_opening}, 0, m.paid + m.expense)) AS total_out,
+				SUM(IF({is_opening}, 0, m.received + m.sales - m.paid - m.expense)) AS net,
+				SUM(IF({is_opening}, 0, m.cnt)) AS txn_count
+			FROM (
+				SELECT
+					IFNULL(NULLIF(pe.mode_of_payment, ''), %(not_set)s) AS mode_of_payment,
+					pe.posting_date,
+					SUM(IF(pe.payment_type = 'Receive', pe.paid_amount, 0)) AS received,
+					SUM(IF(pe.payment_type = 'Pay', pe.paid_amount, 0)) AS paid,
+					SUM(IF(pe.payment_type = 'Internal Transfer', pe.paid_amount, 0)) AS internal,
+					0 AS sales,
+					0 AS expense,
+					COUNT(*) AS cnt
+				FROM `tabPayment Entry` pe
+				WHERE {pe_where}
+				GROUP BY 1, pe.posting_date
+
+				UNION ALL
+
+				SELECT
+					IFNULL(NULLIF(sip.mode_of_payment, ''), %(not_set)s),
+					si.posting_date,
+					0, 0, 0,
+					SUM(sip.base_amount),
+					0,
+					COUNT(*)
+				FROM `tabSales Invoice Payment` sip
+				INNER JOIN `tabSales Invoice` si ON si.name = sip.parent
+				WHERE {si_where}
+				GROUP BY 1, si.posting_date
+
+				UNION ALL
+
+				SELECT
+					IFNULL(NULLIF(ee.mode_of_payment, ''), %(not_set)s),
+					ee.posting_date,
+					0, 0, 0, 0,
+					SUM(ee.total_amount),
+					COUNT(*)
+				FROM `tabExpense Entry` ee
+				WHERE {exp_where}
+				GROUP BY 1, ee.posting_date
+			) m
+			LEFT JOIN `tabMode of Payment` mop ON mop.name = m.mode_of_payment
+			GROUP BY m.mode_of_payment, {bucket}
+		) buckets
+		ORDER BY {order_by}
+	""".format(
+		opening=opening,
+		bucket=bucket,
+		is_opening=is_opening,
+		pe_where=" AND ".join(pe_conditions),
+		si_where=" AND ".join(si_conditions),
+		exp_where=" AND ".join(exp_conditions),
+		order_by=order_by,
+	), params, as_dict=True)
 
 
 def get_report_summary(data, filters):
@@ -43,6 +43,13 @@ frappe.query_reports["Stock Items Report"] = {
 					}
 				};
 			}
+		},
+		{
+			"fieldname": "cutoff_date",
+			"label": __("Purchases Before"),
+			"fieldtype": "Date",
+			"default": "2026-01-01",
+			"description": __("Only purchases posted before this date set the rate; leave empty to use the latest purchase")
 		}
 	]
 };
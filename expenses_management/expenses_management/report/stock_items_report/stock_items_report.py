@@ -107,7 +107,8 @@ def get_data(filters):
 			bin.warehouse,
 			item.stock_uom,
 			item.weight_per_unit,
-			item.weight_uom
+			item.weight_uom,
+			bin.valuation_rate
 		FROM
 			`tabBin` bin
 		INNER JOIN
@@ -122,83 +123,63 @@ def get_data(filters):
 			bin.item_code, bin.warehouse
 	""".format(conditions=conditions), filters, as_dict=1)
 
-	# Process each row to add rate information
+	if not data:
+		return data
+
+	# Latest purchase rate of every (item, warehouse) pair, one query per doctype
+	item_codes = list({row["item_code"] for row in data})
+	warehouses = list({row["warehouse"] for row in data})
+	cutoff_date = filters.get("cutoff_date")
+
+	rates = {
+		doctype: get_last_purchase_rates(doctype, item_codes, warehouses, cutoff_date)
+		for doctype in ("Purchase Receipt", "Purchase Invoice")
+	}
+
+	# Fallback chain: Purchase Receipt, then Purchase Invoice, then Bin valuation
 	for row in data:
-		row["last_purchase_rate"] = 0
-		row["purchase_uom"] = ""
-		row["rate_per_ton"] = 0
-		row["rate_source"] = ""
-		row["source_document"] = ""
-		row["posting_date"] = ""
-		row["source_doctype"] = ""
-
-		# Get last purchase rate from Purchase Receipt before 2026-01-01
-		pr_data = get_last_purchase_receipt_rate(
-			row["item_code"],
-			row["warehouse"],
-			"2026-01-01"
-		)
-
-		if pr_data:
-			row["last_purchase_rate"] = flt(pr_data.get("rate"))
-			row["purchase_uom"] = pr_data.get("uom")
-			row["rate_source"] = _("Purchase Receipt")
-			row["source_document"] = pr_data.get("name")
-			row["posting_date"] = pr_data.get("posting_date")
-			row["source_doctype"] = "Purchase Receipt"
+		key = (row["item_code"], row["warehouse"])
+		purchase = rates["Purchase Receipt"].get(key) or rates["Purchase Invoice"].get(key)
+		valuation_rate = flt(row.pop("valuation_rate"))
+
+		if purchase:
+			row["last_purchase_rate"] = flt(purchase.rate)
+			row["purchase_uom"] = purchase.uom
+			row["rate_source"] = (
+				_("Purchase Receipt") if purchase.doctype == "Purchase Receipt" else _("Purchase Invoice")
+			)
+			row["source_document"] = purchase.name
+			row["posting_date"] = purchase.posting_date
+			row["source_doctype"] = purchase.doctype
 			# Calculate rate per ton using weight_per_unit
 			row["rate_per_ton"] = calculate_rate_per_ton(
-				pr_data.get("rate"),
-				pr_data.get("uom"),
+				purchase.rate,
+				purchase.uom,
 				row["weight_per_unit"],
 				row.get("weight_uom")
 			)
-		else:
-			# Try Purchase Invoice if no Purchase Receipt found
-			pi_data = get_last_purchase_invoice_rate(
-				row["item_code"],
-				row["warehouse"],
-				"2026-01-01"
+		elif valuation_rate > 0:
+			row["last_purchase_rate"] = valuation_rate
+			row["purchase_uom"] = row["stock_uom"]
+			row["rate_source"] = _("Bin Valuation")
+			row["source_document"] = ""
+			row["posting_date"] = ""
+			row["source_doctype"] = ""
+			# Calculate rate per ton using weight_per_unit
+			row["rate_per_ton"] = calculate_rate_per_ton(
+				valuation_rate,
+				row["stock_uom"],
+				row["weight_per_unit"],
+				row.get("weight_uom")
 			)
-			if pi_data:
-				row["last_purchase_rate"] = flt(pi_data.get("rate"))
-				row["purchase_uom"] = pi_data.get("uom")
-				row["rate_source"] = _("Purchase Invoice")
-				row["source_document"] = pi_data.get("name")
-				row["posting_date"] = pi_data.get("posting_date")
-				row["source_doctype"] = "Purchase Invoice"
-				# Calculate rate per ton using weight_per_unit
-				row["rate_per_ton"] = calculate_rate_per_ton(
-					pi_data.get("rate"),
-					pi_data.get("uom"),
-					row["weight_per_unit"],
-					row.get("weight_uom")
-				)
-			else:
-				# Try Bin valuation rate if no purchase found
-				bin_data = get_bin_valuation_rate(row["item_code"], row["warehouse"])
-				if bin_data and bin_data.get("valuation_rate"):
-					row["last_purchase_rate"] = flt(bin_data.get("valuation_rate"))
-					row["purchase_uom"] = row["stock_uom"]
-					row["rate_source"] = _("Bin Valuation")
-					row["source_document"] = ""
-					row["posting_date"] = ""
-					row["source_doctype"] = ""
-					# Calculate rate per ton using weight_per_unit
-					row["rate_per_ton"] = calculate_rate_per_ton(
-						bin_data.get("valuation_rate"),
-						row["stock_uom"],
-						row["weight_per_unit"],
-						row.get("weight_uom")
-					)
-				else:
-					row["last_purchase_rate"] = 0
-					row["purchase_uom"] = ""
-					row["rate_per_ton"] = 0
-					row["rate_source"] = _("No Rate Found")
-					row["source_document"] = ""
-					row["posting_date"] = ""
-					row["source_doctype"] = ""
+		else:
+			row["last_purchase_rate"] = 0
+			row["purchase_uom"] = ""
+			row["rate_per_ton"] = 0
+			row["rate_source"] = _("No Rate Found")
+			row["source_document"] = ""
+			row["posting_date"] = ""
+			row["source_doctype"] = ""
 
 	return data
 
@@ -251,52 +232,42 @@ def calculate_rate_per_ton(rate, purchase_uom, weight_per_unit, weight_uom=None)
 	return flt(rate / weight_per_unit_kg * 1000, 2)
 
 
-def get_last_purchase_receipt_rate(item_code, warehouse, before_date):
-	"""Get rate, uom, document name and posting date from last Purchase Receipt before given date"""
-	result = frappe.db.sql("""
-		SELECT pri.rate, pri.uom, pr.name, pr.posting_date
-		FROM `tabPurchase Receipt Item` pri
-		INNER JOIN `tabPurchase Receipt` pr ON pr.name = pri.parent
-		WHERE
-			pri.item_code = %s
-			AND pri.warehouse = %s
-			AND pr.posting_date < %s
-			AND pr.docstatus = 1
-		ORDER BY pr.posting_date DESC, pr.creation DESC
-		LIMIT 1
-	""", (item_code, warehouse, before_date), as_dict=1)
-
-	return result[0] if result else None
-
-
-def get_last_purchase_invoice_rate(item_code, warehouse, before_date):
-	"""Get rate, uom, document name and posting date from last Purchase Invoice before given date"""
-	result = frappe.db.sql("""
-		SELECT pii.rate, pii.uom, pi.name, pi.posting_date
-		FROM `tabPurchase Invoice Item` pii
-		INNER JOIN `tabPurchase Invoice` pi ON pi.name = pii.parent
-		WHERE
-			pii.item_code = %s
-			AND pii.warehouse = %s
-			AND pi.posting_date < %s
-			AND pi.docstatus = 1
-		ORDER BY pi.posting_date DESC, pi.creation DESC
-		LIMIT 1
-	""", (item_code, warehouse, before_date), as_dict=1)
-
-	return result[0] if result else None
-
-
-def get_bin_valuation_rate(item_code, warehouse):
-	"""Get valuation rate from Bin for item and warehouse"""
-	result = frappe.db.sql("""
-		SELECT valuation_rate
-		FROM `tabBin`
-		WHERE
-			item_code = %s
-			AND warehouse = %s
-			AND valuation_rate > 0
-		LIMIT 1
-	""", (item_code, warehouse), as_dict=1)
-
-	return result[0] if result else None
+def get_last_purchase_rates(doctype, item_codes, warehouses, before_date=None):
+	"""
+	Rate, uom, document name and posting date of the last submitted Purchase
+	Receipt / Invoice line of every (item, warehouse) pair, posted before the
+	given date when one is given, as {(item_code, warehouse): row}.
+	"""
+	date_condition = "AND p.posting_date < %(before_date)s" if before_date else ""
+
+	rows = frappe.db.sql(f"""
+		SELECT item_code, warehouse, rate, uom, name, posting_date, %(doctype)s AS doctype
+		FROM (
+			SELECT
+				pi.item_code,
+				pi.warehouse,
+				pi.rate,
+				pi.uom,
+				p.name,
+				p.posting_date,
+				ROW_NUMBER() OVER (
+					PARTITION BY pi.item_code, pi.warehouse
+					ORDER BY p.posting_date DESC, p.creation DESC, pi.idx
+				) AS rn
+			FROM `tab{doctype} Item` pi
+			INNER JOIN `tab{doctype}` p ON p.name = pi.parent
+			WHERE
+				p.docstatus = 1
+				AND pi.item_code IN %(items)s
+				AND pi.warehouse IN %(warehouses)s
+				{date_condition}
+		) latest
+		WHERE rn = 1
+	""", {
+		"doctype": doctype,
+		"items": tuple(item_codes),
+		"warehouses": tuple(warehouses),
+		"before_date": before_date,
+	}, as_dict=1)
+
+	return {(row.item_code, row.warehouse): row for row in rows}
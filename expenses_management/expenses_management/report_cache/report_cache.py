@@ -0,0 +1,162 @@
+# Copyright (c) 2026, Administrator and contributors
+# For license information, please see license.txt
+
+"""
+Result cache for the heavy Almouhana script reports.
+
+A cached result is keyed on the report name, the normalized filters and the
+GL version of every company the report covers. Every GL Entry posted (on
+submit, and the reversals on cancel) bumps the version of its company once
+the transaction is committed, which makes every cached result for that
+company unreachable; a cache hit costs one Redis read and no GL query.
+"""
+
+import hashlib
+import json
+
+import frappe
+from frappe import _
+from frappe.utils import cint, cstr
+
+from expenses_management.expenses_management.cache_version.cache_version import (
+	bump_cache_version,
+	get_cache_versions,
+)
+
+CACHE_PREFIX = "almouhana_report_cache"
+STATS_KEY = "almouhana_report_cache_stats"
+GL_VERSION_KEY = "almouhana_report_cache_gl_version"
+
+# Upper bound for how long a result is kept even if no posting happens
+# (exchange rates and master data changes are not part of the GL version)
+CACHE_TTL = 6 * 60 * 60
+
+
+def get_cached_report_result(report_name, filters, compute, company=None):
+	"""
+	Return the cached result of `compute()` for these filters, computing and
+	storing it on a miss.
+
+	`company` is the filter company; the GL version covers it and all its
+	descendants so a posting in any subsidiary invalidates group results.
+	"""
+	if frappe.flags.in_test or (filters and filters.get("no_cache")):
+		return compute()
+
+	company = company or (filters or {}).get("company")
+	key = get_cache_key(report_name, filters, company)
+
+	result = frappe.cache.get_value(key)
+	if result is not None:
+		record_stat(report_name, "hits")
+		return result
+
+	record_stat(report_name, "misses")
+	result = compute()
+	frappe.cache.set_value(key, result, expires_in_sec=CACHE_TTL)
+	return result
+
+
+def get_cache_key(report_name, filters, company=None):
+	"""Build the cache key from the report, normalized filters and GL version"""
+	payload = json.dumps(
+		{
+			"report": report_name,
+			"filters": normalize_filters(filters),
+			"gl_version": get_gl_version(get_company_tree(company)),
+		},
+		sort_keys=True,
+		default=cstr,
+	)
+	digest = hashlib.sha1(payload.encode()).hexdigest()
+	return f"{CACHE_PREFIX}:{frappe.scrub(report_name)}:{digest}"
+
+
+def normalize_filters(filters):
+	"""Drop empty values and stringify the rest so equivalent filters share a key"""
+	normalized = {}
+	for key, value in (filters or {}).items():
+		if key == "no_cache" or value in (None, "", [], {}):
+			continue
+		if isinstance(value, (list, tuple)):
+			value = sorted(cstr(v) for v in value)
+		else:
+			value = cstr(value)
+		normalized[key] = value
+	return normalized
+
+
+def get_company_tree(company):
+	"""Return the company and all its descendants"""
+	if not company:
+		return []
+
+	lft, rgt = frappe.get_cached_value("Company", company, ["lft", "rgt"]) or (None, None)
+	if not (lft and rgt):
+		return [company]
+
+	return frappe.db.sql_list(
+		"""
+		SELECT name FROM `tabCompany`
+		WHERE lft >= %s AND rgt <= %s
+		ORDER BY name
+		""",
+		(lft, rgt),
+	)
+
+
+def get_gl_version(companies):
+	"""
+	Return {company: version} of the GL of the given companies, or the
+	version of the whole GL when the report is not limited to a company.
+	"""
+	keys = [f"{GL_VERSION_KEY}:{company}" for company in companies] or [GL_VERSION_KEY]
+	return get_cache_versions(keys)
+
+
+def bump_gl_version(doc, method=None):
+	"""GL Entry on_submit: invalidate the cached results of its company once committed"""
+	bump_cache_version(GL_VERSION_KEY, f"{GL_VERSION_KEY}:{doc.company}")
+
+
+def record_stat(report_name, stat):
+	"""Increment the hit / miss counter of a report"""
+	try:
+		frappe.cache.incr(frappe.cache.make_key(f"{STATS_KEY}:{report_name}::{stat}"))
+	except Exception:
+		# Metrics must never break the report
+		pass
+
+
+@frappe.whitelist()
+def get_report_cache_stats():
+	"""Return cache hits, misses and hit ratio per report (administrators only)"""
+	frappe.only_for("System Manager")
+
+	keys = frappe.cache.get_keys(f"{STATS_KEY}:") or []
+	counts = frappe.cache.mget(keys) if keys else []
+
+	stats = {}
+	for key, count in zip(keys, counts):
+		field = frappe.safe_decode(key).split(f"{STATS_KEY}:", 1)[-1]
+		report_name, stat = field.rsplit("::", 1)
+		stats.setdefault(report_name, {"report": report_name, "hits": 0, "misses": 0})
+		stats[report_name][stat] = int(count or 0)
+
+	for row in stats.values():
+		total = row["hits"] + row["misses"]
+		row["hit_ratio"] = round(row["hits"] * 100.0 / total, 2) if total else 0
+
+	return sorted(stats.values(), key=lambda r: r["report"])
+
+
+@frappe.whitelist()
+def clear_report_cache(reset_stats=0):
+	"""Drop all cached report results, optionally resetting the metrics"""
+	frappe.only_for("System Manager")
+
+	frappe.cache.delete_keys(CACHE_PREFIX + ":")
+	if cint(reset_stats):
+		frappe.cache.delete_keys(f"{STATS_KEY}:")
+
+	return {"message": _("Report cache cleared")}
@@ -0,0 +1,152 @@
+# Copyright (c) 2026, Administrator and contributors
+# For license information, please see license.txt
+
+"""
+Background mode for the heavy analytics pages.
+
+`start_report_job` enqueues the page's data method on the long queue and
+returns a job id derived from the user, the report and the normalized
+filters, so identical requests made while a job is queued or running join
+that job instead of starting another one. The job publishes its progress on
+the `report_job_progress` realtime event and keeps its result in the cache
+for REPORT_JOB_TTL, readable through `get_report_job`.
+"""
+
+import hashlib
+import json
+
+import frappe
+from frappe import _
+from frappe.utils import cint, cstr
+
+from expenses_management.expenses_management.report_cache.report_cache import normalize_filters
+
+REPORT_JOB_PREFIX = "expenses_management:report_job"
+REPORT_JOB_TTL = 60 * 60
+REPORT_JOB_TIMEOUT = 60 * 60
+REPORT_JOB_EVENT = "report_job_progress"
+
+# Reports that may run in the background and their data methods
+REPORT_JOB_METHODS = {
+	"customer_analysis_report": "expenses_management.expenses_management.page.customer_analysis_report.customer_analysis_report.get_report_data",
+	"customer_sales_report": "expenses_management.expenses_management.page.customer_sales_report.customer_sales_report.get_report_data",
+	"purchase_requirements_report": "expenses_management.expenses_management.page.purchase_requirements_report.purchase_requirements_report.get_purchase_requirements_data",
+}
+
+
+@frappe.whitelist()
+def start_report_job(report, filters=None):
+	"""Enqueue `report` for `filters` (or join the identical running job) and return its state"""
+	if report not in REPORT_JOB_METHODS:
+		frappe.throw(_("Report {0} cannot run in the background").format(report))
+	check_report_permission(report)
+
+	if isinstance(filters, str):
+		filters = json.loads(filters)
+	filters = filters or {}
+
+	job_id = get_report_job_id(report, filters)
+	state = get_job_state(job_id)
+	if state and state.status in ("Queued", "Running"):
+		return state
+
+	state = frappe._dict(
+		job_id=job_id, report=report, user=frappe.session.user, status="Queued", progress=0, message=None
+	)
+	set_job_state(state)
+
+	frappe.enqueue(
+		"expenses_management.expenses_management.report_jobs.report_jobs.run_report_job",
+		queue="long",
+		timeout=REPORT_JOB_TIMEOUT,
+		job_id=job_id,
+		deduplicate=True,
+		report_job_id=job_id,
+		report=report,
+		filters=filters,
+	)
+	return state
+
+
+@frappe.whitelist()
+def get_report_job(job_id):
+	"""State of a report job of the session user, with the result once it has finished"""
+	state = get_job_state(job_id)
+	if not state:
+		return None
+	if state.user != frappe.session.user:
+		frappe.throw(_("Not permitted"), frappe.PermissionError)
+
+	if state.status == "Finished":
+		state.result = frappe.cache.get_value(f"{REPORT_JOB_PREFIX}:result:{job_id}")
+	return state
+
+
+def check_report_permission(report):
+	"""Only users with a role of the report's page may enqueue it"""
+	if not frappe.get_doc("Page", report.replace("_", "-")).is_permitted():
+		frappe.throw(_("You don't have permission to view this report"), frappe.PermissionError)
+
+
+def run_report_job(report_job_id, report, filters):
+	"""Background worker: run the report method and keep its result"""
+	state = get_job_state(report_job_id) or frappe._dict(
+		job_id=report_job_id, report=report, user=frappe.session.user
+	)
+	frappe.flags.report_job = state
+
+	try:
+		publish_report_progress(0, status="Running")
+		result = frappe.get_attr(REPORT_JOB_METHODS[report])(**filters)
+		frappe.cache.set_value(f"{REPORT_JOB_PREFIX}:result:{report_job_id}", result, expires_in_sec=REPORT_JOB_TTL)
+		publish_report_progress(100, status="Finished")
+	except Exception as e:
+		frappe.log_error(title=f"Report job failed: {report}")
+		publish_report_progress(state.progress or 0, message=cstr(e), status="Failed")
+	finally:
+		frappe.flags.report_job = None
+
+
+def publish_report_progress(progress, message=None, status=None):
+	"""
+	Record and publish the progress of the running report job. Called by the
+	report methods between their stages; a no-op outside a report job.
+	"""
+	state = frappe.flags.report_job
+	if not state:
+		return
+
+	state.progress = cint(progress)
+	state.message = message
+	if status:
+		state.status = status
+	set_job_state(state)
+
+	frappe.publish_realtime(REPORT_JOB_EVENT, state, user=state.user)
+
+
+def get_report_job_id(report, filters):
+	payload = json.dumps(
+		{"user": frappe.session.user, "report": report, "filters": normalize_filters(filters)},
+		sort_keys=True,
+		default=cstr,
+	)
+	return f"{frappe.scrub(report)}:{hashlib.sha1(payload.encode()).hexdigest()}"
+
+
+def get_job_state(job_id):
+	state = frappe.cache.get_value(f"{REPORT_JOB_PREFIX}:state:{job_id}")
+	return frappe._dict(state) if state else None
+
+
+def set_job_state(state):
+	frappe.cache.set_value(
+		f"{REPORT_JOB_PREFIX}:state:{state.job_id}", dict(state), expires_in_sec=REPORT_JOB_TTL
+	)
+
+
+def get_report_job_result(report, filters):
+	"""Result of the session user's finished job for these filters, if still cached"""
+	state = get_job_state(get_report_job_id(report, filters))
+	if state and state.status == "Finished":
+		return frappe.cache.get_value(f"{REPORT_JOB_PREFIX}:result:{state.job_id}")
@@ -0,0 +1,631 @@
+# Copyright (c) 2026, Administrator and contributors
+# For license information, please see license.txt
+
+"""
+Shared query layer of the sales analytics pages (customer analysis, customer
+sales and the realtime sales feed).
+
+One restriction / filter compiler and the batched customer fetchers live here
+so an optimization lands once for every page. Fetchers are memoized per
+request, so helpers that need the same customer data in one call share a
+single query.
+"""
+
+import frappe
+from frappe.utils import cint, flt
+from frappe.utils.caching import request_cache
+
+from expenses_management.expenses_management.doctype.daily_sales_summary.daily_sales_summary import (
+	SOLD_LINE_WEIGHT_KG,
+	is_daily_sales_summary_ready,
+)
+from expenses_management.expenses_management.doctype.item_cost.item_cost import (
+	get_item_cost_field,
+	get_item_cost_join,
+)
+from expenses_management.expenses_management.warehouse_tree.warehouse_tree import (
+	get_city_stock,
+	get_city_warehouse_map,
+)
+
+PAYMENT_STATUS_CONDITIONS = {
+	"paid": "si.outstanding_amount = 0",
+	"not_paid": "si.outstanding_amount > 0",
+	"credit": "si.outstanding_amount > 0 AND si.outstanding_amount < si.grand_total",
+	"unpaid": "si.outstanding_amount = si.grand_total AND si.outstanding_amount > 0",
+}
+
+
+# ============================================
+# RESTRICTIONS AND FILTERS
+# ============================================
+
+def is_admin_or_system_manager():
+	"""Check if user is Administrator or has System Manager role"""
+	if frappe.session.user == "Administrator":
+		return True
+	return "System Manager" in frappe.get_roles()
+
+
+@request_cache
+def get_user_restrictions():
+	"""User permission restrictions of the session user, keyed by filter"""
+	if is_admin_or_system_manager():
+		return {}
+
+	restrictions = {}
+	user_permissions = frappe.permissions.get_user_permissions()
+
+	for doctype, key in (
+		("Customer", "customers"),
+		("Territory", "territories"),
+		("Customer Group", "customer_groups"),
+		("Company", "companies"),
+		("Branch", "branches"),
+	):
+		if doctype in user_permissions:
+			restrictions[key] = [p.get("doc") for p in user_permissions[doctype] if p.get("doc")]
+
+	return restrictions
+
+
+def get_report_conditions(company, from_date, to_date, branch=None, customer=None, pos_profile=None,
+		customer_group=None, territory=None, sales_person=None, payment_status=None):
+	"""
+	Compile the user restrictions and page filters into SQL fragments.
+
+	Returns params, extra_where (on `si`), customer_join / customer_where (on
+	`c`) and summary (join / where on the Daily Sales Summary `f`, None when a
+	filter needs invoice-level fields the summary does not keep).
+	"""
+	restrictions = get_user_restrictions()
+
+	params = {"company": company, "from_date": from_date, "to_date": to_date}
+
+	extra_conditions = []
+	customer_conditions = []
+	summary_conditions = []
+
+	# User restrictions
+	if restrictions.get("customers"):
+		customer_conditions.append("c.name IN %(allowed_customers)s")
+		params["allowed_customers"] = tuple(restrictions["customers"])
+	if restrictions.get("territories"):
+		customer_conditions.append("c.territory IN %(allowed_territories)s")
+		params["allowed_territories"] = tuple(restrictions["territories"])
+	if restrictions.get("customer_groups"):
+		customer_conditions.append("c.customer_group IN %(allowed_customer_groups)s")
+		params["allowed_customer_groups"] = tuple(restrictions["customer_groups"])
+	if restrictions.get("branches"):
+		extra_conditions.append("si.branch IN %(allowed_branches)s")
+		summary_conditions.append("f.branch IN %(allowed_branches)s")
+		params["allowed_branches"] = tuple(restrictions["branches"])
+
+	# Page filters
+	if branch:
+		extra_conditions.append("si.branch = %(branch)s")
+		summary_conditions.append("f.branch = %(branch)s")
+		params["branch"] = branch
+	if customer:
+		extra_conditions.append("si.customer = %(customer)s")
+		summary_conditions.append("f.customer = %(customer)s")
+		params["customer"] = customer
+	if pos_profile:
+		extra_conditions.append("si.pos_profile = %(pos_profile)s")
+		params["pos_profile"] = pos_profile
+	if customer_group:
+		customer_conditions.append("c.customer_group = %(customer_group)s")
+		params["customer_group"] = customer_group
+	if territory:
+		customer_conditions.append("c.territory = %(territory)s")
+		params["territory"] = territory
+	if sales_person:
+		extra_conditions.append(
+			"EXISTS (SELECT 1 FROM `tabSales Team` st WHERE st.parent = si.name AND st.sales_person = %(sales_person)s)"
+		)
+		params["sales_person"] = sales_person
+	if payment_status in PAYMENT_STATUS_CONDITIONS:
+		extra_conditions.append(PAYMENT_STATUS_CONDITIONS[payment_status])
+
+	summary = None
+	if is_daily_sales_summary_ready() and not (pos_profile or sales_person or payment_status):
+		summary = frappe._dict(
+			join="LEFT JOIN `tabCustomer` c ON c.name = f.customer",
+			where=join_conditions(summary_conditions),
+		)
+
+	return frappe._dict(
+		params=params,
+		extra_where=join_conditions(extra_conditions),
+		customer_join="LEFT JOIN `tabCustomer` c ON c.name = si.customer",
+		customer_where=join_conditions(customer_conditions),
+		summary=summary,
+	)
+
+
+def join_conditions(conditions):
+	return (" AND " + " AND ".join(conditions)) if conditions else ""
+
+
+def get_sold_lines(summary=None, q=None, with_cost=False):
+	"""
+	FROM / WHERE / column fragments over the sold lines of the company, so a
+	line aggregate is written once for both sources: the Daily Sales Summary
+	`f` when `summary` is set (see get_report_conditions), the Sales Invoice
+	lines `sii` of `si` otherwise. `tabItem` is joined as `item` in both.
+
+	`q` applies the page filters and user restrictions of get_report_conditions,
+	`with_cost` joins Item Cost and adds the `cost_of_goods` column. Columns are
+	per source row, so aggregate them with SUM (`line_count` is 1 per invoice
+	line).
+	"""
+	if summary:
+		lines = frappe._dict(
+			tables="""`tabDaily Sales Summary` f
+				LEFT JOIN `tabItem` item ON item.name = f.item_code
+				LEFT JOIN `tabSales Invoice` returned_si ON returned_si.name = f.returned_invoice""",
+			where="f.company = %(company)s",
+			customer="f.customer",
+			posting_date="f.posting_date",
+			item_code="f.item_code",
+			is_return="f.is_return",
+			# Live status, it changes with the outstanding amount after the row is written
+			not_credit_note="COALESCE(returned_si.status, '') != 'Credit Note Issued'",
+			line_count="f.line_count",
+			qty="f.qty",
+			stock_qty="f.stock_qty",
+			net_amount="f.net_amount",
+			weight_tons="f.weight_tons",
+		)
+		cost_join = get_item_cost_join(line_alias="f", branch_field="f.branch")
+		if q:
+			filter_join, filter_where = summary.join, q.customer_where + summary.where
+	else:
+		lines = frappe._dict(
+			tables="""`tabSales Invoice Item` sii
+				INNER JOIN `tabSales Invoice` si ON si.name = sii.parent
+				LEFT JOIN `tabItem` item ON item.name = sii.item_code""",
+			where="si.docstatus = 1 AND si.company = %(company)s",
+			customer="si.customer",
+			posting_date="si.posting_date",
+			item_code="sii.item_code",
+			is_return="si.is_return",
+			not_credit_note="si.status != 'Credit Note Issued'",
+			line_count="1",
+			qty="sii.qty",
+			stock_qty="sii.stock_qty",
+			net_amount="sii.base_net_amount",
+			# Same weight as the summary rows and the sold lines
+			weight_tons=f"({SOLD_LINE_WEIGHT_KG}) / 1000",
+		)
+		cost_join = get_item_cost_join()
+		if q:
+			filter_join, filter_where = q.customer_join, q.customer_where + q.extra_where
+
+	if with_cost:
+		lines.tables += cost_join
+		lines.cost_of_goods = f"{lines.stock_qty} * {get_item_cost_field()}"
+	if q:
+		lines.tables += f" {filter_join}"
+		lines.where += filter_where
+
+	return lines
+
+
+def get_filter_options_data():
+	"""
+	Filter options of the sales pages, limited by the user restrictions.
+	Customers are searched on demand (filter_options.search_customers).
+	"""
+	restrictions = get_user_restrictions()
+
+	companies = restrictions.get("companies") or frappe.db.sql_list("SELECT name FROM `tabCompany`")
+	branches = restrictions.get("branches") or frappe.db.sql_list("SELECT name FROM `tabBranch`")
+
+	return {
+		"companies": companies,
+		"branches": branches,
+		"pos_profiles": frappe.db.sql_list("SELECT name FROM `tabPOS Profile` WHERE disabled = 0"),
+		"customer_groups": frappe.db.sql_list("SELECT name FROM `tabCustomer Group`"),
+		"territories": frappe.db.sql_list("SELECT name FROM `tabTerritory`"),
+		"sales_persons": frappe.db.sql_list("SELECT name FROM `tabSales Person`"),
+	}
+
+
+# ============================================
+# BATCHED FETCHERS (memoized per request)
+# ============================================
+
+@request_cache
+def get_customer_terms(customers):
+	"""
+	Names and credit days of a tuple of customers:
+	({customer: customer_name}, {customer: credit_days}).
+	"""
+	if not customers:
+		return {}, {}
+
+	customer_info = frappe.db.sql(
+		"""
+		SELECT name, customer_name, payment_terms
+		FROM `tabCustomer`
+		WHERE name IN %(customers)s
+		""",
+		{"customers": customers},
+		as_dict=True,
+	)
+
+	customer_names = {c.name: c.customer_name or c.name for c in customer_info}
+	customer_payment_terms = {c.name: c.payment_terms for c in customer_info if c.payment_terms}
+
+	# Credit days from the longest term of the payment terms template
+	customer_credit_days = {}
+	if customer_payment_terms:
+		credit_days_data = frappe.db.sql(
+			"""
+			SELECT parent, MAX(credit_days) AS credit_days
+			FROM `tabPayment Terms Template Detail`
+			WHERE parent IN %(terms)s
+			GROUP BY parent
+			""",
+			{"terms": tuple(set(customer_payment_terms.values()))},
+			as_dict=True,
+		)
+
+		terms_to_days = {d.parent: cint(d.credit_days) for d in credit_days_data if cint(d.credit_days) > 0}
+		for cust, terms in customer_payment_terms.items():
+			if terms in terms_to_days:
+				customer_credit_days[cust] = terms_to_days[terms]
+
+	return customer_names, customer_credit_days
+
+
+@request_cache
+def get_customer_credit_limits(customers, company):
+	"""{customer: credit_limit}, the company specific limit winning over the generic one"""
+	if not customers:
+		return {}
+
+	credit_limit_data = frappe.db.sql(
+		"""
+		SELECT parent AS customer, credit_limit, company
+		FROM `tabCustomer Credit Limit`
+		WHERE parent IN %(customers)s
+		AND (company = %(company)s OR company IS NULL OR company = '')
+		ORDER BY CASE WHEN company = %(company)s THEN 0 ELSE 1 END
+		""",
+		{"customers": customers, "company": company},
+		as_dict=True,
+	)
+
+	credit_limits = {}
+	for cl in credit_limit_data:
+		if cl.customer not in credit_limits and flt(cl.credit_limit) > 0:
+			credit_limits[cl.customer] = flt(cl.credit_limit)
+
+	return credit_limits
+
+
+@request_cache
+def get_invoice_dates(company, customers, exclude_credit_notes=False):
+	"""
+	{customer: {first_invoice_date, last_invoice_date}} over all submitted sales,
+	read as two top-1 seeks per customer (see LAST INVOICE LOOKUPS).
+	"""
+	if not customers:
+		return {}
+
+	status_condition = "AND si.status != 'Credit Note Issued'" if exclude_credit_notes else ""
+	date_seek = f"""
+		SELECT si.posting_date
+		FROM `tabSales Invoice` si
+		WHERE si.customer = c.name
+		AND si.docstatus = 1
+		AND si.company = %(company)s
+		AND si.is_return = 0
+		{status_condition}
+		ORDER BY si.posting_date {{order}}
+		LIMIT 1
+	"""
+	invoice_dates = frappe.db.sql(
+		f"""
+		SELECT customer, first_invoice_date, last_invoice_date
+		FROM (
+			SELECT
+				c.name AS customer,
+				({date_seek.format(order="ASC")}) AS first_invoice_date,
+				({date_seek.format(order="DESC")}) AS last_invoice_date
+			FROM `tabCustomer` c
+			WHERE c.name IN %(customers)s
+		) t
+		WHERE first_invoice_date IS NOT NULL
+		""",
+		{"company": company, "customers": customers},
+		as_dict=True,
+	)
+
+	return {d.customer: d for d in invoice_dates}
+
+
+@request_cache
+def get_owner_names(owners):
+	"""{user: full name} for a tuple of users"""
+	if not owners:
+		return {}
+
+	owner_data = frappe.db.sql(
+		"SELECT name, full_name FROM `tabUser` WHERE name IN %(owners)s",
+		{"owners": owners},
+		as_dict=True,
+	)
+	return {d.name: d.full_name or d.name for d in owner_data}
+
+
+@request_cache
+def get_customer_outstanding(customers):
+	"""{customer: outstanding amount} over the submitted invoices of all companies"""
+	if not customers:
+		return {}
+
+	return dict(
+		frappe.db.sql(
+			"""
+			SELECT customer, COALESCE(SUM(outstanding_amount), 0)
+			FROM `tabSales Invoice`
+			WHERE customer IN %(customers)s
+			AND docstatus = 1
+			GROUP BY customer
+			""",
+			{"customers": customers},
+		)
+	)
+
+
+# ============================================
+# SOLD LINES PER CUSTOMER
+# ============================================
+
+def get_all_customer_items_batch(values, extra_where, customer_join, customer_where, customer_list,
+		exclude_credit_notes=False, with_cost=False, with_warehouse_stock=False, weigh_all_lines=False):
+	"""
+	{customer: [sold lines]} of the period for a tuple of customers, newest
+	invoice first, with weight, rate per ton, tax and the current stock of
+	the item (`current_stock`, over all warehouses).
+
+	`with_cost` adds cost of goods and revenue from Item Cost,
+	`with_warehouse_stock` the line warehouse (of its Delivery Note when
+	delivered separately) with its stock and the stock of its city warehouse.
+	`weigh_all_lines` weighs every line at weight_per_unit kg (1 when unset),
+	the rule of the customer sales page, instead of stock items only.
+	"""
+	status_condition = "AND si.status != 'Credit Note Issued'" if exclude_credit_notes else ""
+	cost_join = get_item_cost_join() if with_cost else ""
+	cost_column = f"sii.stock_qty * {get_item_cost_field()}" if with_cost else "0"
+	warehouse_column = """COALESCE(
+				(SELECT dni.warehouse FROM `tabDelivery Note Item` dni
+				 WHERE dni.si_detail = sii.name AND dni.docstatus = 1 LIMIT 1),
+				sii.warehouse
+			)""" if with_warehouse_stock else "NULL"
+
+	items = frappe.db.sql(
+		f"""
+		SELECT
+			si.customer,
+			si.name AS invoice_id,
+			si.posting_date,
+			si.owner AS invoice_owner,
+			si.branch AS invoice_branch,
+			si.base_grand_total AS invoice_grand_total,
+			si.outstanding_amount AS invoice_outstanding_amount,
+			sii.item_code,
+			sii.item_name,
+			sii.uom AS invoice_uom,
+			sii.stock_uom,
+			sii.qty,
+			sii.stock_qty,
+			{warehouse_column} AS item_warehouse,
+			sii.base_net_amount AS total_amount,
+			COALESCE(sii.base_net_amount * (si.base_total_taxes_and_charges / NULLIF(si.base_net_total, 0)), 0) AS tax_amount,
+			{cost_column} AS cost_of_goods,
+			COALESCE(item.weight_per_unit, 0) AS weight_per_unit,
+			item.weight_uom,
+			COALESCE(item.is_stock_item, 0) AS is_stock_item
+		FROM `tabSales Invoice Item` sii
+		INNER JOIN `tabSales Invoice` si ON si.name = sii.parent
+		LEFT JOIN `tabItem` item ON item.name = sii.item_code
+		{cost_join}
+		{customer_join}
+		WHERE si.docstatus = 1
+		AND si.company = %(company)s
+		AND si.posting_date BETWEEN %(from_date)s AND %(to_date)s
+		AND si.customer IN %(customers)s
+		AND si.is_return = 0
+		{status_condition}
+		{customer_where}
+		{extra_where}
+		ORDER BY si.customer, si.posting_date DESC, si.name
+		""",
+		{**values, "customers": customer_list},
+		as_dict=True,
+	)
+
+	if not items:
+		return {}
+
+	item_codes = list({i.item_code for i in items})
+	owner_names = get_owner_names(tuple(sorted({i.invoice_owner for i in items if i.invoice_owner})))
+
+	# Stock per (item, warehouse) and per item over all warehouses, in one query
+	warehouse_stock_map = {}
+	total_stock_map = {}
+	for d in frappe.db.sql(
+		"""
+		SELECT item_code, warehouse, COALESCE(actual_qty, 0) AS actual_qty
+		FROM `tabBin`
+		WHERE item_code IN %(items)s
+		""",
+		{"items": tuple(item_codes)},
+		as_dict=True,
+	):
+		warehouse_stock_map[(d.item_code, d.warehouse)] = flt(d.actual_qty)
+		total_stock_map[d.item_code] = total_stock_map.get(d.item_code, 0) + flt(d.actual_qty)
+
+	# Warehouse display names and city warehouses from the cached Warehouse tree
+	warehouse_names, city_warehouse_map, city_stock_map = {}, {}, {}
+	if with_warehouse_stock:
+		warehouse_tree = get_city_warehouse_map()
+		warehouse_names = warehouse_tree["names"]
+		city_warehouse_map = {
+			wh: warehouse_tree["city_of"][wh]
+			for wh in {i.item_warehouse for i in items if i.item_warehouse}
+			if wh in warehouse_tree["city_of"]
+		}
+		city_stock_map = get_city_stock(item_codes, set(city_warehouse_map.values()))
+
+	customer_items = {}
+	for item in items:
+		is_stock_item = cint(item.is_stock_item)
+
+		# Weight and rate per ton only for stock items, weight_per_unit in kg unless the weight UOM is طن (ton)
+		# (the rule of SOLD_LINE_WEIGHT_KG, keep both in step)
+		if weigh_all_lines:
+			weight_per_unit_kg = flt(item.weight_per_unit) or 1
+			total_weight_kg = flt(item.stock_qty) * weight_per_unit_kg
+		elif is_stock_item:
+			if item.weight_uom == "طن":
+				weight_per_unit_kg = flt(item.weight_per_unit) * 1000
+			else:
+				weight_per_unit_kg = flt(item.weight_per_unit) or 1
+			total_weight_kg = flt(item.stock_qty) * weight_per_unit_kg
+		else:
+			weight_per_unit_kg = total_weight_kg = 0
+
+		weight_in_tons = total_weight_kg / 1000
+		rate_per_ton = flt(item.total_amount) / weight_in_tons if weight_in_tons > 0 else 0
+		tax_amount = flt(item.tax_amount, 2)
+
+		row = {
+			"invoice_id": item.invoice_id,
+			"invoice_grand_total": flt(item.invoice_grand_total, 2),
+			"invoice_outstanding_amount": flt(item.invoice_outstanding_amount, 2),
+			"posting_date": str(item.posting_date) if item.posting_date else "",
+			"invoice_creator": owner_names.get(item.invoice_owner, item.invoice_owner or ""),
+			"invoice_branch": item.invoice_branch or "",
+			"item_code": item.item_code,
+			"item_name": item.item_name,
+			"invoice_uom": item.invoice_uom,
+			"stock_uom": item.stock_uom,
+			"qty": flt(item.qty, 3),
+			"stock_qty": flt(item.stock_qty, 3),
+			"is_stock_item": is_stock_item,
+			"weight_per_unit_kg": weight_per_unit_kg,
+			"total_weight_kg": flt(total_weight_kg, 2),
+			"weight_in_tons": flt(weight_in_tons, 4),
+			"total_amount": flt(item.total_amount, 2),
+			"tax_amount": tax_amount,
+			"total_after_tax": flt(item.total_amount, 2) + tax_amount,
+			"rate_per_ton": flt(rate_per_ton, 2),
+			"current_stock": flt(total_stock_map.get(item.item_code, 0), 3),
+		}
+
+		if with_cost:
+			row["cost_of_goods"] = flt(item.cost_of_goods, 2)
+			row["revenue"] = flt(flt(item.total_amount) - flt(item.cost_of_goods), 2)
+
+		if with_warehouse_stock:
+			item_warehouse = item.item_warehouse or ""
+			city_warehouse = city_warehouse_map.get(item_warehouse, "")
+			row.update({
+				"item_warehouse": item_warehouse,
+				"item_warehouse_name": warehouse_names.get(item_warehouse, item_warehouse),
+				"warehouse_stock": flt(warehouse_stock_map.get((item.item_code, item_warehouse), 0), 3),
+				"city_warehouse": city_warehouse,
+				"city_warehouse_name": warehouse_names.get(city_warehouse, city_warehouse),
+				"city_stock": flt(city_stock_map.get((item.item_code, city_warehouse), 0), 3) if city_warehouse else 0,
+			})
+
+		customer_items.setdefault(item.customer, []).append(row)
+
+	return customer_items
+
+
+# ============================================
+# LAST INVOICE LOOKUPS
+# ============================================
+# Each lookup is a top-1 seek per customer / invoice on the Sales Invoice
+# (customer, posting_date) and (customer, creation) indexes (see
+# patches/v1_0/add_sales_invoice_customer_indexes.py), so the cost follows the
+# number of rows returned, not the customers' invoice history.
+
+@request_cache
+def get_last_invoices_before(company, customers, from_date, exclude_credit_notes=False):
+	"""
+	{customer: last submitted sale before from_date} with last_invoice_id,
+	last_invoice_date, last_invoice_amount and last_invoice_branch.
+	"""
+	if not customers:
+		return {}
+
+	status_condition = "AND si2.status != 'Credit Note Issued'" if exclude_credit_notes else ""
+	last_invoices = frappe.db.sql(
+		f"""
+		SELECT
+			c.name AS customer,
+			si.name AS last_invoice_id,
+			si.posting_date AS last_invoice_date,
+			si.base_grand_total AS last_invoice_amount,
+			si.branch AS last_invoice_branch
+		FROM `tabCustomer` c
+		INNER JOIN `tabSales Invoice` si ON si.name = (
+			SELECT si2.name
+			FROM `tabSales Invoice` si2
+			WHERE si2.customer = c.name
+			AND si2.posting_date < %(from_date)s
+			AND si2.docstatus = 1
+			AND si2.company = %(company)s
+			AND si2.is_return = 0
+			{status_condition}
+			ORDER BY si2.posting_date DESC, si2.creation DESC
+			LIMIT 1
+		)
+		WHERE c.name IN %(customers)s
+		""",
+		{"company": company, "customers": customers, "from_date": from_date},
+		as_dict=True,
+	)
+
+	return {d.customer: d for d in last_invoices}
+
+
+def get_previous_invoices(invoice_names):
+	"""{invoice: the customer's previous submitted invoice (name, posting_date, grand_total)}"""
+	if not invoice_names:
+		return {}
+
+	previous_invoices = frappe.db.sql(
+		"""
+		SELECT
+			cur.name AS current_name,
+			prev.name,
+			prev.posting_date,
+			prev.grand_total
+		FROM `tabSales Invoice` cur
+		INNER JOIN `tabSales Invoice` prev ON prev.name = (
+			SELECT si.name
+			FROM `tabSales Invoice` si
+			WHERE si.customer = cur.customer
+			AND si.creation < cur.creation
+			AND si.docstatus = 1
+			ORDER BY si.creation DESC
+			LIMIT 1
+		)
+		WHERE cur.name IN %(names)s
+		""",
+		{"names": tuple(invoice_names)},
+		as_dict=True,
+	)
+
+	return {
+		d.current_name: frappe._dict(name=d.name, posting_date=d.posting_date, grand_total=d.grand_total)
+		for d in previous_invoices
+	}
@@ -0,0 +1,297 @@
+# Copyright (c) 2026, Administrator and contributors
+# For license information, please see license.txt
+
+"""
+Incremental VAT ledger.
+
+Every submitted Sales Invoice, Purchase Invoice, Expense Entry and Journal
+Entry writes pre-categorized VAT Ledger Entry rows (one per voucher), and
+cancelling the voucher flags them as cancelled. The Almouhana VAT Report then
+reads a few grouped aggregates from the ledger instead of recomputing every
+section from the source documents.
+
+The categorization mirrors the source-document queries of the VAT report.
+Existing vouchers are loaded with:
+
+	bench --site <site> execute expenses_management.expenses_management.vat_ledger.vat_ledger.backfill_vat_ledger
+"""
+
+import frappe
+from frappe.utils import flt, now
+
+VAT_LEDGER_READY_KEY = "vat_ledger_backfilled"
+BACKFILL_BATCH_SIZE = 500
+
+LEDGER_FIELDS = (
+	"name",
+	"company",
+	"posting_date",
+	"section",
+	"category",
+	"is_return",
+	"net_amount",
+	"vat_amount",
+	"is_cancelled",
+	"voucher_type",
+	"voucher_no",
+	"creation",
+	"modified",
+	"owner",
+	"modified_by",
+)
+
+
+def is_vat_ledger_ready():
+	"""The VAT report only reads the ledger once existing vouchers were backfilled"""
+	return bool(frappe.utils.cint(frappe.db.get_default(VAT_LEDGER_READY_KEY)))
+
+
+# ============================================
+# DOCUMENT EVENT HANDLERS
+# ============================================
+
+def make_vat_ledger_entries(doc, method=None):
+	"""On submit: write the VAT ledger rows of the voucher"""
+	write_vat_ledger_entries(doc.doctype, [doc.name])
+
+
+def cancel_vat_ledger_entries(doc, method=None):
+	"""On cancel: flag the voucher's VAT ledger rows as cancelled"""
+	frappe.db.sql(
+		"""
+		UPDATE `tabVAT Ledger Entry`
+		SET is_cancelled = 1, modified = %s, modified_by = %s
+		WHERE voucher_type = %s AND voucher_no = %s
+		""",
+		(now(), frappe.session.user, doc.doctype, doc.name),
+	)
+
+
+# ============================================
+# LEDGER WRITER
+# ============================================
+
+def write_vat_ledger_entries(voucher_type, voucher_nos):
+	"""(Re)build the ledger rows for a batch of submitted vouchers of one type"""
+	if not voucher_nos:
+		return
+
+	get_rows = VOUCHER_ROW_GETTERS[voucher_type]
+	rows = get_rows(tuple(voucher_nos))
+
+	frappe.db.sql(
+		"""
+		DELETE FROM `tabVAT Ledger Entry`
+		WHERE voucher_type = %s AND voucher_no IN %s
+		""",
+		(voucher_type, tuple(voucher_nos)),
+	)
+
+	timestamp = now()
+	user = frappe.session.user
+	values = []
+	for r in rows:
+		if not r.category:
+			# Not a VAT relevant voucher (e.g. SAR invoice without VAT)
+			continue
+
+		values.append((
+			frappe.generate_hash(length=10),
+			r.company,
+			r.posting_date,
+			r.section,
+			r.category,
+			frappe.utils.cint(r.is_return),
+			flt(r.net_amount),
+			flt(r.vat_amount),
+			0,
+			voucher_type,
+			r.voucher_no,
+			timestamp,
+			timestamp,
+			user,
+			user,
+		))
+
+	if values:
+		frappe.db.bulk_insert("VAT Ledger Entry", LEDGER_FIELDS, values)
+
+
+def get_sales_invoice_rows(voucher_nos):
+	"""Categorized VAT rows for Sales Invoices (see get_sales_vat_totals)"""
+	return frappe.db.sql(
+		"""
+		SELECT
+			si.name AS voucher_no,
+			si.company,
+			si.posting_date,
+			'Sales' AS section,
+			si.is_return,
+			ABS(si.base_net_total) AS net_amount,
+			CASE
+				WHEN COALESCE(vat.vat_amount, 0) != 0
+					AND IFNULL(si.custom_zatca_export_invoice, 0) = 0
+				THEN ABS(vat.vat_amount)
+				ELSE 0
+			END AS vat_amount,
+			CASE
+				WHEN IFNULL(si.custom_zatca_export_invoice, 0) = 1 THEN 'Exports'
+				WHEN IFNULL(NULLIF(si.currency, ''), 'SAR') != 'SAR'
+					AND COALESCE(vat.vat_amount, 0) = 0 THEN 'Exports'
+				WHEN COALESCE(vat.vat_amount, 0) != 0 THEN 'Standard'
+				ELSE NULL
+			END AS category
+		FROM `tabSales Invoice` si
+		LEFT JOIN (
+			SELECT
+				stc.parent,
+				SUM(stc.base_tax_amount) AS vat_amount
+			FROM `tabSales Taxes and Charges` stc
+			INNER JOIN `tabAccount` acc ON acc.name = stc.account_head
+			WHERE acc.account_type = 'Tax'
+			AND stc.parenttype = 'Sales Invoice'
+			AND stc.parent IN %(voucher_nos)s
+			GROUP BY stc.parent
+		) vat ON vat.parent = si.name
+		WHERE si.docstatus = 1 AND si.name IN %(voucher_nos)s
+		""",
+		{"voucher_nos": voucher_nos},
+		as_dict=True,
+	)
+
+
+def get_purchase_invoice_rows(voucher_nos):
+	"""Categorized VAT rows for Purchase Invoices (see get_purchase_vat_totals)"""
+	return frappe.db.sql(
+		"""
+		SELECT
+			pi.name AS voucher_no,
+			pi.company,
+			pi.posting_date,
+			'Purchase' AS section,
+			pi.is_return,
+			ABS(pi.base_net_total + COALESCE(tax.transport_amount, 0)) AS net_amount,
+			ABS(COALESCE(tax.vat_amount, 0)) AS vat_amount,
+			CASE
+				WHEN IFNULL(pi.custom_zatca_import_invoice, 0) = 1 THEN 'ImportsCustoms'
+				WHEN IFNULL(NULLIF(pi.currency, ''), 'SAR') != 'SAR' THEN 'ImportsReverseCharge'
+				WHEN COALESCE(tax.vat_amount, 0) != 0 THEN 'Standard'
+				ELSE NULL
+			END AS category
+		FROM `tabPurchase Invoice` pi
+		LEFT JOIN (
+			SELECT
+				ptc.parent,
+				SUM(CASE WHEN acc.account_type = 'Tax' THEN ptc.base_tax_amount ELSE 0 END) AS vat_amount,
+				SUM(CASE WHEN acc.account_type = 'Expense Account' THEN ptc.base_tax_amount ELSE 0 END) AS transport_amount
+			FROM `tabPurchase Taxes and Charges` ptc
+			INNER JOIN `tabAccount` acc ON acc.name = ptc.account_head
+			WHERE acc.account_type IN ('Tax', 'Expense Account')
+			AND ptc.parenttype = 'Purchase Invoice'
+			AND ptc.parent IN %(voucher_nos)s
+			GROUP BY ptc.parent
+		) tax ON tax.parent = pi.name
+		WHERE pi.docstatus = 1 AND pi.name IN %(voucher_nos)s
+		""",
+		{"voucher_nos": voucher_nos},
+		as_dict=True,
+	)
+
+
+def get_expense_entry_rows(voucher_nos):
+	"""Categorized VAT rows for Expense Entries, VAT taken from their GL (see get_expenses_vat_totals)"""
+	rows = frappe.db.sql(
+		"""
+		SELECT
+			gl.voucher_no,
+			gl.company,
+			gl.posting_date,
+			'Expense' AS section,
+			0 AS is_return,
+			ABS(ee.total_amount_before_tax) AS net_amount,
+			ABS(SUM(CASE WHEN acc.account_type = 'Tax' THEN gl.debit - gl.credit ELSE 0 END)) AS vat_amount
+		FROM `tabGL Entry` gl
+		JOIN `tabExpense Entry` ee ON ee.name = gl.voucher_no
+		LEFT JOIN `tabAccount` acc ON acc.name = gl.account
+		WHERE gl.is_cancelled = 0
+		AND gl.voucher_type = 'Expense Entry'
+		AND gl.voucher_no IN %(voucher_nos)s
+		GROUP BY gl.voucher_no, gl.company, gl.posting_date, ee.total_amount_before_tax
+		""",
+		{"voucher_nos": voucher_nos},
+		as_dict=True,
+	)
+
+	for r in rows:
+		r.category = "Standard" if flt(r.vat_amount) > 0 else "Zero Rated"
+
+	return rows
+
+
+def get_journal_entry_rows(voucher_nos):
+	"""Net VAT adjustment rows for Journal Entries (see get_journal_entry_vat)"""
+	rows = frappe.db.sql(
+		"""
+		SELECT
+			gl.voucher_no,
+			gl.company,
+			gl.posting_date,
+			'Journal' AS section,
+			0 AS is_return,
+			0 AS net_amount,
+			SUM(gl.debit - gl.credit) AS vat_amount
+		FROM `tabGL Entry` gl
+		INNER JOIN `tabAccount` acc ON acc.name = gl.account
+		WHERE gl.is_cancelled = 0
+		AND gl.voucher_type = 'Journal Entry'
+		AND acc.account_type = 'Tax'
+		AND gl.voucher_no IN %(voucher_nos)s
+		GROUP BY gl.voucher_no, gl.company, gl.posting_date
+		""",
+		{"voucher_nos": voucher_nos},
+		as_dict=True,
+	)
+
+	for r in rows:
+		# Signed: positive = input VAT, negative = output VAT adjustment
+		r.category = "Adjustment" if flt(r.vat_amount) else None
+
+	return rows
+
+
+VOUCHER_ROW_GETTERS = {
+	"Sales Invoice": get_sales_invoice_rows,
+	"Purchase Invoice": get_purchase_invoice_rows,
+	"Expense Entry": get_expense_entry_rows,
+	"Journal Entry": get_journal_entry_rows,
+}
+
+
+# ============================================
+# BACKFILL
+# ============================================
+
+def backfill_vat_ledger(voucher_types=None, from_date=None):
+	"""
+	Rebuild the VAT ledger from submitted source documents in batches and mark
+	the ledger as ready for the VAT report.
+	"""
+	voucher_types = voucher_types or list(VOUCHER_ROW_GETTERS)
+	if isinstance(voucher_types, str):
+		voucher_types = [voucher_types]
+
+	for voucher_type in voucher_types:
+		filters = {"docstatus": 1}
+		if from_date:
+			filters["posting_date"] = [">=", from_date]
+
+		names = frappe.get_all(voucher_type, filters=filters, pluck="name", order_by="posting_date")
+
+		for start in range(0, len(names), BACKFILL_BATCH_SIZE):
+			write_vat_ledger_entries(voucher_type, names[start : start + BACKFILL_BATCH_SIZE])
+			frappe.db.commit()
+
+		print(f"VAT Ledger: {len(names)} {voucher_type} vouchers processed")
+
+	frappe.db.set_default(VAT_LEDGER_READY_KEY, 1)
+	frappe.db.commit()
@@ -0,0 +1,83 @@
+# Copyright (c) 2026, Administrator and contributors
+# For license information, please see license.txt
+
+"""
+Cached view of the Warehouse tree.
+
+City warehouses are the group warehouses flagged with custom_city_warehouse;
+every warehouse belongs to the nearest city warehouse above it (or itself).
+The map is built from one pass over the tree and dropped whenever a Warehouse
+is saved, renamed or deleted.
+"""
+
+import frappe
+
+CITY_WAREHOUSE_MAP_KEY = "expenses_management:city_warehouse_map"
+
+
+def get_city_warehouse_map():
+	"""
+	Return {"city_of": {warehouse: city_warehouse}, "names": {warehouse: warehouse_name}}
+	for all warehouses.
+	"""
+	return frappe.cache.get_value(CITY_WAREHOUSE_MAP_KEY, generator=build_city_warehouse_map)
+
+
+def build_city_warehouse_map():
+	"""Walk the tree in lft order keeping the stack of enclosing city warehouses"""
+	warehouses = frappe.db.sql(
+		"""
+		SELECT name, warehouse_name, lft, rgt, custom_city_warehouse
+		FROM `tabWarehouse`
+		ORDER BY lft
+		""",
+		as_dict=True,
+	)
+
+	city_of = {}
+	names = {}
+	open_cities = []  # (name, rgt) of city warehouses enclosing the current node
+
+	for wh in warehouses:
+		names[wh.name] = wh.warehouse_name or wh.name
+
+		while open_cities and open_cities[-1][1] < wh.lft:
+			open_cities.pop()
+
+		if wh.custom_city_warehouse:
+			open_cities.append((wh.name, wh.rgt))
+
+		if open_cities:
+			city_of[wh.name] = open_cities[-1][0]
+
+	return {"city_of": city_of, "names": names}
+
+
+def clear_city_warehouse_map(doc=None, method=None):
+	"""Warehouse on_update / after_rename / on_trash"""
+	frappe.cache.delete_value(CITY_WAREHOUSE_MAP_KEY)
+
+
+def get_city_stock(item_codes, city_warehouses):
+	"""Total actual qty per (item_code, city_warehouse) across each city's subtree"""
+	if not item_codes or not city_warehouses:
+		return {}
+
+	rows = frappe.db.sql(
+		"""
+		SELECT
+			b.item_code,
+			city.name AS city_warehouse,
+			COALESCE(SUM(b.actual_qty), 0) AS total_qty
+		FROM `tabWarehouse` city
+		INNER JOIN `tabWarehouse` w ON w.lft >= city.lft AND w.rgt <= city.rgt
+		INNER JOIN `tabBin` b ON b.warehouse = w.name
+		WHERE city.name IN %(cities)s
+		AND b.item_code IN %(items)s
+		GROUP BY b.item_code, city.name
+		""",
+		{"items": tuple(item_codes), "cities": tuple(city_warehouses)},
+		as_dict=True,
+	)
+
+	return {(r.item_code, r.city_warehouse): r.total_qty for r in rows}
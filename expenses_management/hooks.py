@@ -53,6 +53,7 @@ app_include_js = [
     "/assets/expenses_management/js/workflow_approvals.js",
     "/assets/expenses_management/js/assignments_mentions.js",
     "/assets/expenses_management/js/attachment_guard.js",
+    "/assets/expenses_management/js/report_jobs.js",
 ]
 
 # include js, css files in header of web template
@@ -205,11 +206,153 @@ doc_events = {
         ],
         "on_submit": [
             "expenses_management.expenses_management.stock_reservation.reservation_handler.sales_invoice_on_submit",
+            "expenses_management.expenses_management.vat_ledger.vat_ledger.make_vat_ledger_entries",
+            "expenses_management.expenses_management.doctype.daily_sales_summary.daily_sales_summary.update_daily_sales_summary",
+            "expenses_management.expenses_management.page.sales_invoice_realtime.sales_invoice_realtime.publish_sales_invoice",
+            "expenses_management.expenses_management.doctype.customer_balance_snapshot.customer_balance_snapshot.invalidate_customer_balance_snapshots",
         ],
         "on_cancel": [
             "expenses_management.expenses_management.stock_reservation.reservation_handler.sales_invoice_on_cancel",
+            "expenses_management.expenses_management.vat_ledger.vat_ledger.cancel_vat_ledger_entries",
+            "expenses_management.expenses_management.doctype.daily_sales_summary.daily_sales_summary.update_daily_sales_summary",
+            "expenses_management.expenses_management.doctype.customer_balance_snapshot.customer_balance_snapshot.invalidate_customer_balance_snapshots",
         ],
     },
+    "GL Entry": {
+        "on_submit": "expenses_management.expenses_management.report_cache.report_cache.bump_gl_version",
+    },
+    "Payment Entry": {
+        "on_submit": "expenses_management.expenses_management.doctype.customer_balance_snapshot.customer_balance_snapshot.invalidate_customer_balance_snapshots",
+        "on_cancel": "expenses_management.expenses_management.doctype.customer_balance_snapshot.customer_balance_snapshot.invalidate_customer_balance_snapshots",
+    },
+    "Purchase Invoice": {
+        "on_submit": [
+            "expenses_management.expenses_management.vat_ledger.vat_ledger.make_vat_ledger_entries",
+            "expenses_management.expenses_management.doctype.item_cost.item_cost.refresh_purchase_item_costs",
+        ],
+        "on_cancel": [
+            "expenses_management.expenses_management.vat_ledger.vat_ledger.cancel_vat_ledger_entries",
+            "expenses_management.expenses_management.doctype.item_cost.item_cost.refresh_purchase_item_costs",
+        ],
+    },
+    "Purchase Receipt": {
+        "on_submit": "expenses_management.expenses_management.doctype.item_cost.item_cost.refresh_purchase_item_costs",
+        "on_cancel": "expenses_management.expenses_management.doctype.item_cost.item_cost.refresh_purchase_item_costs",
+    },
+    "Expense Entry": {
+        "on_submit": [
+            "expenses_management.expenses_management.vat_ledger.vat_ledger.make_vat_ledger_entries",
+            "expenses_management.expenses_management.doctype.monthly_expense_summary.monthly_expense_summary.update_monthly_expense_summary",
+            "expenses_management.expenses_management.expense_dashboard.expense_dashboard.clear_dashboard_cache",
+        ],
+        "on_cancel": [
+            "expenses_management.expenses_management.vat_ledger.vat_ledger.cancel_vat_ledger_entries",
+            "expenses_management.expenses_management.doctype.monthly_expense_summary.monthly_expense_summary.update_monthly_expense_summary",
+            "expenses_management.expenses_management.expense_dashboard.expense_dashboard.clear_dashboard_cache",
+        ],
+    },
+    "Journal Entry": {
+        "on_submit": [
+            "expenses_management.expenses_management.vat_ledger.vat_ledger.make_vat_ledger_entries",
+            "expenses_management.expenses_management.doctype.customer_balance_snapshot.customer_balance_snapshot.invalidate_customer_balance_snapshots",
+        ],
+        "on_cancel": [
+            "expenses_management.expenses_management.vat_ledger.vat_ledger.cancel_vat_ledger_entries",
+            "expenses_management.expenses_management.doctype.customer_balance_snapshot.customer_balance_snapshot.invalidate_customer_balance_snapshots",
+        ],
+    },
+    "Warehouse": {
+        "on_update": [
+            "expenses_management.expenses_management.warehouse_tree.warehouse_tree.clear_city_warehouse_map",
+            "expenses_management.expenses_management.filter_options.filter_options.clear_filter_options",
+            "expenses_management.expenses_management.item_catalogue.item_catalogue.clear_item_catalogue",
+        ],
+        "after_rename": [
+            "expenses_management.expenses_management.warehouse_tree.warehouse_tree.clear_city_warehouse_map",
+            "expenses_management.expenses_management.filter_options.filter_options.clear_filter_options",
+            "expenses_management.expenses_management.item_catalogue.item_catalogue.clear_item_catalogue",
+        ],
+        "on_trash": [
+            "expenses_management.expenses_management.warehouse_tree.warehouse_tree.clear_city_warehouse_map",
+            "expenses_management.expenses_management.filter_options.filter_options.clear_filter_options",
+            "expenses_management.expenses_management.item_catalogue.item_catalogue.clear_item_catalogue",
+        ],
+    },
+    "Company": {
+        "on_update": "expenses_management.expenses_management.filter_options.filter_options.clear_filter_options",
+        "after_rename": "expenses_management.expenses_management.filter_options.filter_options.clear_filter_options",
+        "on_trash": "expenses_management.expenses_management.filter_options.filter_options.clear_filter_options",
+    },
+    "Branch": {
+        "on_update": "expenses_management.expenses_management.filter_options.filter_options.clear_filter_options",
+        "after_rename": "expenses_management.expenses_management.filter_options.filter_options.clear_filter_options",
+        "on_trash": "expenses_management.expenses_management.filter_options.filter_options.clear_filter_options",
+    },
+    "POS Profile": {
+        "on_update": "expenses_management.expenses_management.filter_options.filter_options.clear_filter_options",
+        "after_rename": "expenses_management.expenses_management.filter_options.filter_options.clear_filter_options",
+        "on_trash": "expenses_management.expenses_management.filter_options.filter_options.clear_filter_options",
+    },
+    "Customer Group": {
+        "on_update": "expenses_management.expenses_management.filter_options.filter_options.clear_filter_options",
+        "after_rename": "expenses_management.expenses_management.filter_options.filter_options.clear_filter_options",
+        "on_trash": "expenses_management.expenses_management.filter_options.filter_options.clear_filter_options",
+    },
+    "Territory": {
+        "on_update": "expenses_management.expenses_management.filter_options.filter_options.clear_filter_options",
+        "after_rename": "expenses_management.expenses_management.filter_options.filter_options.clear_filter_options",
+        "on_trash": "expenses_management.expenses_management.filter_options.filter_options.clear_filter_options",
+    },
+    "Sales Person": {
+        "on_update": "expenses_management.expenses_management.filter_options.filter_options.clear_filter_options",
+        "after_rename": "expenses_management.expenses_management.filter_options.filter_options.clear_filter_options",
+        "on_trash": "expenses_management.expenses_management.filter_options.filter_options.clear_filter_options",
+    },
+    "Item Group": {
+        "on_update": [
+            "expenses_management.expenses_management.filter_options.filter_options.clear_filter_options",
+            "expenses_management.expenses_management.item_catalogue.item_catalogue.clear_item_catalogue",
+        ],
+        "after_rename": [
+            "expenses_management.expenses_management.filter_options.filter_options.clear_filter_options",
+            "expenses_management.expenses_management.item_catalogue.item_catalogue.clear_item_catalogue",
+        ],
+        "on_trash": [
+            "expenses_management.expenses_management.filter_options.filter_options.clear_filter_options",
+            "expenses_management.expenses_management.item_catalogue.item_catalogue.clear_item_catalogue",
+        ],
+    },
+    "Item": {
+        "after_insert": "expenses_management.expenses_management.doctype.item_cost.item_cost.create_item_cost",
+        "on_update": [
+            "expenses_management.expenses_management.filter_options.filter_options.clear_filter_options_for_item",
+            "expenses_management.expenses_management.item_catalogue.item_catalogue.clear_item_catalogue_for_item",
+        ],
+        "after_rename": "expenses_management.expenses_management.item_catalogue.item_catalogue.clear_item_catalogue",
+        "on_trash": [
+            "expenses_management.expenses_management.filter_options.filter_options.clear_filter_options",
+            "expenses_management.expenses_management.item_catalogue.item_catalogue.clear_item_catalogue",
+        ],
+    },
+    "Department": {
+        "on_update": "expenses_management.expenses_management.filter_options.filter_options.clear_filter_options",
+        "after_rename": "expenses_management.expenses_management.filter_options.filter_options.clear_filter_options",
+        "on_trash": "expenses_management.expenses_management.filter_options.filter_options.clear_filter_options",
+    },
+    "Loan Product": {
+        "on_update": "expenses_management.expenses_management.filter_options.filter_options.clear_filter_options",
+        "after_rename": "expenses_management.expenses_management.filter_options.filter_options.clear_filter_options",
+        "on_trash": "expenses_management.expenses_management.filter_options.filter_options.clear_filter_options",
+    },
+    "User Permission": {
+        "on_update": "expenses_management.expenses_management.filter_options.filter_options.clear_filter_options",
+        "after_rename": "expenses_management.expenses_management.filter_options.filter_options.clear_filter_options",
+        "on_trash": "expenses_management.expenses_management.filter_options.filter_options.clear_filter_options",
+    },
+    "Loan": {
+        "on_submit": "expenses_management.expenses_management.filter_options.filter_options.clear_filter_options",
+        "on_cancel": "expenses_management.expenses_management.filter_options.filter_options.clear_filter_options",
+    },
     "Delivery Note": {
         "before_submit": [
             "expenses_management.overrides.delivery_note.validate_branch_before_submit",
@@ -261,6 +404,13 @@ doc_events = {
 # 	],
 # }
 
+scheduler_events = {
+    "daily": [
+        "expenses_management.expenses_management.doctype.item_cost.item_cost.refresh_bin_based_costs",
+        "expenses_management.expenses_management.doctype.customer_balance_snapshot.customer_balance_snapshot.roll_forward_customer_balance_snapshots",
+    ],
+}
+
 # Testing
 # -------
 
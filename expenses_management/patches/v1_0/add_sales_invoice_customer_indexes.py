@@ -0,0 +1,7 @@
+import frappe
+
+
+def execute():
+	# Top-1 seeks of the last invoice lookups in sales_analytics
+	frappe.db.add_index("Sales Invoice", ["customer", "posting_date"], "customer_posting_date_index")
+	frappe.db.add_index("Sales Invoice", ["customer", "creation"], "customer_creation_index")
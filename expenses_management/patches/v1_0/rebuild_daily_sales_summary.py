@@ -0,0 +1,10 @@
+from expenses_management.expenses_management.doctype.daily_sales_summary.daily_sales_summary import (
+	is_daily_sales_summary_ready,
+	rebuild_daily_sales_summary,
+)
+
+
+def execute():
+	# Rewrite an already loaded summary (weights, returned_invoice), first loads stay manual
+	if is_daily_sales_summary_ready():
+		rebuild_daily_sales_summary()
@@ -0,0 +1,5 @@
+from expenses_management.expenses_management.doctype.item_cost.item_cost import rebuild_item_costs
+
+
+def execute():
+	rebuild_item_costs()
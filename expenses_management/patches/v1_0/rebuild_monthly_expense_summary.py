@@ -0,0 +1,7 @@
+from expenses_management.expenses_management.doctype.monthly_expense_summary.monthly_expense_summary import (
+	rebuild_monthly_expense_summary,
+)
+
+
+def execute():
+	rebuild_monthly_expense_summary()
@@ -0,0 +1,87 @@
+/**
+ * Report Jobs
+ * Runs a heavy analytics page report as a background job (see
+ * expenses_management/report_jobs/report_jobs.py) and resolves with its result.
+ *
+ * Progress arrives on the `report_job_progress` realtime event; the job state
+ * is also polled so a missed event or a dropped socket does not stall the page,
+ * and the promise rejects once MAX_POLL_FAILURES status calls in a row failed.
+ */
+frappe.provide("expenses_management.report_jobs");
+
+(function () {
+	const METHOD = "expenses_management.expenses_management.report_jobs.report_jobs";
+	const POLL_INTERVAL = 5000;
+	// Consecutive failed status calls before giving up on the job
+	const MAX_POLL_FAILURES = 3;
+
+	expenses_management.report_jobs.run = function (report, args, on_progress) {
+		return new Promise((resolve, reject) => {
+			let job_id = null;
+			let timer = null;
+			let done = false;
+			let poll_failures = 0;
+
+			const finish = (state) => {
+				if (done) return;
+				if (state.status === "Finished") {
+					done = true;
+					cleanup();
+					frappe
+						.xcall(`${METHOD}.get_report_job`, { job_id: state.job_id })
+						.then((s) => resolve(s && s.result))
+						.catch(reject);
+				} else if (state.status === "Failed") {
+					done = true;
+					cleanup();
+					reject(state.message);
+				} else if (on_progress) {
+					on_progress(state.progress || 0, state.message);
+				}
+			};
+
+			const on_event = (state) => {
+				if (state && state.job_id === job_id) finish(state);
+			};
+
+			const poll = () => {
+				frappe
+					.xcall(`${METHOD}.get_report_job`, { job_id: job_id })
+					.then((state) => {
+						poll_failures = 0;
+						if (state) finish(state);
+						if (!done) timer = setTimeout(poll, POLL_INTERVAL);
+					})
+					.catch((e) => {
+						if (done) return;
+						// Retry a dropped request, give up when the status keeps failing
+						if (++poll_failures < MAX_POLL_FAILURES) {
+							timer = setTimeout(poll, POLL_INTERVAL);
+						} else {
+							done = true;
+							cleanup();
+							reject(e);
+						}
+					});
+			};
+
+			const cleanup = () => {
+				clearTimeout(timer);
+				frappe.realtime.off("report_job_progress", on_event);
+			};
+
+			frappe.realtime.on("report_job_progress", on_event);
+			frappe
+				.xcall(`${METHOD}.start_report_job`, { report: report, filters: args })
+				.then((state) => {
+					job_id = state.job_id;
+					finish(state);
+					if (!done) timer = setTimeout(poll, POLL_INTERVAL);
+				})
+				.catch((e) => {
+					cleanup();
+					reject(e);
+				});
+		});
+	};
+})();